@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: rows/sec of GWASFormat.py row formatting, per-cell dispatch (before) vs column plan (after)
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import os.path as osp
+import random
+import sys
+import textwrap
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts"))
+
+from bench_chrom_table import legacyGWASFormatChr  # noqa: E402
+from GWASFormat import buildColumnPlan, compileRowFormatter  # noqa: E402
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog benchmark of GWASFormat.py row formatting
+
+        Example Code:
+            python benchmark/bench_GWASFormat.py -n 1000000
+        """
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        dest="rows",
+        type=int,
+        default=1000000,
+        help="Number of synthetic rows, default: 1000000",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=3,
+        help="Repeat times, the best one is reported, default: 3",
+    )
+    return parser
+
+
+def syntheticLines(n, seed=42):
+    """
+    Generate regenie-like lines: CHROM GENPOS ID ALLELE0 ALLELE1 A1FREQ N BETA SE LOG10P
+    """
+    rng = random.Random(seed)
+    chroms = [str(i) for i in range(1, 23)] + ["X", "chrY", "MT"]
+    lines = []
+    for i in range(n):
+        lines.append(
+            f"{rng.choice(chroms)}\t{rng.randint(1, 250000000)}\trs{i}\t{rng.choice('acgt')}\t{rng.choice('ACGT')}\t"
+            f"{rng.random():.4f}\t400000\t{rng.gauss(0, 0.1):.5f}\t0.0123\t{rng.random() * 10:.4f}\n"
+        )
+    return lines
+
+
+# the column mapping GWASFormat.py builds from:
+# -i 1 2 5 4 BETA SE A1FREQ LOG10P --pval-type log10p -n N --rsid ID
+COLUMN_MAPPING = {
+    "chromosome": 1,
+    "base_pair_location": 2,
+    "effect_allele": 5,
+    "other_allele": 4,
+    "beta": 8,
+    "standard_error": 9,
+    "effect_allele_frequency": 6,
+    "minus_log10_p_value": 10,
+    "ci_upper": None,
+    "ci_lower": None,
+    "rsid": 3,
+    "variant_id": None,
+    "info": None,
+    "ref_allele": None,
+    "n": 7,
+}
+
+
+def legacyFormatRow(ss, column_mapping):
+    """
+    per-cell dispatch of GWASFormat.py before the column plan
+    """
+    formated_ss = []
+    for key, key_idx in column_mapping.items():
+        if key_idx is not None:
+            if key == "chromosome":
+                new_value = legacyGWASFormatChr(ss[key_idx - 1])
+            elif key in ["effect_allele", "other_allele"]:
+                new_value = ss[key_idx - 1].upper()
+            else:
+                new_value = ss[key_idx - 1]
+        else:
+            new_value = "#NA"
+
+        formated_ss.append(new_value)
+    return "\t".join(formated_ss)
+
+
+def runLegacy(lines):
+    out = []
+    for line in lines:
+        out.append(legacyFormatRow(line.strip().split(None), COLUMN_MAPPING) + "\n")
+    return out
+
+
+def runPlan(lines):
+    formatRow = compileRowFormatter(buildColumnPlan(COLUMN_MAPPING))
+    out = []
+    for line in lines:
+        out.append(formatRow(line.strip().split(None)) + "\n")
+    return out
+
+
+def best_of(func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    lines = syntheticLines(args.rows)
+
+    legacy_time, legacy_out = best_of(runLegacy, lines, args.repeat)
+    plan_time, plan_out = best_of(runPlan, lines, args.repeat)
+
+    if legacy_out != plan_out:
+        raise ValueError("column plan output is not identical to the per-cell output")
+
+    sys.stdout.write(f"rows: {args.rows}\n")
+    sys.stdout.write(f"before (per-cell dispatch): {args.rows / legacy_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"after (column plan): {args.rows / plan_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"speedup: {legacy_time / plan_time:.2f}x\n")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: conformance of chrom_table against the per-script formatChr it replaces, and lookups/sec before vs after
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import os.path as osp
+import random
+import sys
+import textwrap
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts"))
+
+import chrFormat  # noqa: E402
+import GWASFormat  # noqa: E402
+import pheweb_format  # noqa: E402
+import resetID2  # noqa: E402
+from chrom_table import LIFTOVER_CHR, commonTokens  # noqa: E402
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog check chrom_table gives the same values as the per-script formatChr, then benchmark it
+
+        Example Code:
+            python benchmark/bench_chrom_table.py -n 10000000
+        """
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        dest="rows",
+        type=int,
+        default=10000000,
+        help="Number of chromosome tokens to normalise, default: 10000000",
+    )
+    return parser
+
+
+# formatChr of the scripts before chrom_table, kept as the reference
+
+
+def legacyGWASFormatChr(x, nochr=True):
+    if isinstance(x, int):
+        x = str(x)
+
+    if nochr:
+        x = x.lower()
+        if x.startswith("chr"):
+            x = x.lstrip("chr")
+        if x == "x":
+            x = "23"
+        elif x == "y":
+            x = "24"
+        elif x == "mt":
+            x = "25"
+
+        return x
+    else:
+        if x not in ["23", "24", "25"]:
+            x = "chr" + x
+        else:
+            if x == "23":
+                x = "chrX"
+            elif x == "24":
+                x = "chrY"
+            elif x == "25":
+                x = "chrMT"
+        return x
+
+
+def legacyChrFormatChr(x, nochr=True):
+    if isinstance(x, int):
+        x = str(x)
+    if x.startswith("0"):
+        x = x.lstrip("0")
+    if nochr:
+        x = x.lower()
+        if x.startswith("chr"):
+            x = x.lstrip("chr")
+
+        if x == "x":
+            x = "23"
+        elif x == "y":
+            x = "24"
+        elif x == "mt" or x == "m":
+            x = "25"
+
+        return x
+    else:
+        if x not in ["23", "24", "25"]:
+            x = "chr" + x
+        else:
+            if x == "23":
+                x = "chrX"
+            elif x == "24":
+                x = "chrY"
+            elif x == "25":
+                x = "chrMT"
+        return x
+
+
+def legacyLiftoverChr(x, nochr=True):
+    if isinstance(x, int):
+        x = str(x)
+    if x.startswith("0"):
+        x = x.lstrip("0")
+
+    if nochr:
+        x = x.lower()
+        if x.startswith("chr"):
+            x = x.lstrip("chr")
+        if x == "x" or x == "23":
+            x = "X"
+        elif x == "y" or x == "24":
+            x = "Y"
+        elif x == "mt" or x == "25":
+            x = "MT"
+
+        return x
+
+
+def legacyPhewebChr(x, nochr=False):
+    if x.startswith("chr"):
+        return x
+    elif x.isdigit():
+        if int(x) < 23:
+            return "chr" + str(int(x))
+        else:
+            if x == "23":
+                return "chrX"
+            elif x == "24":
+                return "chrY"
+            elif x == "25":
+                return "chrX"
+            elif x == "26":
+                return "chrMT"
+    else:
+        return x
+
+
+# (name, new function, reference function, nochr values)
+# resetID2.py only calls formatChr with nochr=False, its nochr=True branch always returned "25" for non x/y
+# (`x == "mt" or "m"`), it now follows GWASFormat.py
+VARIANTS = [
+    ("GWASFormat.py", GWASFormat.formatChr, legacyGWASFormatChr, [True, False]),
+    ("resetID2.py", resetID2.formatChr, legacyGWASFormatChr, [True, False]),
+    ("chrFormat.py", chrFormat.formatChr, legacyChrFormatChr, [True, False]),
+    ("versionConvert.py", lambda x, nochr: LIFTOVER_CHR[x], legacyLiftoverChr, [True]),
+    ("pheweb_format.py", pheweb_format.formatChr, legacyPhewebChr, [False]),
+]
+
+
+def conformanceTokens():
+    tokens = commonTokens()
+    tokens += ["0", "00", "007", "27", "100", "chr", "chrUn_gl000220", "chr6_alt", "hr1", "rchr2", "GL000192.1", "x", "mT", ""]
+    return tokens
+
+
+def checkConformance():
+    """
+    Raise ValueError if any value differs from the reference formatChr.
+    """
+    for name, func, reference, nochr_values in VARIANTS:
+        for nochr in nochr_values:
+            for token in conformanceTokens() + list(range(1, 27)):
+                if name == "pheweb_format.py" and isinstance(token, int):
+                    continue  # str only
+                expected, value = reference(token, nochr), func(token, nochr)
+                if expected != value:
+                    raise ValueError(
+                        f"{name} formatChr({token!r}, nochr={nochr}) is {value!r}, expected {expected!r}"
+                    )
+
+
+def best_of(func, tokens, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    checkConformance()
+    sys.stdout.write("conformance: ok\n")
+
+    rng = random.Random(42)
+    tokens = rng.choices([str(i) for i in range(1, 23)] + ["X", "chrY", "MT", "chr1"], k=args.rows)
+    table = GWASFormat.NUMERIC_CHR
+    before = best_of(lambda tokens: [legacyGWASFormatChr(x) for x in tokens], tokens)
+    after = best_of(lambda tokens: [table[x] for x in tokens], tokens)
+
+    sys.stdout.write(f"tokens: {args.rows}\n")
+    sys.stdout.write(f"before (formatChr): {args.rows / before:,.0f} tokens/sec\n")
+    sys.stdout.write(f"after (table lookup): {args.rows / after:,.0f} tokens/sec\n")
+    sys.stdout.write(f"speedup: {before / after:.2f}x\n")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: wall time of the piped scripts vs gwaspipe.py running the same stages in one process
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import filecmp
+import os
+import os.path as osp
+import shlex
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from synthetic import writeChain, writeSumstats
+
+SCRIPTS = osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts")
+
+FORMAT_ARGS = "-i CHR BP A1 A2 BETA SE FRQ P --rsid SNP -n N"
+RESETID_ARGS = "-s -i variant_id chromosome base_pair_location other_allele effect_allele"
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog benchmark of format | resetid | liftover | chr, piped scripts vs gwaspipe.py
+
+        Example Code:
+            python benchmark/bench_gwaspipe.py -n 10000000
+        """
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        dest="rows",
+        type=int,
+        default=10000000,
+        help="Number of synthetic rows, default: 10000000",
+    )
+    parser.add_argument(
+        "-w",
+        "--workdir",
+        dest="workdir",
+        default=None,
+        help="Directory of the synthetic files and outputs, existing files are reused. Default: a temporary directory",
+    )
+    return parser
+
+
+def run(cmd):
+    start = time.perf_counter()
+    subprocess.run(cmd, shell=True, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    workdir = args.workdir if args.workdir else tempfile.mkdtemp()
+    os.makedirs(workdir, exist_ok=True)
+    sumstats = osp.join(workdir, f"sumstats_{args.rows}.tsv")
+    chain = osp.join(workdir, "hg19ToHg38.over.chain.gz")
+    if not osp.exists(sumstats):
+        writeSumstats(sumstats, args.rows)
+    if not osp.exists(chain):
+        writeChain(chain)
+
+    python = shlex.quote(sys.executable)
+    script = lambda name: shlex.quote(osp.join(SCRIPTS, name))  # noqa: E731
+    piped_out = osp.join(workdir, "piped.tsv")
+    fused_out = osp.join(workdir, "fused.tsv")
+
+    piped_cmd = (
+        f"{python} {script('GWASFormat.py')} {FORMAT_ARGS} < {shlex.quote(sumstats)}"
+        f" | {python} {script('resetID2.py')} {RESETID_ARGS}"
+        f" | {python} {script('versionConvert.py')} -c hg19 hg38 {shlex.quote(workdir)} -i chromosome base_pair_location"
+        f" | {python} {script('chrFormat.py')} --add-chr > {shlex.quote(piped_out)}"
+    )
+    stages = f"format {FORMAT_ARGS} | resetid {RESETID_ARGS} | liftover hg19 hg38 {shlex.quote(workdir)} | chr --add-chr"
+    fused_cmd = (
+        f"{python} {script('gwaspipe.py')} {shlex.quote(stages)}"
+        f" -I {shlex.quote(sumstats)} -O {shlex.quote(fused_out)}"
+    )
+
+    piped_time = run(piped_cmd)
+    fused_time = run(fused_cmd)
+
+    if not filecmp.cmp(piped_out, fused_out, shallow=False):
+        raise ValueError("gwaspipe.py output is not identical to the piped output")
+
+    sys.stdout.write(f"rows: {args.rows}\n")
+    sys.stdout.write(f"piped: {piped_time:.2f} s, {args.rows / piped_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"gwaspipe: {fused_time:.2f} s, {args.rows / fused_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"speedup: {piped_time / fused_time:.2f}x\n")
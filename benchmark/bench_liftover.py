@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: rows/sec of versionConvert.py liftover, liftover package line by line (before) vs numpy engine in batches (after)
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import copy
+import os.path as osp
+import random
+import sys
+import tempfile
+import textwrap
+import time
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts"))
+
+from chain_lifter import ChainCursor, ChainLifter  # noqa: E402
+from synthetic import CHROM_SIZE, CHROMS, writeChain  # noqa: E402
+from versionConvert import (  # noqa: E402
+    LIFT_BATCH_SIZE,
+    get_lifter,
+    liftoverBlock,
+    liftoverLine,
+)
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog benchmark of versionConvert.py liftover of split lines, without reading and writing
+
+        Example Code:
+            python benchmark/bench_liftover.py -n 1000000
+        """
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        dest="rows",
+        type=int,
+        default=1000000,
+        help="Number of synthetic rows, default: 1000000",
+    )
+    parser.add_argument(
+        "--sorted",
+        dest="sorted",
+        action="store_true",
+        help="Rows are sorted by chromosome and position, the numpy engine with --sorted-input cursor is also timed.",
+    )
+    return parser
+
+
+def syntheticRows(n, seed=42, sorted_rows=False):
+    """
+    Split lines of: CHR BP ID
+    """
+    rng = random.Random(seed)
+    rows = [[rng.choice(CHROMS), rng.randint(1, CHROM_SIZE), f"rs{i}"] for i in range(n)]
+    if sorted_rows:
+        rows.sort(key=lambda x: (CHROMS.index(x[0]), x[1]))
+    return [[chrom, str(pos), rsid] for chrom, pos, rsid in rows]
+
+
+def newCounts():
+    return {"unmapped": 0, "multiple": 0, "notSameChr": 0, "key_error": 0, "notChr": 0}
+
+
+def runPackage(lifter, rows):
+    counts, notChrList, out = newCounts(), set(), []
+    for ss in rows:
+        ss, line_need_skip = liftoverLine(ss, lifter, [1, 2], counts, notChrList)
+        if not line_need_skip:
+            out.append(ss)
+    return out, counts
+
+
+def runNumpy(lifter, rows):
+    counts, notChrList, out = newCounts(), set(), []
+    for i in range(0, len(rows), LIFT_BATCH_SIZE):
+        out += liftoverBlock(rows[i : i + LIFT_BATCH_SIZE], lifter, [1, 2], counts, notChrList)
+    return out, counts
+
+
+def runCursor(lifter, rows):
+    counts, notChrList, out = newCounts(), set(), []
+    cursors = [ChainCursor()]
+    for i in range(0, len(rows), LIFT_BATCH_SIZE):
+        out += liftoverBlock(rows[i : i + LIFT_BATCH_SIZE], lifter, [1, 2], counts, notChrList, cursors=cursors)
+    if cursors[0].fallback > 0:
+        raise ValueError(f"{cursors[0].fallback} rows are out of order")
+    return out, counts
+
+
+def timeit(func, lifter, rows):
+    rows = copy.deepcopy(rows)  # lines are updated in place
+    start = time.perf_counter()
+    out = func(lifter, rows)
+    return time.perf_counter() - start, out
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    chain = osp.join(workdir, "hg19ToHg38.over.chain.gz")
+    writeChain(chain)
+    rows = syntheticRows(args.rows, sorted_rows=args.sorted)
+
+    package_time, package_out = timeit(runPackage, get_lifter("hg19", "hg38", cache=workdir), rows)
+    numpy_lifter = ChainLifter.fromChainFile(chain)
+    numpy_time, numpy_out = timeit(runNumpy, numpy_lifter, rows)
+
+    if package_out != numpy_out:
+        raise ValueError("numpy engine output is not identical to the liftover package")
+    if args.sorted:
+        cursor_time, cursor_out = timeit(runCursor, numpy_lifter, rows)
+        if package_out != cursor_out:
+            raise ValueError("--sorted-input output is not identical to the liftover package")
+
+    sys.stdout.write(f"rows: {args.rows}\n")
+    sys.stdout.write(f"before (liftover package): {args.rows / package_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"after (numpy engine): {args.rows / numpy_time:,.0f} rows/sec\n")
+    sys.stdout.write(f"speedup: {package_time / numpy_time:.2f}x\n")
+    if args.sorted:
+        sys.stdout.write(f"after (numpy engine, --sorted-input): {args.rows / cursor_time:,.0f} rows/sec\n")
+        sys.stdout.write(f"speedup: {package_time / cursor_time:.2f}x\n")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: rows/sec, peak RSS and CPU time of every script on synthetic GWAS files, written as JSON to track regressions
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import json
+import os
+import os.path as osp
+import platform
+import shlex
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from synthetic import LAYOUTS, writeChain, writeDbsnp, writeFasta, writeLayout
+
+SCRIPTS = osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts")
+CHECK_SNP_NUM = 30000  # --snp_num of check_genome_build.py
+
+# Run by `python -I -S -c LAUNCHER fd cmd...`: fork and exec cmd, write [wall, exit code, user, system, ru_maxrss] of it
+# as JSON to fd. Linux keeps the peak RSS of the process which calls exec, so a case forked from this process would
+# report at least the RSS of the benchmark and its synthetic files; the launcher is a small process of its own.
+LAUNCHER = """
+import json, os, sys, time
+fd = int(sys.argv[1])
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    finally:
+        os._exit(127)
+_, status, rusage = os.wait4(pid, 0)
+wall = time.perf_counter() - start
+os.write(fd, json.dumps([wall, os.waitstatus_to_exitcode(status), rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss]).encode())
+"""
+
+# (script, layout of input, args, input from stdin); {input}, {fasta}, {dbsnp} and {workdir} are filled in
+CASES = [
+    ("GWASFormat.py", "test", "-i CHR POSITION_hg19 A1 A2 BETA SE 0 P --variant-id SNP -n N_OBSERVATION", True),
+    (
+        "GWASFormat.py",
+        "regenie",
+        "-d ' ' -i CHROM GENPOS ALLELE1 ALLELE0 BETA SE A1FREQ LOG10P --pval-type log10p --rsid ID --info INFO -n N",
+        True,
+    ),
+    ("GWASFormat.py", "bolt", "-i CHR BP ALLELE1 ALLELE0 BETA SE A1FREQ P_BOLT_LMM --rsid SNP", True),
+    ("resetID2.py", "gwasformat", "-s -i variant_id chromosome base_pair_location other_allele effect_allele", True),
+    ("versionConvert.py", "gwasformat", "-c hg19 hg38 {workdir} -i chromosome base_pair_location", True),
+    ("chrFormat.py", "gwasformat", "--add-chr", True),
+    ("pheweb_format.py", "gwasformat", "-i 1 2 4 3 8 --af 7", True),
+    ("FormatConvert.py", "gwasformat", "-f cojo", True),
+    (
+        "check_genome_build.py",
+        "gwasformat",
+        f"-f {{input}} -c 1 -p 2 -r 4 -a 3 --header --ref {{fasta}} --snp_num {CHECK_SNP_NUM}",
+        False,
+    ),
+    ("generateMetaFile.py", "gwasformat", "-i {input} -s", False),
+    ("match_rsid.py", "gwasformat", "-x {dbsnp}", True),
+    ("ref_match.py", "gwasformat", "-r {fasta}", True),
+]
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog benchmark of every script in scripts/ on synthetic test.tsv, regenie, BOLT-LMM and GWASFormat output files
+
+        Each script runs in its own process, rows/sec is from the wall time, peak RSS and CPU time are from os.wait4
+        in a small launcher process, so the RSS of the benchmark itself is not counted.
+        Synthetic files are written to --workdir once and reused.
+
+        Example Code:
+            python benchmark/bench_suite.py -n 1000000 -w /tmp/gwas_bench -o results.json
+            python benchmark/bench_suite.py -n 1000000 10000000 50000000 -w /tmp/gwas_bench -o results.json
+            python benchmark/bench_suite.py -n 1000000 --scripts versionConvert.py chrFormat.py
+        """
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        dest="rows",
+        type=int,
+        nargs="+",
+        default=[1000000, 10000000, 50000000],
+        help="Number of synthetic rows, one run for each, default: 1000000 10000000 50000000",
+    )
+    parser.add_argument(
+        "-w",
+        "--workdir",
+        dest="workdir",
+        default=None,
+        help="Directory of the synthetic files and outputs, existing files are reused. Default: a temporary directory",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output JSON file. Default: stdout",
+    )
+    parser.add_argument(
+        "--scripts",
+        dest="scripts",
+        nargs="+",
+        default=None,
+        help="Only benchmark these scripts, e.g. --scripts GWASFormat.py resetID2.py. Default: all",
+    )
+    return parser
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=SCRIPTS, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def maxRSSMegabytes(maxrss):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if sys.platform == "darwin":
+        return maxrss / 1024 / 1024
+    return maxrss / 1024
+
+
+def runCase(cmd, stdin_path, rows):
+    """
+    Run cmd in a new process of LAUNCHER and measure it.
+
+    Args:
+        cmd (list): Command.
+        stdin_path (str): File sent to stdin, or None.
+        rows (int): Rows processed by the command, to compute rows/sec.
+
+    Returns:
+        dict: wall_seconds, user_seconds, system_seconds, max_rss_mb, rows_per_sec and returncode, error is the tail of stderr if failed.
+    """
+    stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+    read_fd, write_fd = os.pipe()
+    with tempfile.TemporaryFile() as stderr:
+        launcher = [sys.executable, "-I", "-S", "-c", LAUNCHER, str(write_fd)]
+        proc = subprocess.Popen(
+            launcher + cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=stderr, pass_fds=[write_fd]
+        )
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as f:
+            report = f.read()
+        proc.wait()
+        if stdin_path:
+            stdin.close()
+        if proc.returncode != 0 or not report:
+            stderr.seek(0)
+            raise RuntimeError(f"benchmark launcher failed: {stderr.read().decode(errors='replace')[-2000:]}")
+        wall, returncode, user, system, maxrss = json.loads(report)
+
+        result = {
+            "wall_seconds": round(wall, 4),
+            "user_seconds": round(user, 4),
+            "system_seconds": round(system, 4),
+            "max_rss_mb": round(maxRSSMegabytes(maxrss), 2),
+            "rows_per_sec": round(rows / wall, 1),
+            "returncode": returncode,
+        }
+        if returncode != 0:
+            stderr.seek(0)
+            result["error"] = stderr.read().decode(errors="replace")[-2000:]
+    return result
+
+
+def prepareFiles(workdir, rows, layouts, dbsnp=False):
+    """
+    Write the synthetic files which do not exist in workdir.
+
+    Args:
+        dbsnp (bool): Also write the dbSNP VCF of the gwasformat file and build its match_rsid.py index.
+
+    Returns:
+        dict: layout => path, "fasta" and "chain" are included, and "dbsnp" (index folder) if dbsnp.
+    """
+    paths = {
+        "fasta": osp.join(workdir, "ref.fasta"),
+        "chain": osp.join(workdir, "hg19ToHg38.over.chain.gz"),
+    }
+    if not osp.exists(paths["fasta"]):
+        writeFasta(paths["fasta"])
+    if not osp.exists(paths["chain"]):
+        writeChain(paths["chain"])
+    for layout in layouts:
+        paths[layout] = osp.join(workdir, f"{layout}_{rows}.tsv")
+        if not osp.exists(paths[layout]):
+            sys.stderr.write(f"writing {paths[layout]}\n")
+            writeLayout(paths[layout], layout, rows)
+    if dbsnp:
+        vcf = osp.join(workdir, f"dbsnp_{rows}.vcf.gz")
+        paths["dbsnp"] = osp.join(workdir, f"dbsnp_{rows}.rsid")
+        if not osp.exists(paths["dbsnp"]):
+            sys.stderr.write(f"writing {paths['dbsnp']}\n")
+            writeDbsnp(vcf, paths["gwasformat"])
+            subprocess.run(
+                [sys.executable, osp.join(SCRIPTS, "match_rsid.py"), "--build", vcf, "-x", paths["dbsnp"]], check=True
+            )
+    return paths
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    workdir = args.workdir if args.workdir else tempfile.mkdtemp()
+    os.makedirs(workdir, exist_ok=True)
+    cases = [case for case in CASES if args.scripts is None or case[0] in args.scripts]
+    if not cases:
+        raise ValueError(f"no script in {args.scripts}, should be some of {sorted({case[0] for case in CASES})}")
+    layouts = [layout for layout in LAYOUTS if layout in {case[1] for case in cases}]
+    dbsnp = any(case[0] == "match_rsid.py" for case in cases)
+
+    results = []
+    for rows in args.rows:
+        paths = prepareFiles(workdir, rows, layouts, dbsnp=dbsnp)
+        for script, layout, case_args, from_stdin in cases:
+            case_args = case_args.format(
+                input=paths[layout], fasta=paths["fasta"], dbsnp=paths.get("dbsnp"), workdir=workdir
+            )
+            cmd = [sys.executable, osp.join(SCRIPTS, script)] + shlex.split(case_args)
+            case_rows = min(rows, CHECK_SNP_NUM) if script == "check_genome_build.py" else rows
+            sys.stderr.write(f"{script} {layout} {rows} rows\n")
+
+            result = {"script": script, "layout": layout, "rows": case_rows, "args": case_args}
+            result.update(runCase(cmd, paths[layout] if from_stdin else None, case_rows))
+            results.append(result)
+
+    report = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
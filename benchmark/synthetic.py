@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: synthetic GWAS summary statistics and chain files for the benchmarks
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import gzip
+import os.path as osp
+import random
+import struct
+import sys
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), "..", "scripts"))
+
+from gwas_io import BGZF_BLOCK_SIZE, BGZF_EOF, TABIX_MAGIC, deflateBGZFBlock  # noqa: E402
+
+CHROM_SIZE = 100000000  # every synthetic chromosome has the same size
+CHROMS = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+REF_SIZE = 4000000  # size of the synthetic reference chromosomes, positions of writeLayout are in it
+REF_CHROMS = [str(i) for i in range(1, 26)]  # numeric, as written by plink, regenie and GWASFormat.py
+FASTA_LINE_WIDTH = 60
+BASES = bytes(b"ACGT"[i % 4] for i in range(256))
+
+# header and delimiter of the layouts written by writeLayout
+LAYOUTS = {
+    "test": (  # test/test.tsv
+        ["CHR", "SNP", "POSITION_hg19", "A1", "A2", "BETA", "SE", "P", "N_MISSING", "N_OBSERVATION", "N_EFF"],
+        "\t",
+    ),
+    "regenie": (
+        ["CHROM", "GENPOS", "ID", "ALLELE0", "ALLELE1", "A1FREQ", "INFO", "N", "TEST", "BETA", "SE", "CHISQ", "LOG10P", "EXTRA"],
+        " ",
+    ),
+    "bolt": (
+        ["SNP", "CHR", "BP", "GENPOS", "ALLELE1", "ALLELE0", "A1FREQ", "F_MISS", "BETA", "SE", "P_BOLT_LMM_INF", "P_BOLT_LMM"],
+        "\t",
+    ),
+    "gwasformat": (  # output of GWASFormat.py
+        [
+            "chromosome",
+            "base_pair_location",
+            "effect_allele",
+            "other_allele",
+            "beta",
+            "standard_error",
+            "effect_allele_frequency",
+            "p_value",
+            "ci_upper",
+            "ci_lower",
+            "rsid",
+            "variant_id",
+            "info",
+            "ref_allele",
+            "n",
+        ],
+        "\t",
+    ),
+}
+
+
+def writeSumstats(path, n, seed=42):
+    """
+    Write plink-like summary statistics: CHR SNP BP A1 A2 BETA SE P FRQ N
+
+    Args:
+        path (str): Output path, *.gz is written with gzip.
+        n (int): Number of rows.
+        seed (int): Random seed.
+    """
+    rng = random.Random(seed)
+    chroms = CHROMS + ["chrX", "chr1", "01"]  # some un-normalized chromosomes
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.write("CHR\tSNP\tBP\tA1\tA2\tBETA\tSE\tP\tFRQ\tN\n")
+        lines = []
+        for i in range(n):
+            lines.append(
+                f"{rng.choice(chroms)}\trs{i}\t{rng.randint(1, CHROM_SIZE)}\t{rng.choice('acgtACGT')}\t{rng.choice('ACGT')}\t"
+                f"{rng.gauss(0, 0.1):.4f}\t0.01\t{rng.random():.3f}\t{rng.random():.3f}\t1000\n"
+            )
+            if len(lines) == 100000:
+                f.writelines(lines)
+                lines = []
+        f.writelines(lines)
+
+
+def writeChain(path, seed=7):
+    """
+    Write a UCSC chain file (gzip) of the synthetic chromosomes.
+
+    Each chromosome has a forward chain with gaps, so some positions are unmapped,
+    and a short reverse chain to another chromosome, so some positions are multiple mapped.
+
+    Args:
+        path (str): Output path, e.g. chainDir/hg19ToHg38.over.chain.gz.
+        seed (int): Random seed.
+    """
+    rng = random.Random(seed)
+    chroms = [f"chr{c}" for c in CHROMS[:-1]] + ["chrM"]
+    lines = []
+    chain_id = 1
+    for c in chroms:
+        t, q, blocks = 0, 1000, []
+        while t < CHROM_SIZE - 2 * 10**6:
+            size, dt, dq = rng.randint(50000, 500000), rng.randint(0, 20000), rng.randint(0, 20000)
+            blocks.append(f"{size}\t{dt}\t{dq}")
+            t += size + dt
+            q += size + dq
+        last = rng.randint(1000, 100000)
+        t += last
+        q += last
+        lines.append(f"chain 1000 {c} {CHROM_SIZE} + 0 {t} {c} {CHROM_SIZE * 2} + 1000 {q} {chain_id}")
+        lines += blocks + [str(last), ""]
+        chain_id += 1
+
+        other = rng.choice(chroms)
+        start, size = rng.randint(0, CHROM_SIZE // 2), 200000
+        lines.append(
+            f"chain 500 {c} {CHROM_SIZE} + {start} {start + size} {other} {CHROM_SIZE * 2} - 5000 {5000 + size} {chain_id}"
+        )
+        lines += [str(size), ""]
+        chain_id += 1
+
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def referenceSeq(chrom, seed=11):
+    """
+    Bases of a synthetic reference chromosome, the same for the same chrom and seed.
+
+    Args:
+        chrom (str): Chromosome in REF_CHROMS.
+        seed (int): Random seed.
+
+    Returns:
+        bytes: REF_SIZE bases of ACGT.
+    """
+    return random.Random(f"{seed}-{chrom}").randbytes(REF_SIZE).translate(BASES)
+
+
+def writeFasta(path, seed=11):
+    """
+    Write the synthetic reference of REF_CHROMS and its samtools .fai index.
+
+    Args:
+        path (str): Output path, e.g. workdir/ref.fasta.
+        seed (int): Random seed, the same as writeLayout to have the alleles matched.
+    """
+    offset = 0
+    fai = []
+    with open(path, "wb") as f:
+        for chrom in REF_CHROMS:
+            seq = referenceSeq(chrom, seed)
+            header = f">{chrom}\n".encode()
+            body = b"".join(seq[i : i + FASTA_LINE_WIDTH] + b"\n" for i in range(0, len(seq), FASTA_LINE_WIDTH))
+            f.write(header + body)
+            offset += len(header)
+            fai.append(f"{chrom}\t{len(seq)}\t{offset}\t{FASTA_LINE_WIDTH}\t{FASTA_LINE_WIDTH + 1}\n")
+            offset += len(body)
+    with open(path + ".fai", "w") as f:
+        f.writelines(fai)
+
+
+def formatLayoutRow(layout, i, chrom, pos, ref, alt, rng):
+    beta, se, af = f"{rng.gauss(0, 0.1):.4f}", f"{rng.uniform(0.005, 0.05):.4f}", f"{rng.random():.3f}"
+    p = f"{rng.random():.4g}"
+    if layout == "test":
+        return [chrom, f"{chrom}:{pos}:{ref}:{alt}", pos, alt, ref, beta, se, p, "0", "184305", "162933"]
+    elif layout == "regenie":
+        return [chrom, pos, f"rs{i}", ref, alt, af, "0.98", "184305", "ADD", beta, se, "1.23", f"{rng.random() * 8:.3f}", "NA"]
+    elif layout == "bolt":
+        return [f"rs{i}", chrom, pos, "0", alt, ref, af, "0.01", beta, se, p, p]
+    elif layout == "gwasformat":
+        return [chrom, pos, alt, ref, beta, se, af, p, "#NA", "#NA", f"rs{i}", f"{chrom}:{pos}:{ref}:{alt}", "#NA", "#NA", "184305"]
+    raise ValueError(f"unknown layout: {layout}")
+
+
+def writeLayout(path, layout, n, seed=11, match_rate=0.9):
+    """
+    Write summary statistics of one of LAYOUTS, sorted by chromosome and position.
+
+    Positions are in the synthetic reference of writeFasta, other allele (ALLELE0/A2) is the reference base
+    for about match_rate of the rows, the others are random alleles.
+
+    Args:
+        path (str): Output path, *.gz is written with gzip.
+        layout (str): One of LAYOUTS.
+        n (int): Number of rows.
+        seed (int): Random seed, the same as writeFasta.
+        match_rate (float): Fraction of rows with the reference base as other allele.
+    """
+    header, sep = LAYOUTS[layout]
+    rng = random.Random(seed)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.write(sep.join(header) + "\n")
+        i = 0
+        for chrom_idx, chrom in enumerate(REF_CHROMS):
+            size = n // len(REF_CHROMS) + (chrom_idx < n % len(REF_CHROMS))
+            seq = referenceSeq(chrom, seed)
+            lines = []
+            for pos in sorted(rng.randint(1, REF_SIZE) for _ in range(size)):
+                ref = chr(seq[pos - 1]) if rng.random() < match_rate else rng.choice("ACGT")
+                alt = rng.choice("ACGT".replace(ref, ""))
+                lines.append(sep.join(formatLayoutRow(layout, i, chrom, str(pos), ref, alt, rng)) + "\n")
+                i += 1
+                if len(lines) == 100000:
+                    f.writelines(lines)
+                    lines = []
+            f.writelines(lines)
+
+
+def writeDbsnp(path, layout_path, seed=13, match_rate=0.8):
+    """
+    Write a dbSNP-like VCF of the variants of a gwasformat file of writeLayout, chromosomes are RefSeq accessions.
+
+    About match_rate of the variants have a record (alleles in either order, some multi-allelic), every position
+    also has a record of other alleles which must not match.
+
+    Args:
+        path (str): Output path, *.gz is written with gzip.
+        layout_path (str): gwasformat file of writeLayout.
+        seed (int): Random seed.
+        match_rate (float): Fraction of the variants with a record.
+    """
+    rng = random.Random(seed)
+    opener = gzip.open if path.endswith(".gz") else open
+    with open(layout_path) as src, opener(path, "wt") as f:
+        f.write("##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+        next(src)
+        lines = []
+        for i, line in enumerate(src):
+            chrom, pos, alt, ref = line.split("\t", 4)[:4]
+            accession = "NC_012920.1" if chrom == "25" else f"NC_{int(chrom):06d}.10"
+            lines.append(f"{accession}\t{pos}\trs{i + 10000000}\tN\tNN\t.\t.\tRS={i + 10000000}\n")
+            if rng.random() < match_rate:
+                if rng.random() < 0.5:
+                    ref, alt = alt, ref
+                if rng.random() < 0.2:
+                    alt = f"{alt},{ref}{alt}"
+                lines.append(f"{accession}\t{pos}\trs{i}\t{ref}\t{alt}\t.\t.\tRS={i}\n")
+            if len(lines) >= 100000:
+                f.writelines(lines)
+                lines = []
+        f.writelines(lines)
+
+
+def reg2bin(beg, end):
+    """
+    Bin of the 0-based [beg, end) region in the binning index, see tabix.pdf.
+    """
+    end -= 1
+    for shift, first in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        if beg >> shift == end >> shift:
+            return first + (beg >> shift)
+    return 0
+
+
+def writeBgzipTabix(src, path, seq_col=1, pos_col=2):
+    """
+    bgzip a sorted plain text file with one header line and write its tabix index, like
+    `bgzip -c src > path && tabix -S 1 -s seq_col -b pos_col -e pos_col path`.
+
+    Args:
+        src (str): Sorted plain text file, e.g. from writeLayout with the tab delimited gwasformat layout.
+        path (str): Output path, path.tbi is the index.
+        seq_col (int): 1-based column of the sequence name.
+        pos_col (int): 1-based column of the position.
+    """
+    index = {}  # name => (bins, linear)
+    block, coffset = b"", 0
+    with open(src, "rb") as f, open(path, "wb") as out:
+        for line_idx, line in enumerate(f):
+            if len(block) + len(line) > BGZF_BLOCK_SIZE:
+                compressed = deflateBGZFBlock(block)
+                out.write(compressed)
+                coffset += len(compressed)
+                block = b""
+            start = coffset << 16 | len(block)
+            block += line
+            if line_idx == 0:
+                continue  # header
+            ss = line.rstrip(b"\n").split(b"\t")
+            name, beg = ss[seq_col - 1].decode(), int(ss[pos_col - 1]) - 1
+            end = coffset << 16 | len(block)
+
+            bins, linear = index.setdefault(name, ({}, {}))
+            chunks = bins.setdefault(reg2bin(beg, beg + 1), [])
+            if chunks and chunks[-1][1] == start:
+                chunks[-1][1] = end
+            else:
+                chunks.append([start, end])
+            linear.setdefault(beg >> 14, start)
+        out.write(deflateBGZFBlock(block) + BGZF_EOF)
+
+    names = b"".join(name.encode() + b"\0" for name in index)
+    data = TABIX_MAGIC + struct.pack("<8i", len(index), 0, seq_col, pos_col, 0, ord("#"), 1, len(names)) + names
+    for bins, linear in index.values():
+        data += struct.pack("<i", len(bins))
+        for bin_id, chunks in bins.items():
+            data += struct.pack("<Ii", bin_id, len(chunks))
+            data += b"".join(struct.pack("<QQ", *chunk) for chunk in chunks)
+        n_intv = max(linear) + 1
+        data += struct.pack("<i", n_intv) + struct.pack(f"<{n_intv}Q", *(linear.get(i, 0) for i in range(n_intv)))
+    with open(path + ".tbi", "wb") as f:
+        for i in range(0, len(data), BGZF_BLOCK_SIZE):
+            f.write(deflateBGZFBlock(data[i : i + BGZF_BLOCK_SIZE]))
+        f.write(BGZF_EOF)
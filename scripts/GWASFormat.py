@@ -11,11 +11,36 @@
 
 
 import argparse
+import io
 import sys
 import warnings
 import textwrap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from signal import SIG_DFL, SIGPIPE, signal
 
+try:  # optional, --batch-size formats whole columns with pyarrow string kernels
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+except ImportError:
+    pa = None
+
+from chrom_table import NUMERIC_CHR, PREFIXED_CHR
+from gwas_io import (
+    bgzfShards,
+    isBGZF,
+    isGzip,
+    openInput,
+    openOutput,
+    plainShards,
+    readBGZFShard,
+    readPlainShard,
+)
+
+SHARD_SIZE = 16 * 1024 * 1024  # bytes of each shard for --threads, compressed size for bgzip
+
 
 warnings.filterwarnings("ignore")
 signal(
@@ -49,6 +74,10 @@ def getParser():
             cat /pmaster/chenxingyu/chenxy/project/10algorithm/GWAS_summary_statistic/Asthma/v7new_version_file_uniq | ./GWASFormat.py -i 1 3 5 4 7 8 6 9 --pval_type log10p --effect_type odds_ratio
         3. spcific other columns
          cat /pmaster/chenxingyu/chenxy/project/10algorithm/GWAS_summary_statistic/Asthma/v7new_version_file_uniq | ./GWASFormat.py -i 1 3 5 4 7 8 6 9 --other_cols -2 -4
+        4. format blocks of 1000000 rows at once, whole-column pyarrow kernels are used if pyarrow is installed and -d is given
+            zcat xxx.regenie.gz | GWASFormat.py -i 1 2 5 4 BETA SE A1FREQ LOG10P --pval-type log10p -d " " --batch-size 1000000
+        5. format a bgzip file by 16 processes, the output keeps the input order
+            GWASFormat.py -I xxx.tsv.gz -O xxx.formated.tsv.gz --threads 16 -i 1 3 5 4 7 8 6 9
 
         
         """
@@ -141,6 +170,38 @@ def getParser():
         help="Other columns. Number of col index, optional",
         required=False,
     )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        type=int,
+        default=None,
+        help="Format blocks of N rows at once and write each block with one join. If pyarrow is installed and -d is a single character, each block is formatted by whole-column pyarrow string kernels. Optional",
+        required=False,
+    )
+    parser.add_argument(
+        "-I",
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip), default: stdin",
+        required=False,
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip (could be indexed by tabix), default: stdout",
+        required=False,
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of processes, only work with --input of plain text or bgzip file. The input is split into line-aligned shards (BGZF blocks for bgzip) and the output keeps the input order. Also the number of threads to decompress bgzip input and compress bgzip output. Default: 1",
+        required=False,
+    )
     return parser
 
 
@@ -178,35 +239,11 @@ def formatChr(x, nochr=True):
         - ValueError will be raised if the given chromosome identifier is invalid.
         - When nochr is True, "x", "y", "mt" will be converted to 23, 24, 25.
         - When nochr is False, 23, 24, 25 will be converted to "chrX", "chrY", "chrMT".
+        - Values are looked up in the memoized tables of chrom_table.
     """
-    if isinstance(x, int):
-        x = str(x)
-
     if nochr:
-        x = x.lower()
-        # remove chr
-        if x.startswith("chr"):
-            x = x.lstrip("chr")
-        # turn x, y, mt => 23, 24, 25
-        if x == "x":
-            x = "23"
-        elif x == "y":
-            x = "24"
-        elif x == "mt":
-            x = "25"
-
-        return x
-    else:
-        if x not in ["23", "24", "25"]:
-            x = "chr" + x
-        else:
-            if x == "23":
-                x = "chrX"
-            elif x == "24":
-                x = "chrY"
-            elif x == "25":
-                x = "chrMT"
-        return x
+        return NUMERIC_CHR[x]
+    return PREFIXED_CHR[x]
 
 
 def header_mapper(string, header_col):
@@ -239,24 +276,19 @@ def header_mapper(string, header_col):
     return idx
 
 
-# def header_mapper(idx_or_str, header_col):
-#     if isinstance(idx_or_str, str):
-#         string = idx_or_str
-#         idx = header_col.index(string) + 1
-#     elif isinstance(idx_or_str, int):
-#         idx = idx_or_str
-#         if idx < 0:
-#             idx = len(header_col) + idx + 1
-#     else:
-#         idx = None
-#     return idx
+def getColumnMapping(args):
+    """
+    Get the output columns and the user specified column (index or name) of each one from the args.
 
+    Args:
+        args (argparse.Namespace): Parsed args of getParser.
 
-if __name__ == "__main__":
-    parser = getParser()
-    args = parser.parse_args()
-    # see gwas-ssf_v1.0.0.pdf: https://github.com/EBISPOT/gwas-summary-statistics-standard
+    Returns:
+        dict: Output column name => column index or column name specified by user, None means missing.
 
+    Raises:
+        ValueError: If -i does not contain 8 values.
+    """
     # parse args
     pval_type = args.pval_type
     if pval_type == "log10p":
@@ -264,7 +296,6 @@ if __name__ == "__main__":
     elif pval_type == "pval":
         pval_type = "p_value"
     effect_type = args.effect_type
-    delimter = args.delimter
 
     # get fields
     Mandatory_fields = {
@@ -297,8 +328,6 @@ if __name__ == "__main__":
             "col_indices should containing 8 value, this means that you should specific these cols index: chromosome, base_pair_location, effect_allele, other_allele, beta/odds_ration/hazard_ratio, standard_error, effect_allele_frequency, p_value/minus_log10_p_value"
         )
 
-    chr, pos, ea, oa, beta, se, ea_freq, pval = [i for i in default_col_indices]
-
     for key, key_idx in zip(Mandatory_fields.keys(), args.col_indices):
         if key_idx != "0":
             Mandatory_fields[key] = key_idx
@@ -321,70 +350,326 @@ if __name__ == "__main__":
     column_mapping = {}
     column_mapping.update(Mandatory_fields)
     column_mapping.update(Encouraged_fields)
+    return column_mapping
+
+
+def mapColumns(column_mapping, raw_header, other_cols=None):
+    """
+    Map the user specified columns of column_mapping to the index of raw_header.
+
+    Args:
+        column_mapping (dict): Output column name => column index or column name specified by user, None means missing.
+        raw_header (list): The header of the input file.
+        other_cols (list, optional): Other columns (index or name) to be kept, output with their raw header name.
+
+    Returns:
+        dict: Output column name => 1-based column index of the input file, None means missing.
+
+    Raises:
+        ValueError: If the other columns have conflict with the default columns.
+    """
+    column_mapping = {
+        key: header_mapper(key_idx, raw_header)
+        for key, key_idx in column_mapping.items()
+    }
+
+    if other_cols:
+        other_col_indices = [header_mapper(i, raw_header) for i in other_cols]
+        user_defined_dict = {
+            raw_header[key_idx - 1]: key_idx for key_idx in other_col_indices
+        }
+        conflict = set(user_defined_dict.keys()).intersection(
+            set(column_mapping.keys())
+        )
+        if len(conflict) > 0:  # avoid conflict columns between user defined and default
+            conflict_list = ",".join(conflict)
+            raise ValueError(
+                f"User defined column index has conflict with default column index. {conflict_list}"
+            )
+
+        column_mapping.update(user_defined_dict)
+    return column_mapping
+
+
+def buildColumnPlan(column_mapping):
+    """
+    Build the column plan of the output file from the resolved column mapping.
+
+    Args:
+        column_mapping (dict): Output column name => 1-based column index of the input file, None means missing.
+
+    Returns:
+        list: Ordered list of (source index, transform) pairs, one for each output column.
+
+    Notes:
+        - source index is 0-based, None means the output column is filled with "#NA".
+        - transform is None if the value is passed through unchanged.
+        - chromosome is looked up in NUMERIC_CHR (same as formatChr), effect_allele and other_allele are upper cased.
+    """
+    plan = []
+    for key, key_idx in column_mapping.items():
+        if key_idx is None:
+            plan.append((None, None))
+        elif key == "chromosome":
+            plan.append((key_idx - 1, NUMERIC_CHR))
+        elif key in ["effect_allele", "other_allele"]:
+            plan.append((key_idx - 1, str.upper))
+        else:
+            plan.append((key_idx - 1, None))
+    return plan
+
+
+def compileRowFormatter(plan, na="#NA", delimter="\t"):
+    """
+    Generate the row function of a column plan.
 
-    line_idx = 1
-    for line in sys.stdin:
-        line = line.strip()  # remove \n
-        ss = line.split(delimter)
-
-        if line_idx == 1:
-            # get user specified column index
-            raw_header = ss
-            # map column_mapping keys to index
-            column_mapping = {
-                key: header_mapper(key_idx, raw_header)
-                for key, key_idx in column_mapping.items()
-            }
-
-            if args.other_cols:
-                other_col_indices = [
-                    header_mapper(i, raw_header) for i in args.other_cols
+    Args:
+        plan (list): Column plan from buildColumnPlan.
+        na (str): Value of missing columns. Default is "#NA".
+        delimter (str): Delimter of the output line. Default is tab. None means returning the list of values.
+
+    Returns:
+        function: formatRow(ss) => formatted line (without \n), ss is the split input line.
+
+    Usage Examples:
+        formatRow = compileRowFormatter([(0, formatChr), (2, None), (None, None)])
+        formatRow(["chrX", "rs1", "123"])  # Returns "23\t123\t#NA"
+    """
+    namespace = {}
+    exprs = []
+    for i, (src_idx, transform) in enumerate(plan):
+        if src_idx is None:
+            exprs.append(repr(na))
+        elif transform is None:
+            exprs.append(f"ss[{src_idx}]")
+        elif isinstance(transform, dict):  # lookup table, e.g. NUMERIC_CHR
+            namespace[f"transform{i}"] = transform
+            exprs.append(f"transform{i}[ss[{src_idx}]]")
+        else:
+            namespace[f"transform{i}"] = transform
+            exprs.append(f"transform{i}(ss[{src_idx}])")
+
+    if delimter is None:
+        source = f"def formatRow(ss):\n    return [{', '.join(exprs)}]\n"
+    else:
+        source = (
+            "def formatRow(ss):\n"
+            f"    return {delimter!r}.join(({', '.join(exprs)},))\n"
+        )
+    exec(source, namespace)
+    return namespace["formatRow"]
+
+
+def formatBlock(lines, formatRow, delimter=None):
+    """
+    Format a block of lines with the row function and join them into one string.
+
+    Args:
+        lines (list): Raw input lines.
+        formatRow (function): Row function from compileRowFormatter.
+        delimter (str, optional): Delimter of the input file. Default is any whitespace.
+
+    Returns:
+        str: Formatted lines, each one ends with \n.
+    """
+    return "".join([formatRow(line.strip().split(delimter)) + "\n" for line in lines])
+
+
+def formatArrowBlock(batch, plan, na="#NA"):
+    """
+    Format a block of rows as whole-column operations with pyarrow string kernels.
+
+    Args:
+        batch (pyarrow.Table): Block of the input file, all columns are read as string.
+        plan (list): Column plan from buildColumnPlan.
+        na (str): Value of missing columns. Default is "#NA".
+
+    Returns:
+        bytes: Formatted lines (tab delimter), each one ends with \n.
+
+    Notes:
+        - chromosome is normalised through a lookup table of the distinct values in the block.
+        - effect_allele and other_allele are upper cased by utf8_upper.
+        - missing columns are filled by a "#NA" scalar.
+    """
+    if batch.num_rows == 0:
+        return b""
+
+    columns = []
+    for src_idx, transform in plan:
+        if src_idx is None:
+            columns.append(pa.scalar(na))
+            continue
+        column = batch.column(src_idx).combine_chunks()
+        if transform is str.upper:
+            column = pc.utf8_upper(column)
+        elif transform is not None:
+            encoded = pc.dictionary_encode(column)
+            lookup = pa.array(
+                [transform(value) for value in encoded.dictionary.to_pylist()],
+                type=pa.string(),
+            )
+            column = pc.take(lookup, encoded.indices)
+        columns.append(column)
+
+    lines = pc.binary_join_element_wise(*columns, "\t")
+    lines = pc.binary_join_element_wise(lines, "", "\n")  # line + "\n"
+    # values of a string array are stored back to back in its data buffer
+    offsets = memoryview(lines.buffers()[1]).cast("i")
+    start, end = offsets[lines.offset], offsets[lines.offset + len(lines)]
+    return lines.buffers()[2].to_pybytes()[start:end]
+
+
+def initShardWorker(column_mapping, delimter):
+    """
+    Build the row function of the column plan once in each worker process of --threads.
+    """
+    global SHARD_FORMAT_ROW, SHARD_DELIMTER
+    SHARD_FORMAT_ROW = compileRowFormatter(buildColumnPlan(column_mapping))
+    SHARD_DELIMTER = delimter
+
+
+def formatShard(shard):
+    """
+    Read and format a shard of the input file in a worker process of --threads.
+
+    Args:
+        shard (tuple): (path, kind, start, end, prev_block), kind is "plain" or "bgzf", see gwas_io.
+
+    Returns:
+        bytes: Formatted lines of the shard.
+    """
+    path, kind, start, end, prev_block = shard
+    if kind == "bgzf":
+        data = readBGZFShard(path, start, end, prev_block)
+    else:
+        data = readPlainShard(path, start, end)
+    lines = io.StringIO(data.decode(), newline=None)  # same newline handling as stdin
+    return formatBlock(lines, SHARD_FORMAT_ROW, SHARD_DELIMTER).encode()
+
+
+# def header_mapper(idx_or_str, header_col):
+#     if isinstance(idx_or_str, str):
+#         string = idx_or_str
+#         idx = header_col.index(string) + 1
+#     elif isinstance(idx_or_str, int):
+#         idx = idx_or_str
+#         if idx < 0:
+#             idx = len(header_col) + idx + 1
+#     else:
+#         idx = None
+#     return idx
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+    # see gwas-ssf_v1.0.0.pdf: https://github.com/EBISPOT/gwas-summary-statistics-standard
+
+    delimter = args.delimter
+    column_mapping = getColumnMapping(args)
+
+    batch_size = args.batch_size
+    use_arrow = (
+        batch_size is not None
+        and pa is not None
+        and delimter is not None
+        and len(delimter) == 1
+    )
+    input_path = args.input
+    threads = args.threads
+    shard_kind = None  # split the input into shards for the process pool
+    if threads > 1:
+        if input_path is None:
+            sys.stderr.write("Warning: --threads needs --input, stdin is formatted by one process\n")
+        elif isBGZF(input_path):
+            shard_kind = "bgzf"
+        elif isGzip(input_path):
+            sys.stderr.write(
+                "Warning: gzip (not bgzip) input can not be split, formatted by one process. Use bgzip to compress it\n"
+            )
+        else:
+            shard_kind = "plain"
+
+    input_file = openInput(input_path, threads)
+    output_file = openOutput(args.output, threads)
+    if use_arrow:  # pyarrow reads the binary stream after the header
+        header_line = input_file.buffer.readline().decode()
+    else:
+        header_line = input_file.readline()
+
+    if header_line:
+        # get user specified column index
+        raw_header = header_line.strip().split(delimter)
+        # map column_mapping keys to index
+        column_mapping = mapColumns(column_mapping, raw_header, args.other_cols)
+        # update header
+        formated_ss = "\t".join(column_mapping.keys())  # \t delimter
+        output_file.write(f"{formated_ss}\n")
+
+        # plan is built once from the header, the hot loop only applies it
+        plan = buildColumnPlan(column_mapping)
+        if shard_kind is not None:
+            if shard_kind == "bgzf":
+                shards = [
+                    (input_path, shard_kind, start, end, prev_block)
+                    for start, end, prev_block in bgzfShards(input_path, SHARD_SIZE)
                 ]
-                user_defined_dict = {
-                    ss[key_idx - 1]: key_idx for key_idx in other_col_indices
-                }
-                conflict = set(user_defined_dict.keys()).intersection(
-                    set(column_mapping.keys())
+            else:
+                with open(input_path, "rb") as f:
+                    f.readline()  # header
+                    data_start = f.tell()
+                shards = [
+                    (input_path, shard_kind, start, end, None)
+                    for start, end in plainShards(input_path, data_start, SHARD_SIZE)
+                ]
+
+            output_file.flush()
+            with ProcessPoolExecutor(
+                max_workers=threads,
+                initializer=initShardWorker,
+                initargs=(column_mapping, delimter),
+            ) as pool:
+                # ordered writer, at most 2 * threads formatted shards are kept in memory
+                pending = deque()
+                for shard in shards:
+                    pending.append(pool.submit(formatShard, shard))
+                    if len(pending) >= 2 * threads:
+                        output_file.buffer.write(pending.popleft().result())
+                while pending:
+                    output_file.buffer.write(pending.popleft().result())
+        elif batch_size is None:
+            formatRow = compileRowFormatter(plan)
+            for line in input_file:
+                formated_ss = formatRow(line.strip().split(delimter))
+                output_file.write(f"{formated_ss}\n")
+        elif use_arrow:
+            output_file.flush()
+            read_options = pcsv.ReadOptions(
+                column_names=[f"col{i}" for i in range(len(raw_header))]
+            )
+            parse_options = pcsv.ParseOptions(delimiter=delimter, quote_char=False)
+            convert_options = pcsv.ConvertOptions(
+                column_types={name: pa.string() for name in read_options.column_names}
+            )
+            for block in iter(lambda: list(islice(input_file.buffer, batch_size)), []):
+                batch = pcsv.read_csv(
+                    pa.py_buffer(b"".join(block)),
+                    read_options=read_options,
+                    parse_options=parse_options,
+                    convert_options=convert_options,
                 )
-                if (
-                    len(conflict) > 0
-                ):  # avoid conflict columns between user defined and default
-                    conflict_list = ",".join(conflict)
-                    raise ValueError(
-                        f"User defined column index has conflict with default column index. {conflict_list}"
-                    )
-
-                column_mapping.update(user_defined_dict)
-            # update header
-            formated_ss = [key for key, key_idx in column_mapping.items()]
+                output_file.buffer.write(formatArrowBlock(batch, plan))
         else:
-            # formated_ss = [
-            #     ss[key_idx - 1] if key_idx is not None else "#NA"
-            #     for key, key_idx in column_mapping.items()
-            # ]
-            formated_ss = []
-            for key, key_idx in column_mapping.items():
-                if key_idx is not None:
-                    if key == "chromosome":
-                        new_value = formatChr(ss[key_idx - 1])
-                    elif key in ["effect_allele", "other_allele"]:
-                        new_value = ss[key_idx - 1].upper()
-                    else:
-                        new_value = ss[key_idx - 1]
-                else:
-                    new_value = "#NA"
-
-                formated_ss.append(new_value)
-
-        formated_ss = "\t".join(formated_ss)  # \t delimter
-
-        sys.stdout.write(f"{formated_ss}\n")
-        line_idx += 1
-
-
-sys.stdout.close()
-sys.stderr.flush()
-sys.stderr.close()
+            formatRow = compileRowFormatter(plan)
+            for block in iter(lambda: list(islice(input_file, batch_size)), []):
+                output_file.write(formatBlock(block, formatRow, delimter))
+
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
+
 
 # end = time.time()
 # time_str = "time elapsed: {:.2f} /min".format((end - start) / 60)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description:       : liftover by UCSC chain file loaded into sorted numpy arrays, batches of positions are mapped by searchsorted
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from bisect import bisect_right
+
+try:  # optional, versionConvert.py falls back to the liftover package without numpy
+    import numpy as np
+except ImportError:
+    np = None
+
+CACHE_VERSION = 1  # bump if the arrays of the binary cache change
+CACHE_ARRAYS = ["target_bounds", "starts", "ends", "offsets", "fwd", "query_ids", "prev_max_ends"]
+
+
+def chainChecksum(path, hash_factory=hashlib.md5, chunk_size=1024 * 1024):
+    """
+    Checksum of the chain file, the key of its binary cache.
+    """
+    h = hash_factory()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def chainCachePath(path, checksum):
+    """
+    Binary cache folder of the chain file, next to it: {chain}.{checksum}.lifter
+    """
+    return f"{path}.{checksum}.lifter"
+
+
+def readChain(path):
+    """
+    Parse the ungapped blocks of a UCSC chain file.
+
+    Args:
+        path (str): Path of the chain file, plain or gzip.
+
+    Returns:
+        tuple: (target_names, query_names, target_ids, starts, ends, offsets, fwd, query_ids)
+            target_names (list): Target (from) chromosomes in the order of first seen.
+            query_names (list): Query (to) chromosomes in the order of first seen.
+            others are numpy arrays of the blocks in the order of the file, target_ids and query_ids are index of the names.
+
+    Notes:
+        - See https://genome.ucsc.edu/goldenPath/help/chain.html, target strand is always +.
+        - offset maps a 0-based target position to the query: pos + offset on + strand, offset - pos on - strand,
+          the query position of - strand is converted to + strand as qSize - 1 - pos.
+        - The block lines "size dt dq" of each chain are parsed at once by numpy.
+    """
+    with open(path, "rb") as f:
+        opener = gzip.open if f.read(2) == b"\x1f\x8b" else open
+    with opener(path, "rt") as f:
+        text = f.read()
+
+    target_ids, query_ids = {}, {}
+    columns = {key: [] for key in ["target_ids", "starts", "ends", "offsets", "fwd", "query_ids"]}
+    for chain in text.split("chain ")[1:]:
+        header, _, body = chain.partition("\n")
+        if "#" in body:  # comment lines
+            body = "\n".join(x for x in body.split("\n") if not x.startswith("#"))
+        ss = header.split()
+        t_name, t_start = ss[1], int(ss[4])
+        q_name, q_size, q_strand, q_start = ss[6], int(ss[7]), ss[8], int(ss[9])
+
+        # size dt dq of each block, the last block has no dt dq
+        values = np.fromstring(body + " 0 0", dtype=np.int64, sep=" ").reshape(-1, 3)
+        sizes, dts, dqs = values[:, 0], values[:, 1], values[:, 2]
+        t_starts = t_start + np.concatenate(([0], np.cumsum(sizes + dts)[:-1]))
+        q_starts = q_start + np.concatenate(([0], np.cumsum(sizes + dqs)[:-1]))
+
+        n = len(sizes)
+        fwd = q_strand == "+"
+        columns["target_ids"].append(np.full(n, target_ids.setdefault(t_name, len(target_ids)), dtype=np.int32))
+        columns["starts"].append(t_starts)
+        columns["ends"].append(t_starts + sizes)
+        columns["offsets"].append(q_starts - t_starts if fwd else q_size - 1 - q_starts + t_starts)
+        columns["fwd"].append(np.full(n, fwd, dtype=bool))
+        columns["query_ids"].append(np.full(n, query_ids.setdefault(q_name, len(query_ids)), dtype=np.int32))
+
+    arrays = [np.concatenate(columns[key]) for key in columns]
+    return (list(target_ids), list(query_ids), *arrays)
+
+
+class ChainTarget:
+    """
+    Blocks of one target chromosome, sorted by start.
+
+    target[pos] returns the same as the liftover package: [(query_chr, query_pos, strand), ...], [] if unmapped.
+    """
+
+    def __init__(self, lifter, lo=0, hi=0):
+        self.query_names = lifter.query_names
+        self.starts = lifter.starts[lo:hi]
+        self.ends = lifter.ends[lo:hi]
+        self.offsets = lifter.offsets[lo:hi]
+        self.fwd = lifter.fwd[lo:hi]
+        self.query_ids = lifter.query_ids[lo:hi]
+        self.prev_max_ends = lifter.prev_max_ends[lo:hi]
+
+    def blockHits(self, pos, idx):
+        """
+        All blocks containing pos, idx is the last block with start <= pos.
+        """
+        hits = []
+        while idx >= 0:
+            if self.ends[idx] > pos:
+                hits.append(idx)
+            if self.prev_max_ends[idx] <= pos:  # no block before idx reaches pos
+                break
+            idx -= 1
+        return hits
+
+    def __getitem__(self, pos):
+        matches = []
+        for idx in self.blockHits(pos, bisect_right(self.starts, pos) - 1):
+            if self.fwd[idx]:
+                matches.append((self.query_names[self.query_ids[idx]], int(pos + self.offsets[idx]), "+"))
+            else:
+                matches.append((self.query_names[self.query_ids[idx]], int(self.offsets[idx] - pos), "-"))
+        return matches
+
+    def liftArray(self, pos, lo=0):
+        """
+        Map positions of this chromosome.
+
+        Args:
+            pos (numpy.ndarray): 0-based positions, int64.
+            lo (int): Only blocks from lo are searched, the last block with start <= pos must be >= lo.
+
+        Returns:
+            tuple: (n_hits, query_ids, query_pos, fwd) arrays, query_* and fwd are of the block for n_hits == 1.
+        """
+        idx = np.searchsorted(self.starts[lo:], pos, side="right") - 1 + lo
+        found = idx >= 0
+        idx[~found] = 0
+        hit = found & (self.ends[idx] > pos)
+        n_hits = hit.astype(np.int8)
+
+        # blocks before idx overlap pos, only for overlapping chains which are rare
+        more = np.flatnonzero(found & (self.prev_max_ends[idx] > pos))
+        for i in more.tolist():
+            hits = self.blockHits(int(pos[i]), int(idx[i]))
+            n_hits[i] = min(len(hits), 2)  # 2 means multiple
+            idx[i] = hits[0]
+
+        fwd = self.fwd[idx]
+        query_pos = np.where(fwd, pos + self.offsets[idx], self.offsets[idx] - pos)
+        return n_hits, self.query_ids[idx], query_pos, fwd
+
+    def liftSorted(self, pos, cursor):
+        """
+        Map positions of this chromosome with a cursor which only moves forward.
+
+        Args:
+            pos (numpy.ndarray): 0-based positions in the order of the file, int64.
+            cursor (ChainCursor): Cursor of the last block and the max position of this chromosome, updated in place.
+
+        Returns:
+            tuple: The same as liftArray.
+
+        Notes:
+            - Positions not less than all positions before are in order, they are searched from the cursor block;
+              searchsorted of sorted positions also starts from the last result, so this is a merge of positions and blocks.
+            - Positions out of order are searched in all blocks and counted in cursor.fallback.
+        """
+        lo, last_pos = cursor.state.get(self, (0, -1))
+        prev_max = np.maximum.accumulate(np.concatenate(([last_pos], pos[:-1])))
+        in_order = pos >= prev_max
+        if in_order.all():
+            result = self.liftArray(pos, lo)
+        else:
+            rows, rest = np.flatnonzero(in_order), np.flatnonzero(~in_order)
+            cursor.fallback += len(rest)
+            rest_result = self.liftArray(pos[rest])
+            result = tuple(np.empty(len(pos), dtype=x.dtype) for x in rest_result)
+            for array, value in zip(result, rest_result):
+                array[rest] = value
+            for array, value in zip(result, self.liftArray(pos[rows], lo)):
+                array[rows] = value
+
+        last_pos = max(last_pos, int(pos.max()))
+        lo = max(lo, int(np.searchsorted(self.starts[lo:], last_pos, side="right")) - 1 + lo)
+        cursor.state[self] = (lo, last_pos)
+        return result
+
+
+class ChainCursor:
+    """
+    Cursor of positions sorted by chromosome and position, one for each position column.
+
+    Attributes:
+        state (dict): ChainTarget => (block index, max position) of the positions lifted.
+        fallback (int): Number of positions out of order, which are searched in all blocks.
+    """
+
+    def __init__(self):
+        self.state = {}
+        self.fallback = 0
+
+
+class ChainLifter:
+    """
+    Liftover by a UCSC chain file, blocks of all target chromosomes are kept in flat numpy arrays.
+
+    lifter[chr] returns ChainTarget as the liftover package, an empty one if chr not in the chain file, so the positions are unmapped.
+    Both "1" and "chr1" are accepted for chr1 of the chain file.
+
+    Usage Examples:
+        lifter = ChainLifter.fromChainFile("hg19ToHg38.over.chain.gz")
+        lifter["1"][1000000]  # Returns [('chr1', 1064620, '+')]
+        lifter.liftArrays(["1", "X"], np.array([1000000, 2000000]))
+    """
+
+    def __init__(self, target_names, query_names, target_bounds, starts, ends, offsets, fwd, query_ids, prev_max_ends):
+        self.target_names = target_names
+        self.query_names = query_names
+        self.target_bounds = target_bounds  # [lo, hi) of each target in the flat arrays
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.fwd = fwd
+        self.query_ids = query_ids
+        self.prev_max_ends = prev_max_ends
+
+        self.targets = {}
+        for name, (lo, hi) in zip(target_names, target_bounds.tolist()):
+            self.targets[name] = ChainTarget(self, lo, hi)
+        # alternate prefix keys, e.g. "1" for "chr1"
+        self.lookup = dict(self.targets)
+        for name, target in self.targets.items():
+            alt = name[3:] if name.startswith("chr") else f"chr{name}"
+            if alt not in self.lookup:
+                self.lookup[alt] = target
+        self.missing_target = ChainTarget(self)
+
+    @classmethod
+    def fromChainFile(cls, path):
+        """
+        Load a UCSC chain file (plain or gzip).
+        """
+        target_names, query_names, t_ids, starts, ends, offsets, fwd, query_ids = readChain(path)
+        order = np.lexsort((ends, starts, t_ids))
+        t_ids, starts, ends = t_ids[order], starts[order], ends[order]
+        offsets, fwd, query_ids = offsets[order], fwd[order], query_ids[order]
+
+        target_bounds = np.zeros((len(target_names), 2), dtype=np.int64)
+        target_bounds[:, 0] = np.searchsorted(t_ids, np.arange(len(target_names)), side="left")
+        target_bounds[:, 1] = np.searchsorted(t_ids, np.arange(len(target_names)), side="right")
+
+        # max end of the blocks before each block of the same target, -1 for the first one
+        prev_max_ends = np.full(len(starts), -1, dtype=np.int64)
+        for lo, hi in target_bounds.tolist():
+            if hi - lo > 1:
+                prev_max_ends[lo + 1 : hi] = np.maximum.accumulate(ends[lo : hi - 1])
+
+        return cls(target_names, query_names, target_bounds, starts, ends, offsets, fwd, query_ids, prev_max_ends)
+
+    @classmethod
+    def fromCache(cls, path, use_cache=True):
+        """
+        Load a UCSC chain file by its binary cache, the cache is built if not exists.
+
+        Args:
+            path (str): Path of the chain file.
+            use_cache (bool): Read and write the binary cache. Default is True.
+
+        Returns:
+            ChainLifter: Arrays are memory-mapped if the cache exists.
+
+        Notes:
+            - The cache is keyed by the checksum of the chain file, see chainCachePath.
+            - The cache is written to a temporary folder and renamed, so parallel runs never read a partial cache.
+            - The cache is skipped if the folder of the chain file is not writable or the cache is broken.
+        """
+        if not use_cache:
+            return cls.fromChainFile(path)
+
+        cache_path = chainCachePath(path, chainChecksum(path))
+        if os.path.isdir(cache_path):
+            try:
+                return cls.load(cache_path)
+            except (OSError, ValueError, KeyError):
+                pass  # broken cache, parse the chain file
+
+        lifter = cls.fromChainFile(path)
+        try:
+            lifter.save(cache_path)
+        except OSError:
+            pass  # not writable
+        return lifter
+
+    def save(self, cache_path):
+        """
+        Write the arrays as .npy and the names as names.json into cache_path.
+        """
+        tmp_path = tempfile.mkdtemp(prefix=".tmp_", dir=os.path.dirname(os.path.abspath(cache_path)))
+        try:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o777 & ~umask)  # mkdtemp is 0700, the cache is shared as the chain file
+            for name in CACHE_ARRAYS:
+                np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+            with open(os.path.join(tmp_path, "names.json"), "w") as f:
+                json.dump(
+                    {
+                        "version": CACHE_VERSION,
+                        "target_names": self.target_names,
+                        "query_names": self.query_names,
+                    },
+                    f,
+                )
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(cache_path):  # not written by another run
+                raise
+
+    @classmethod
+    def load(cls, cache_path):
+        """
+        Memory-map the binary cache written by save.
+        """
+        with open(os.path.join(cache_path, "names.json")) as f:
+            names = json.load(f)
+        if names["version"] != CACHE_VERSION:
+            raise ValueError(f"cache version {names['version']} is not {CACHE_VERSION}")
+        arrays = [np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r") for name in CACHE_ARRAYS]
+        return cls(names["target_names"], names["query_names"], *arrays)
+
+    def __getitem__(self, chrom):
+        return self.lookup.get(chrom, self.missing_target)
+
+    def __contains__(self, chrom):
+        return chrom in self.lookup
+
+    def liftArrays(self, chroms, pos, cursor=None):
+        """
+        Map a batch of positions of any chromosomes.
+
+        Args:
+            chroms (list): Chromosome of each position.
+            pos (numpy.ndarray): 0-based positions, int64.
+            cursor (ChainCursor, optional): Cursor of sorted positions, see ChainTarget.liftSorted.
+
+        Returns:
+            tuple: (n_hits, query_ids, query_pos, fwd) arrays.
+                n_hits is 0 unmapped (also if the chromosome is not in the chain file), 1 mapped, 2 multiple mapped.
+                query_ids is index of query_names, query_ids, query_pos and fwd are only for n_hits == 1.
+        """
+        n = len(pos)
+        n_hits = np.zeros(n, dtype=np.int8)
+        query_ids = np.zeros(n, dtype=np.int32)
+        query_pos = np.zeros(n, dtype=np.int64)
+        fwd = np.ones(n, dtype=bool)
+
+        code_of = {chrom: i for i, chrom in enumerate(dict.fromkeys(chroms))}
+        codes = np.fromiter(map(code_of.__getitem__, chroms), dtype=np.int64, count=n)
+        for chrom, code in code_of.items():
+            target = self.lookup.get(chrom)
+            if target is None:
+                continue
+            rows = np.flatnonzero(codes == code) if len(code_of) > 1 else np.arange(n)
+            if cursor is None:
+                result = target.liftArray(pos[rows])
+            else:
+                result = target.liftSorted(pos[rows], cursor)
+            n_hits[rows], query_ids[rows], query_pos[rows], fwd[rows] = result
+        return n_hits, query_ids, query_pos, fwd
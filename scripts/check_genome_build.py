@@ -9,23 +9,53 @@
 """
 
 import argparse
+import math
+import os.path as osp
+import random
+import sys
 import textwrap
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from signal import SIG_DFL, SIGPIPE, signal
+from statistics import NormalDist
 
-try:
-    from pyfaidx import Fasta
+from gwas_io import isBGZF, isGzip, openInput, readBGZFLines, readTabixIndex
+
+try:  # optional, reference bases are fetched one by one through pyfaidx without numpy
+    import numpy as np
 except ImportError:
-    import subprocess
-    import sys
+    np = None
+
+REF_BASES = b"ACGTN"  # reference bases kept by get_ref_seq, others are "NA"
+EARLY_STOP_FIRST_LOOK = 100  # SNPs checked before the first look of --early-stop, doubled at each look
+TABIX_LINES_PER_JUMP = 10  # consecutive lines read at each random jump of --sampling tabix
+WORKER_FASTAS = None  # MmapFasta of each --ref, in each worker process of --threads
 
-    print("缺少pyfaidx模块，开始安装...")
+signal(SIGPIPE, SIG_DFL)  # prevent IOError: [Errno 32] Broken pipe. If pipe closed by 'head'.
+###Define function
+def loadFasta():
+    """
+    pyfaidx.Fasta, pyfaidx is installed if missing.
+
+    Imported only when a fasta is read through pyfaidx, the messages and the output of pip go to stderr, so they never
+    mix with output written to stdout, e.g. ref_match.py in a pipe.
+    """
     try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "pyfaidx"], check=True)
-        print("liftover模块安装完成。")
         from pyfaidx import Fasta
-    except subprocess.CalledProcessError:
-        print("安装liftover模块时出错。请手动安装liftover。")
-        sys.exit(1)
-###Define function
+    except ImportError:
+        import subprocess
+
+        sys.stderr.write("缺少pyfaidx模块，开始安装...\n")
+        try:
+            subprocess.run([sys.executable, "-m", "pip", "install", "pyfaidx"], check=True, stdout=sys.stderr)
+            sys.stderr.write("pyfaidx模块安装完成。\n")
+            from pyfaidx import Fasta
+        except subprocess.CalledProcessError:
+            sys.stderr.write("安装pyfaidx模块时出错。请手动安装pyfaidx。\n")
+            sys.exit(1)
+    return Fasta
+
+
 def getParser():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -37,14 +67,20 @@ def getParser():
 
         *Tips:
             1.If input file contain header, --header should be specified.
-            2.the chrname of fasta file should be consistent with input file. e.g.">chr1 GRCh37:1:1:249250621:1" for fasta header, and "chr1 12231 A T" for input file
-            3.Before run this script, it is recommended to remove multiple base pair data. If the matching rate is under 0.9 but more than 0.7, you could try to remove Polymorphic Loci and increase --snp_num to get a solid result.
-            4.No need to figure out which column is actually A1 and A2.
-            5.You could use -i flag to specify a file with each line contain a file address that need to check genome build, or use -f flag to specify a single file to calculate.
+            2.Input files could be plain text, gzip or bgzip.
+            3.the chrname of fasta file should be consistent with input file. e.g.">chr1 GRCh37:1:1:249250621:1" for fasta header, and "chr1 12231 A T" for input file
+            4.Before run this script, it is recommended to remove multiple base pair data. If the matching rate is under 0.9 but more than 0.7, you could try to remove Polymorphic Loci and increase --snp_num to get a solid result.
+            5.No need to figure out which column is actually A1 and A2.
+            6.--early-stop checks the sampled SNPs in random order and stops as soon as the result is statistically settled, clear-cut files need only a few hundred SNPs.
+            7.SNPs are sampled across the whole file (--sampling), a bgzip file with a tabix index (.tbi) is sampled by random seeks without reading the whole file.
+            8.You could use -i flag to specify a file with each line contain a file address that need to check genome build, or use -f flag to specify a single file to calculate.
 
         Example code:
             python check_genome_build.py -i testdata/index_file -c 1 -p 3 -r 4 -a 5 --header --ref GRCh38ref.fasta
             python check_genome_build.py -f input_file -c 1 -p 2 -r 3 -a 4 --header --ref Homo_sapiens_assembly19.fasta
+            python check_genome_build.py -i testdata/index_file -c 1 -p 3 -r 4 -a 5 --header --ref GRCh38ref.fasta --threads $(nproc)
+            python check_genome_build.py -f input_file -c 1 -p 2 -r 3 -a 4 --header --ref GRCh37ref.fasta GRCh38ref.fasta T2Tref.fasta
+            python check_genome_build.py -f input_file.tsv.gz -c chromosome -p base_pair_location -r other_allele -a effect_allele --header --ref GRCh38ref.fasta
 
         """
         ),
@@ -66,30 +102,31 @@ def getParser():
         "-c",
         "--column_chrom",
         required=True,
-        help="Require, column number of chromosome, start from 1",
+        help="Require, column number of chromosome, start from 1, or column name with --header",
     )
     parser.add_argument(
         "-p",
         "--column_pos",
         required=True,
-        help="Require, column number of SNP position, start from 1",
+        help="Require, column number of SNP position, start from 1, or column name with --header",
     )
     parser.add_argument(
         "-r",
         "--column_ref",
         required=True,
-        help="Require, column number of reference allele, start from 1",
+        help="Require, column number of reference allele, start from 1, or column name with --header",
     )
     parser.add_argument(
         "-a",
         "--column_alt",
         required=True,
-        help="Require, column number of alternative allele, start from 1",
+        help="Require, column number of alternative allele, start from 1, or column name with --header",
     )
     parser.add_argument(
         "--ref",
         required=True,
-        help="Require, input reference genome file (fasta format)",
+        nargs="+",
+        help="Require, input reference genome file (fasta format). Several files of different builds, e.g. --ref GRCh37.fasta GRCh38.fasta, are checked in one pass and the best matched build is reported",
     )
     parser.add_argument(
         "--header",
@@ -102,10 +139,169 @@ def getParser():
         type=int,
         help="Optional, set how many SNPs included in this calculation, default is 30000. As the parameter value set higher, the false rate will lower, but the calculation time will also grow higher.",
     )
+    parser.add_argument(
+        "--sampling",
+        default="auto",
+        choices=["auto", "head", "reservoir", "tabix"],
+        help="Optional, how to sample --snp_num SNPs. head: the first lines; reservoir: uniform random lines in one pass over the file; tabix: random seeks to the 16 kb windows of each chromosome of a bgzip file with a .tbi index, stratified by chromosome; auto: tabix if the .tbi index exists, otherwise reservoir. Default is auto.",
+    )
+    parser.add_argument(
+        "--seed",
+        default=42,
+        type=int,
+        help="Optional, random seed of --sampling reservoir/tabix. Default is 42.",
+    )
+    parser.add_argument(
+        "--early-stop",
+        dest="early_stop",
+        action="store_true",
+        help="Optional, check the sampled SNPs in random order, in looks of 100, 200, 400... SNPs, and stop as soon as the Wilson confidence interval of the matching rate is within one of >=0.9, 0.7-0.9 and <0.7 (with several --ref, also the best build is ahead of the second). The number of SNPs used is reported.",
+    )
+    parser.add_argument(
+        "--confidence",
+        default=0.999,
+        type=float,
+        help="Optional, confidence level of the intervals of --early-stop at each look. Default is 0.999.",
+    )
+    parser.add_argument(
+        "--threads",
+        default=1,
+        type=int,
+        help="Optional, number of processes to check the files of -i in parallel, each result is printed as soon as the file is done. Default is 1.",
+    )
 
     return parser
 
 
+def header_mapper(string, header_col):
+    """
+    Map a header string or index to a column index.
+
+    Args:
+        string (str or int): The header string or index (1-based) to be mapped.
+        header_col (list): The list of header strings, None if the file has no header.
+
+    Returns:
+        int: The mapped column index (1-based).
+
+    Notes:
+        - If the input string can be converted to an integer, it is treated as an index.
+        - If the index is negative and there is a header, it is treated as counting from the end of the header.
+        - If the input is a string, it is treated as a header and its index is returned.
+    """
+    try:
+        idx = int(string)
+        if idx < 0 and header_col is not None:
+            idx = len(header_col) + idx + 1
+    except ValueError:
+        if header_col is None:
+            raise ValueError(f"column name {string} needs --header")
+        if string not in header_col:
+            raise ValueError(f"column {string} is not in the header: {header_col}")
+        idx = header_col.index(string) + 1
+    return idx
+
+
+def random_open(rng) -> float:
+    """
+    Uniform random number in (0, 1).
+    """
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+def reservoir_sample(lines, k: int, rng) -> list:
+    """
+    Uniform random sample of k lines in one pass over the lines, by Algorithm L (Li, 1994), which skips lines
+    in runs instead of drawing a random number for each line.
+
+    Args:
+        lines: Iterator of lines.
+        k: Sample size.
+        rng: random.Random.
+
+    Returns:
+        A list of the sampled lines in input order, all lines if there are fewer than k.
+    """
+    if k <= 0:
+        return []
+    items = enumerate(lines)
+    reservoir = list(islice(items, k))
+    if len(reservoir) == k:
+        w = math.exp(math.log(random_open(rng)) / k)
+        while True:
+            skip = math.floor(math.log(random_open(rng)) / math.log1p(-w))
+            item = next(islice(items, skip, None), None)
+            if item is None:
+                break
+            reservoir[rng.randrange(k)] = item
+            w *= math.exp(math.log(random_open(rng)) / k)
+    reservoir.sort()
+    return [line for _, line in reservoir]
+
+
+def has_tabix_index(file_path: str) -> bool:
+    return osp.exists(file_path + ".tbi") and isBGZF(file_path)
+
+
+def tabix_sample(file_path: str, max_lines: int, rng, lines_per_jump: int = TABIX_LINES_PER_JUMP) -> list:
+    """
+    Stratified random sample of a bgzip file with a tabix index, without reading the whole file.
+
+    SNPs are allocated to each chromosome in proportion to its 16 kb windows in the index, then lines_per_jump
+    consecutive lines are read at each of some random windows of the chromosome.
+
+    Args:
+        file_path: Path to the bgzip file, file_path.tbi is the tabix index.
+        max_lines: Sample size.
+        rng: random.Random.
+        lines_per_jump: Lines read at each random window.
+
+    Returns:
+        A list of the sampled lines in file order, fewer than max_lines if the file is small.
+
+    Raises:
+        ValueError: If file_path is not bgzip or has no .tbi index.
+    """
+    if not has_tabix_index(file_path):
+        raise ValueError(
+            f"--sampling tabix needs a bgzip file with a tabix index ({file_path}.tbi), use --sampling auto or reservoir"
+        )
+    index, linear = readTabixIndex(file_path + ".tbi")
+    total = sum(len(offsets) for offsets in linear.values())
+    sampled = []
+    seen_windows = 0
+    with open(file_path, "rb") as f:
+        for name, offsets in linear.items():
+            # largest remainder, quotas sum to max_lines
+            quota = round(max_lines * (seen_windows + len(offsets)) / total) - round(max_lines * seen_windows / total)
+            seen_windows += len(offsets)
+            if quota <= 0:
+                continue
+
+            jumps = min(len(offsets), math.ceil(quota / lines_per_jump))
+            per_jump = math.ceil(quota / jumps)
+            windows = rng.sample(offsets, len(offsets))
+            lines = {}  # line => None, ordered and without the lines read by two close jumps
+            # more jumps if some windows are at the end of the chromosome
+            while len(lines) < quota and windows:
+                jumps = min(len(windows), max(jumps, math.ceil((quota - len(lines)) / per_jump)))
+                for virtual_offset in sorted(windows[:jumps]):
+                    for line in readBGZFLines(f, virtual_offset, per_jump):
+                        line = line.decode()
+                        if line.startswith(index["meta"]) or line.split("\t")[index["col_seq"] - 1] != name:
+                            break
+                        lines[line] = None
+                windows = windows[jumps:]
+            lines = sorted(lines, key=lambda line: int(line.split("\t")[index["col_beg"] - 1]))
+            if len(lines) > quota:
+                lines = [lines[i] for i in sorted(rng.sample(range(len(lines)), quota))]
+            sampled += lines
+    return sampled
+
+
 def parse_input_file(
     file_path: str,
     chr_idx: int,
@@ -114,53 +310,133 @@ def parse_input_file(
     a2_idx: int,
     header: bool,
     max_lines: int,
+    sampling: str = "head",
+    seed: int = None,
 ):
     """
     Parse a single input file to extract specific columns and format the data for the get_ref_seq function.
 
     Args:
-        file_path: Path to the input file that needs to be parsed.
-        chr_idx: Index (1-based) of the column in the file that contains the chromosome or contig name.
-        pos_idx: Index (1-based) of the column in the file that contains the position.
-        a1_idx: Index (1-based) of the column in the file that contains allele 1 (reference allele).
-        a2_idx: Index (1-based) of the column in the file that contains allele 2 (alternative allele).
+        file_path: Path to the input file that needs to be parsed, plain text, gzip or bgzip.
+        chr_idx: Index (1-based) or name (with header) of the column in the file that contains the chromosome or contig name.
+        pos_idx: Index (1-based) or name (with header) of the column in the file that contains the position.
+        a1_idx: Index (1-based) or name (with header) of the column in the file that contains allele 1 (reference allele).
+        a2_idx: Index (1-based) or name (with header) of the column in the file that contains allele 2 (alternative allele).
         header: Boolean indicating whether the file contains a header row.
         max_lines: Maximum number of lines to process from the input file.
+        sampling: How to choose the lines, "head" (the first max_lines lines), "reservoir" (reservoir_sample),
+            "tabix" (tabix_sample) or "auto" (tabix if the file has a .tbi index, otherwise reservoir).
+            Default is "head".
+        seed: Random seed of reservoir and tabix sampling.
 
     Returns:
         A list of strings formatted as "CHR POS A1 A2", which can be used as input for the get_ref_seq function.
 
     Note:
-        The function reads the input file line-by-line, extracts the specified columns, and formats the data.
+        Except for tabix sampling, the function reads the input file line-by-line, keeps only the sampled lines,
+        and extracts the specified columns of them, so the memory does not grow with the file size.
         If the input file contains a header and the header argument is set to True, the header line will be skipped.
+        The header of a tabix indexed file is skipped by the index.
 
     Example:
         file_path_sample = "path_to_input_file.txt"
         results = parse_input_file(file_path_sample, 1, 2, 3, 4, True, 1000)
+        results = parse_input_file(file_path_sample, 1, 2, 3, 4, True, 1000, sampling="reservoir", seed=42)
     """
+    if sampling == "auto":
+        sampling = "tabix" if has_tabix_index(file_path) else "reservoir"
+    rng = random.Random(seed)
+
+    with openInput(file_path) as file:
+        headers = file.readline().strip().split() if header else None
+        columns = [header_mapper(idx, headers) for idx in (chr_idx, pos_idx, a1_idx, a2_idx)]
+        if sampling == "tabix":
+            lines = tabix_sample(file_path, max_lines, rng)
+        elif sampling == "reservoir":
+            lines = reservoir_sample(file, max_lines, rng)
+        else:
+            lines = list(islice(file, max_lines))
 
+    # split only the columns before the last needed one, the rest of the line is left as is
+    max_split = max(columns) if min(columns) > 0 else -1
     results = []
-    line_count = 0
-
-    with open(file_path, "r") as file:
-        if header:
-            headers = file.readline().strip().split()
-        for line in file:
-            parts = line.strip().split()
-            result = [
-                parts[int(chr_idx) - 1],
-                parts[int(pos_idx) - 1],
-                parts[int(a1_idx) - 1],
-                parts[int(a2_idx) - 1],
-            ]
-            results.append(" ".join(result))
-            line_count += 1
-            if line_count >= max_lines:
-                break
+    for line in lines:
+        parts = line.split(None, max_split)
+        results.append(" ".join([parts[idx - 1] for idx in columns]))
 
     return results
 
 
+class MmapFasta:
+    """
+    Reference genome read through an mmap of the uncompressed fasta file, bases are located by the .fai line offsets.
+
+    Args:
+        refSeq_path: Path to the fasta file, the .fai index is built by pyfaidx if it does not exist.
+
+    Usage Examples:
+        fasta = MmapFasta("GRCh38ref.fasta")
+        bases, found = fasta.fetch([["chr1", "12345"], ["chr2", "67890"]])
+    """
+
+    def __init__(self, refSeq_path: str):
+        fai_path = refSeq_path + ".fai"
+        if not osp.exists(fai_path):
+            loadFasta()(refSeq_path, rebuild=False)  # build the .fai
+
+        # contig => (length, offset, line_bases, line_width)
+        self.index = {}
+        with open(fai_path, "r") as fai:
+            for line in fai:
+                ss = line.rstrip("\n").split("\t")
+                self.index[ss[0]] = tuple(int(x) for x in ss[1:5])
+        self.seq = np.memmap(refSeq_path, dtype=np.uint8, mode="r")
+
+    def fetch(self, records: list):
+        """
+        Fetch the reference base of each record, contig by contig in position order, so the fasta is read in one pass.
+
+        Args:
+            records: A list of split lines, the first value is the contig name and the second value is the position (1-based).
+
+        Returns:
+            A tuple of (bases, found). bases is a NumPy uint8 array of the reference base of each record, 0 if the
+            position is not in the contig. found is a bool array, False if the contig is not in the fasta.
+        """
+        positions = np.array([int(ss[1]) for ss in records], dtype=np.int64)
+        bases = np.zeros(len(records), dtype=np.uint8)
+        found = np.zeros(len(records), dtype=bool)
+
+        contig_rows = {}
+        for row, ss in enumerate(records):
+            contig_rows.setdefault(ss[0], []).append(row)
+
+        for contig, rows in contig_rows.items():
+            if contig not in self.index:
+                continue
+            rows = np.array(rows, dtype=np.int64)
+            found[rows] = True
+            bases[rows] = self.fetchContig(contig, positions[rows])
+
+        return bases, found
+
+    def fetchContig(self, contig: str, positions):
+        """
+        Fetch the reference base of 1-based positions of one contig in the fasta, in sorted order.
+
+        Returns:
+            A NumPy uint8 array of the base of each position, 0 if the position is not in the contig.
+        """
+        length, offset, line_bases, line_width = self.index[contig]
+        bases = np.zeros(len(positions), dtype=np.uint8)
+        order = np.argsort(positions, kind="stable")
+        pos = positions[order]
+        in_contig = (pos >= 1) & (pos <= length)
+        order, idx = order[in_contig], pos[in_contig] - 1
+        bases[order] = self.seq[offset + idx // line_bases * line_width + idx % line_bases]
+        return bases
+
+
 def get_ref_seq(pos_data: list, refSeq_path: str, max_lines: int) -> list:
     """
     Get reference seq for position from the specified fasta file and position data.
@@ -181,7 +457,7 @@ def get_ref_seq(pos_data: list, refSeq_path: str, max_lines: int) -> list:
     result = get_ref_seq(pos_data_sample, ref_seq_path)
     """
 
-    genome_ref = Fasta(refSeq_path, rebuild=False)
+    genome_ref = loadFasta()(refSeq_path, rebuild=False)
     line_count = 0
     output_data = []
 
@@ -253,6 +529,341 @@ def calculate_matching_rate(ref_seq_data: list, max_line: int):
     return matching_rate
 
 
+def match_bases(records: list, bases):
+    """
+    Check each SNP against the reference bases from MmapFasta.fetch, vectorised.
+
+    Args:
+        records: A list of split lines, "contig_name position ref_allele alt_allele".
+        bases: NumPy uint8 array of the reference base of each record, from MmapFasta.fetch.
+
+    Returns:
+        A NumPy bool array, True if ref_allele or alt_allele matches the reference base, the same check as
+        calculate_matching_rate.
+
+    Note:
+        Records with a base other than A, T, C, G, N (e.g. soft-masked lowercase bases), out of the contig or on a
+        contig not in the fasta are not matched.
+    """
+    ref_first = np.fromiter((ord(ss[2][0]) for ss in records), dtype=np.int64, count=len(records))
+    alt_first = np.fromiter((ord(ss[3][0]) for ss in records), dtype=np.int64, count=len(records))
+    return np.isin(bases, np.frombuffer(REF_BASES, dtype=np.uint8)) & (
+        (bases == ref_first) | (bases == alt_first)
+    )
+
+
+def calculate_matching_rate_bases(records: list, bases, max_line: int):
+    """
+    Calculate the matching rate of SNPs to the reference bases from MmapFasta.fetch.
+
+    Args:
+        records: A list of split lines, "contig_name position ref_allele alt_allele".
+        bases: NumPy uint8 array of the reference base of each record, from MmapFasta.fetch.
+        max_line: The total number of SNPs considered for the matching rate calculation.
+
+    Returns:
+        A float representing the matching rate, the same as calculate_matching_rate on the output of get_ref_seq.
+    """
+    return int(match_bases(records, bases).sum()) / max_line
+
+
+def get_matched(pos_data: list, refSeq_path: str, max_lines: int, fasta=None) -> list:
+    """
+    Check the first max_lines SNPs in pos_data against the reference genome.
+
+    Args:
+        pos_data: A list of strings, "contig_name position ref_allele alt_allele", from parse_input_file.
+        refSeq_path: Path to the fasta file for reference seq.
+        max_lines: Number of lines to check from pos_data, no more than len(pos_data).
+        fasta: MmapFasta of refSeq_path, or None to look up bases one by one by get_ref_seq.
+
+    Returns:
+        A list of bool, True if the SNP matches the reference.
+    """
+    if fasta is None:
+        matched = []
+        for line in get_ref_seq(pos_data, refSeq_path, max_lines):
+            line = line.split()
+            matched.append(line[4] == line[2][0] or line[4] == line[3][0])
+        return matched
+
+    records = [line.split() for line in pos_data[:max_lines]]
+    bases, _ = fasta.fetch(records)
+    return match_bases(records, bases).tolist()
+
+
+def build_name(refSeq_path: str) -> str:
+    return osp.basename(refSeq_path)
+
+
+def wilson_interval(matched: int, n: int, z: float):
+    """
+    Wilson score interval of a binomial proportion.
+
+    Args:
+        matched: Number of matched SNPs.
+        n: Number of SNPs.
+        z: Standard normal quantile of the confidence level, e.g. 1.96 for 95%.
+
+    Returns:
+        A tuple of (low, high).
+    """
+    rate = matched / n
+    denominator = 1 + z * z / n
+    center = (rate + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / n + z * z / (4 * n * n)) / denominator
+    return center - half_width, center + half_width
+
+
+def rate_level(matching_rate: float) -> int:
+    """
+    Level of the matching rate reported by print_matching_rate: 0 for >=0.9, 1 for 0.7-0.9, 2 for <0.7.
+    """
+    if matching_rate >= 0.9:
+        return 0
+    elif matching_rate >= 0.7:
+        return 1
+    return 2
+
+
+def is_settled(chroms: list, matched_by_ref: dict, z: float) -> bool:
+    """
+    Whether more SNPs would not change the result of --early-stop.
+
+    The Wilson interval of the (best) matching rate is within one level of rate_level, and with several
+    reference genomes, the confidence interval of the margin of the best build over the second is above 0.
+    """
+    if len(matched_by_ref) == 1:
+        best = next(iter(matched_by_ref))
+    else:
+        _, best, _, _, (margin_low, _) = compare_builds(chroms, matched_by_ref, z)
+        if margin_low <= 0:
+            return False
+    low, high = wilson_interval(sum(matched_by_ref[best]), len(chroms), z)
+    return rate_level(low) == rate_level(high)
+
+
+def compare_builds(chroms: list, matched_by_ref: dict, z: float = 1.96):
+    """
+    Matching rate of each reference genome build, overall and per chromosome, and the winning build.
+
+    Args:
+        chroms: Contig name of each SNP.
+        matched_by_ref: {refSeq_path: list of bool of each SNP}, from get_matched.
+
+    Returns:
+        A tuple of (rate_table, best, second, margin, margin_ci).
+        rate_table is a list of (chromosome, n, [matching rate of each reference]), the first row is "all".
+        best and second are the refSeq_path with the highest and second highest overall matching rate.
+        margin is the difference of their matching rates, margin_ci is its confidence interval (low, high)
+        over the paired SNPs, 95% by default of z.
+    """
+    refs = list(matched_by_ref)
+    n = len(chroms)
+    chrom_counts = {}
+    chrom_matched = {ref: {} for ref in refs}
+    for i, chrom in enumerate(chroms):
+        chrom_counts[chrom] = chrom_counts.get(chrom, 0) + 1
+        for ref in refs:
+            if matched_by_ref[ref][i]:
+                chrom_matched[ref][chrom] = chrom_matched[ref].get(chrom, 0) + 1
+
+    overall = [sum(matched_by_ref[ref]) / n for ref in refs]
+    rate_table = [("all", n, overall)]
+    for chrom, count in chrom_counts.items():
+        rate_table.append((chrom, count, [chrom_matched[ref].get(chrom, 0) / count for ref in refs]))
+
+    ranked = sorted(range(len(refs)), key=lambda i: overall[i], reverse=True)
+    best, second = refs[ranked[0]], refs[ranked[1]]
+    # paired difference of each SNP, d is -1, 0 or 1
+    diffs = [int(b) - int(s) for b, s in zip(matched_by_ref[best], matched_by_ref[second])]
+    margin = sum(diffs) / n
+    variance = sum(d * d for d in diffs) / n - margin**2
+    half_width = z * (max(variance, 0) / n) ** 0.5
+    return rate_table, best, second, margin, (margin - half_width, margin + half_width)
+
+
+class sample_looks:
+    """
+    Iterate over the SNPs of each look of --early-stop, EARLY_STOP_FIRST_LOOK SNPs in the first look and doubled
+    in each next look, at most max_lines SNPs in total. The arguments are the same as parse_input_file.
+
+    With tabix sampling, a new stratified sample is drawn for each look, so the SNPs of the looks not needed are
+    never read. Otherwise the whole sample is parsed at once and checked in random order. The number of SNPs
+    sampled so far is the sampled attribute.
+    """
+
+    def __init__(self, file_path, chr_idx, pos_idx, a1_idx, a2_idx, header, max_lines, sampling="head", seed=None):
+        if sampling == "auto":
+            sampling = "tabix" if has_tabix_index(file_path) else "reservoir"
+        self.parse_args = (file_path, chr_idx, pos_idx, a1_idx, a2_idx, header)
+        self.max_lines = int(max_lines)
+        self.sampling = sampling
+        self.seed = seed
+        self.sampled = 0
+
+    def __iter__(self):
+        if self.sampling != "tabix":
+            pos_data = parse_input_file(*self.parse_args, self.max_lines, self.sampling, self.seed)
+            pos_data = random.Random(self.seed).sample(pos_data, len(pos_data))
+            self.sampled = len(pos_data)
+            start, look = 0, EARLY_STOP_FIRST_LOOK
+            while start < len(pos_data):
+                yield pos_data[start:look]
+                start, look = look, look * 2
+            return
+
+        seen = set()  # SNPs sampled by an earlier look are not used again
+        look, look_idx = EARLY_STOP_FIRST_LOOK, 0
+        while self.sampled < self.max_lines:
+            seed = None if self.seed is None else f"{self.seed}-{look_idx}"
+            need = min(look, self.max_lines) - self.sampled
+            batch = [line for line in parse_input_file(*self.parse_args, need, "tabix", seed) if line not in seen]
+            if not batch:  # all SNPs of a small file are sampled
+                return
+            seen.update(batch)
+            self.sampled += len(batch)
+            yield batch
+            look, look_idx = look * 2, look_idx + 1
+
+
+def check_file(
+    file_path: str,
+    chr_idx: int,
+    pos_idx: int,
+    a1_idx: int,
+    a2_idx: int,
+    header: bool,
+    max_lines: int,
+    refSeq_paths: list,
+    fastas: list = None,
+    sampling: str = "head",
+    seed: int = None,
+    early_stop: bool = False,
+    confidence: float = 0.999,
+):
+    """
+    Parse a single input file once and check its SNPs against every reference genome.
+
+    Args:
+        file_path, chr_idx, pos_idx, a1_idx, a2_idx, header, max_lines, sampling, seed: See parse_input_file.
+        refSeq_paths: Paths to the fasta files for reference seq.
+        fastas: MmapFasta of each refSeq_path, None for a reference looked up by pyfaidx. Default is all by pyfaidx.
+        early_stop: Check the SNPs in random order, in looks of EARLY_STOP_FIRST_LOOK SNPs doubled at each look,
+            and stop when is_settled. Default is False.
+        confidence: Confidence level of is_settled at each look.
+
+    Returns:
+        A tuple of (file_path, chroms, matched_by_ref, sampled), see compare_builds. chroms and matched_by_ref
+        are of the SNPs used, sampled is the number of SNPs sampled by sample_looks with early_stop, otherwise None.
+    """
+    if fastas is None:
+        fastas = [None] * len(refSeq_paths)
+
+    if early_stop:
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        chroms = []
+        matched_by_ref = {refSeq_path: [] for refSeq_path in refSeq_paths}
+        looks = sample_looks(file_path, chr_idx, pos_idx, a1_idx, a2_idx, header, max_lines, sampling, seed)
+        for batch in looks:
+            for refSeq_path, fasta in zip(refSeq_paths, fastas):
+                matched_by_ref[refSeq_path] += get_matched(batch, refSeq_path, len(batch), fasta)
+            chroms += [line.split(maxsplit=1)[0] for line in batch]
+            if is_settled(chroms, matched_by_ref, z):
+                break
+        return file_path, chroms, matched_by_ref, looks.sampled
+
+    pos_data = parse_input_file(file_path, chr_idx, pos_idx, a1_idx, a2_idx, header, max_lines, sampling, seed)
+    if len(pos_data) <= int(max_lines):
+        new_max_lines = len(pos_data)
+    else:
+        new_max_lines = max_lines
+    pos_data = pos_data[:new_max_lines]
+
+    chroms = [line.split(maxsplit=1)[0] for line in pos_data]
+    matched_by_ref = {
+        refSeq_path: get_matched(pos_data, refSeq_path, new_max_lines, fasta)
+        for refSeq_path, fasta in zip(refSeq_paths, fastas)
+    }
+    return file_path, chroms, matched_by_ref, None
+
+
+def open_fastas(refSeq_paths: list) -> list:
+    """
+    MmapFasta of each uncompressed fasta, None for bgzip fasta or without numpy, which are looked up by pyfaidx.
+    """
+    return [MmapFasta(path) if np is not None and not isGzip(path) else None for path in refSeq_paths]
+
+
+def init_check_worker(refSeq_paths: list):
+    """
+    Map the reference genomes once in each worker process of --threads. The mappings are read-only, so the pages
+    are shared by all workers through the page cache.
+    """
+    global WORKER_FASTAS
+    WORKER_FASTAS = open_fastas(refSeq_paths)
+
+
+def check_file_worker(file_path: str, options: dict):
+    return check_file(file_path, **options, fastas=WORKER_FASTAS)
+
+
+def print_matching_rate(file_path: str, matching_rate: float):
+    if matching_rate >= 0.9:
+        print("The matching rate of file " + str(file_path) + "is " + str(matching_rate))
+        print("the genome build of this file is consistent with the reference genome build")
+    elif matching_rate < 0.9 and matching_rate >= 0.7:
+        print("The matching rate of file " + str(file_path) + "is " + str(matching_rate))
+        print(
+            "the genome build of this file may consistent with the reference genome build. The low matching rate may due to too many Polymorphic Loci"
+        )
+    elif matching_rate < 0.7:
+        print("The matching rate of file " + str(file_path) + "is " + str(matching_rate))
+        print(
+            "the genome build of this file is not match with the reference genome build. please try other reference genome build"
+        )
+    sys.stdout.flush()
+
+
+def print_build_comparison(file_path: str, chroms: list, matched_by_ref: dict):
+    rate_table, best, second, margin, (low, high) = compare_builds(chroms, matched_by_ref)
+    print("The matching rate of file " + str(file_path) + " to each reference genome build:")
+    print("\t".join(["chromosome", "n"] + [build_name(ref) for ref in matched_by_ref]))
+    for chrom, count, rates in rate_table:
+        print("\t".join([chrom, str(count)] + [f"{rate:.4f}" for rate in rates]))
+
+    best_rate = rate_table[0][2][list(matched_by_ref).index(best)]
+    print(
+        f"the best matched build is {build_name(best)} (matching rate {best_rate:.4f}), "
+        f"{margin:.4f} higher than {build_name(second)} (95% CI {low:.4f} to {high:.4f})"
+    )
+    if best_rate < 0.7:
+        print(
+            "the genome build of this file is not match with any of the reference genome builds. please try other reference genome build"
+        )
+    elif low <= 0:
+        print(
+            f"{build_name(best)} and {build_name(second)} cannot be told apart, please increase --snp_num to get a solid result"
+        )
+    elif best_rate < 0.9:
+        print(
+            f"the genome build of this file may be {build_name(best)}. The low matching rate may due to too many Polymorphic Loci"
+        )
+    else:
+        print(f"the genome build of this file is {build_name(best)}")
+    sys.stdout.flush()
+
+
+def report_file(file_path: str, chroms: list, matched_by_ref: dict, sampled: int = None):
+    if sampled is not None:
+        print(f"{len(chroms)} of {sampled} sampled SNPs of file {file_path} are used (--early-stop)")
+    if len(matched_by_ref) == 1:
+        matched = next(iter(matched_by_ref.values()))
+        print_matching_rate(file_path, sum(matched) / len(matched))
+    else:
+        print_build_comparison(file_path, chroms, matched_by_ref)
+
+
 ###main
 if __name__ == "__main__":
     # parse the args
@@ -269,71 +880,32 @@ if __name__ == "__main__":
     else:
         input_file_array.append(args.input_file)
 
-    # read all files and reformat it into get_ref_seq() format. [[file1snp1,file1snp2],[file2snp1,file2snp2]]
-    parse_file_array = []
-
-    for Files in input_file_array:
-        parse_file_array.append(
-            parse_input_file(
-                Files,
-                args.column_chrom,
-                args.column_pos,
-                args.column_ref,
-                args.column_alt,
-                args.header,
-                args.snp_num,
-            )
-        )
-
-    # get reference sequence base pair.
-    refseq_array = []
-
-    for Files in parse_file_array:
-        if len(Files) <= int(args.snp_num):
-            new_max_lines = len(Files)
-        else:
-            new_max_lines = args.snp_num
-        refseq_array.append(get_ref_seq(Files, args.ref, new_max_lines))
-
-    # calculate genome matching rate.
-    matching_rate_array = []
+    # each file is parsed once, looked up against every --ref and printed as soon as it is done.
+    # an uncompressed fasta is read through mmap in batches, bgzip fasta through pyfaidx one base at a time.
+    options = dict(
+        chr_idx=args.column_chrom,
+        pos_idx=args.column_pos,
+        a1_idx=args.column_ref,
+        a2_idx=args.column_alt,
+        header=args.header,
+        max_lines=args.snp_num,
+        refSeq_paths=args.ref,
+        sampling=args.sampling,
+        seed=args.seed,
+        early_stop=args.early_stop,
+        confidence=args.confidence,
+    )
 
-    for Files in refseq_array:
-        if len(Files) <= int(args.snp_num):
-            new_max_lines = len(Files)
-        else:
-            new_max_lines = args.snp_num
-        matching_rate_array.append(calculate_matching_rate(Files, new_max_lines))
-
-    # print output
-    for n in range(len(parse_file_array)):
-        if matching_rate_array[n] >= 0.9:
-            print(
-                "The matching rate of file "
-                + str(input_file_array[n])
-                + "is "
-                + str(matching_rate_array[n])
-            )
-            print(
-                "the genome build of this file is consistent with the reference genome build"
-            )
-        elif matching_rate_array[n] < 0.9 and matching_rate_array[n] >= 0.7:
-            print(
-                "The matching rate of file "
-                + str(input_file_array[n])
-                + "is "
-                + str(matching_rate_array[n])
-            )
-            print(
-                "the genome build of this file may consistent with the reference genome build. The low matching rate may due to too many Polymorphic Loci"
-            )
-        elif matching_rate_array[n] < 0.7:
-            print(
-                "The matching rate of file "
-                + str(input_file_array[n])
-                + "is "
-                + str(matching_rate_array[n])
-            )
-            print(
-                "the genome build of this file is not match with the reference genome build. please try other reference genome build"
-            )
+    if args.threads > 1 and len(input_file_array) > 1:
+        with ProcessPoolExecutor(
+            max_workers=args.threads,
+            initializer=init_check_worker,
+            initargs=(args.ref,),
+        ) as pool:
+            futures = [pool.submit(check_file_worker, file_path, options) for file_path in input_file_array]
+            for future in as_completed(futures):
+                report_file(*future.result())
+    else:
+        fastas = open_fastas(args.ref)
+        for file_path in input_file_array:
+            report_file(*check_file(file_path, **options, fastas=fastas))
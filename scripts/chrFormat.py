@@ -13,6 +13,13 @@ import warnings
 import textwrap
 from signal import SIG_DFL, SIGPIPE, signal
 
+from chrom_table import ChromTable, numericChr, prefixedChr
+from gwas_io import openInput, openOutput
+
+# chrFormat.py also removes leading "0" and converts "m" to 25
+NOCHR_TABLE = ChromTable(numericChr, strip_zero=True, m_as_mt=True)
+CHR_TABLE = ChromTable(prefixedChr, strip_zero=True)
+
 
 warnings.filterwarnings("ignore")
 signal(
@@ -54,37 +61,11 @@ def formatChr(x, nochr=True):
         - ValueError will be raised if the given chromosome identifier is invalid.
         - When nochr is True, "x", "y", "mt" will be converted to 23, 24, 25.
         - When nochr is False, 23, 24, 25 will be converted to "chrX", "chrY", "chrMT".
+        - Values are looked up in the memoized tables NOCHR_TABLE and CHR_TABLE.
     """
-    if isinstance(x, int):
-        x = str(x)
-    if x.startswith("0"):
-        x = x.lstrip("0")
     if nochr:
-        x = x.lower()
-        # remove chr
-        if x.startswith("chr"):
-            x = x.lstrip("chr")
-
-        # turn x, y, mt => 23, 24, 25
-        if x == "x":
-            x = "23"
-        elif x == "y":
-            x = "24"
-        elif x == "mt" or x == "m":
-            x = "25"
-
-        return x
-    else:
-        if x not in ["23", "24", "25"]:
-            x = "chr" + x
-        else:
-            if x == "23":
-                x = "chrX"
-            elif x == "24":
-                x = "chrY"
-            elif x == "25":
-                x = "chrMT"
-        return x
+        return NOCHR_TABLE[x]
+    return CHR_TABLE[x]
 
 def getParser():
     parser = argparse.ArgumentParser(
@@ -104,6 +85,27 @@ def getParser():
     parser.add_argument("-c", "--col", dest="col", type=int, default=1, help="Column index for the ID to be replaced. Default is 1.")
     parser.add_argument("-a", "--add-chr", dest="add_chr", action="store_true", default=False, help="Add 'chr' prefix to the chr column of the ID. Default is False.")
     parser.add_argument("-d", "--delimiter", dest="delimiter", default=None, help="Delimiter for the input file. Default is any whitespace.")
+    parser.add_argument(
+        "-I",
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip). Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
 
     return parser
 
@@ -118,20 +120,24 @@ if __name__ == "__main__":
     delimiter = args.delimiter if args.delimiter else None
     outDelimiter = "\t" if delimiter is None else delimiter
 
+    chr_table = CHR_TABLE if addChr else NOCHR_TABLE
+
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
     line_idx = 1
-    for line in sys.stdin:
+    for line in input_file:
         line = line.strip()  # remove \n
         if line_idx == 1:
             ss = line 
 
         else:
             ss = line.split()
-            ss[col - 1] = formatChr(ss[col - 1], not addChr)
+            ss[col - 1] = chr_table[ss[col - 1]]
             ss = outDelimiter.join(ss)
-        sys.stdout.write(f"{ss}\n")
+        output_file.write(f"{ss}\n")
         line_idx += 1
 
-
-sys.stdout.close()
-sys.stderr.flush()
-sys.stderr.close()
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description:       : memoized chromosome normalisation shared by the scripts
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+
+MAX_CACHE_SIZE = 65536  # distinct tokens kept in a table, more are normalised without caching
+
+
+def numericChr(x, strip_zero=False, m_as_mt=False):
+    """
+    Remove "chr" prefix and convert x, y, mt to 23, 24, 25.
+
+    Args:
+        x (str/int): Input chromosome identifier.
+        strip_zero (bool): Remove leading "0", e.g. "01" => "1". Default is False.
+        m_as_mt (bool): Convert "m" to 25 as "mt". Default is False.
+
+    Returns:
+        str: Formatted chromosome identifier, e.g. "chrX" => "23", "chr1" => "1".
+    """
+    if isinstance(x, int):
+        x = str(x)
+    if strip_zero and x.startswith("0"):
+        x = x.lstrip("0")
+
+    x = x.lower()
+    # remove chr
+    if x.startswith("chr"):
+        x = x.lstrip("chr")
+    # turn x, y, mt => 23, 24, 25
+    if x == "x":
+        x = "23"
+    elif x == "y":
+        x = "24"
+    elif x == "mt" or (m_as_mt and x == "m"):
+        x = "25"
+    return x
+
+
+def prefixedChr(x, strip_zero=False):
+    """
+    Add "chr" prefix and convert 23, 24, 25 to chrX, chrY, chrMT.
+
+    Args:
+        x (str/int): Input chromosome identifier.
+        strip_zero (bool): Remove leading "0", e.g. "01" => "chr1". Default is False.
+
+    Returns:
+        str: Formatted chromosome identifier, e.g. "23" => "chrX", "1" => "chr1".
+    """
+    if isinstance(x, int):
+        x = str(x)
+    if strip_zero and x.startswith("0"):
+        x = x.lstrip("0")
+
+    if x == "23":
+        x = "chrX"
+    elif x == "24":
+        x = "chrY"
+    elif x == "25":
+        x = "chrMT"
+    else:
+        x = "chr" + x
+    return x
+
+
+def liftoverChr(x):
+    """
+    Remove "chr" prefix and convert x/23, y/24, mt/25 to X, Y, MT, which is the chromosome of liftover.
+
+    Args:
+        x (str/int): Input chromosome identifier.
+
+    Returns:
+        str: Formatted chromosome identifier, e.g. "chrX" => "X", "23" => "X", "01" => "1".
+    """
+    if isinstance(x, int):
+        x = str(x)
+    if x.startswith("0"):
+        x = x.lstrip("0")
+
+    x = x.lower()
+    # remove chr
+    if x.startswith("chr"):
+        x = x.lstrip("chr")
+    # turn x, y, mt => 23, 24, 25
+    if x == "x" or x == "23":
+        x = "X"
+    elif x == "y" or x == "24":
+        x = "Y"
+    elif x == "mt" or x == "25":
+        x = "MT"
+    return x
+
+
+def phewebChr(x):
+    """
+    Add "chr" prefix to numeric chromosome, 23, 24, 25, 26 => chrX, chrY, chrX, chrMT (plink numbering).
+
+    Args:
+        x (str): Input chromosome identifier.
+
+    Returns:
+        str or None: Formatted chromosome identifier, values start with "chr" or not numeric are returned as is, numeric over 26 is None.
+    """
+    if x.startswith("chr"):
+        return x
+    elif x.isdigit():
+        if int(x) < 23:
+            return "chr" + str(int(x))
+        else:
+            if x == "23":
+                return "chrX"
+            elif x == "24":
+                return "chrY"
+            elif x == "25":
+                return "chrX"
+            elif x == "26":
+                return "chrMT"
+    else:
+        return x
+
+
+def commonTokens():
+    """
+    Chromosome tokens usually seen in files: 1-26, X, Y, M, MT with or without "chr"/"Chr"/"CHR" prefix, upper or lower case and leading "0".
+    """
+    names = [str(i) for i in range(1, 27)] + ["X", "Y", "M", "MT"]
+    tokens = []
+    for name in names:
+        for case in {name, name.lower()}:
+            tokens += [case, "chr" + case, "Chr" + case, "CHR" + case]
+        if name.isdigit() and len(name) == 1:
+            tokens.append("0" + name)
+    return tokens
+
+
+class ChromTable(dict):
+    """
+    Memoized mapping of raw chromosome token => normalised value.
+
+    Common tokens are computed when the table is built, other tokens are computed once on the first lookup.
+    Lookup is a dict lookup, table[x], and the table can be called like the function, table(x).
+
+    Args:
+        func (function): Normalise function, e.g. numericChr.
+        **kwargs: Keyword arguments of func.
+
+    Usage Examples:
+        table = ChromTable(numericChr, strip_zero=True)
+        table["chrX"]  # Returns "23"
+        table("01")  # Returns "1"
+    """
+
+    def __init__(self, func, **kwargs):
+        super().__init__()
+        self.func = func
+        self.kwargs = kwargs
+        for token in commonTokens():
+            self[token] = func(token, **kwargs)
+
+    def __missing__(self, x):
+        value = self.func(x, **self.kwargs)
+        if len(self) < MAX_CACHE_SIZE:
+            self[x] = value
+        return value
+
+    def __call__(self, x):
+        return self[x]
+
+
+NUMERIC_CHR = ChromTable(numericChr)  # "chrX" => "23"
+PREFIXED_CHR = ChromTable(prefixedChr)  # "23" => "chrX"
+LIFTOVER_CHR = ChromTable(liftoverChr)  # "chr23" => "X"
+PHEWEB_CHR = ChromTable(phewebChr)  # "25" => "chrX"
@@ -9,15 +9,30 @@
 version = "GWAS-SSF v0.1"
 
 import argparse
+import csv
+import fnmatch
 import os.path as osp
 import os
+import re
+import sqlite3
+import sys
 import time
 import textwrap
+import gc
 import hashlib
+import itertools
+import json
+import mmap
+import operator
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import yaml
 
 
 DEFAULT_NA = "NA"
+CHECKSUM_CHUNK_SIZE = 16 * 1024 * 1024  # bytes of each hash update, hashlib releases the GIL while hashing
+TREE_BLOCK_SIZE = 4 * 1024 * 1024  # bytes of each leaf of the tree hash
+CHECKSUM_CACHE_SUFFIX = ".checksum.json"  # sidecar cache of the checksums, next to the data file
 FIELDS = [
     "gwas_id",
     "genotyping_technology",
@@ -40,48 +55,35 @@ FIELDS = [
     "url",
     "project_shortname",
 ]
-
-
-def open_file(file, mode=None):
-    if file.endswith(".gz"):
-        try:
-            import gzip
-
-            if mode is None:
-                mode = "rt"
-            return gzip.open(file, mode)
-        except ImportError:
-            raise ImportError("gzip is not installed")
-    else:
-        if mode is None:
-            mode = "r"
-        return open(file, mode)
-
-
-def IsListSorted_fastk(
-    file, key=lambda x, y: x <= y, sep="\t", cols=[0, 1], ele_key=int
-):
-    # source:https://www.cnblogs.com/clover-toeic/p/5600246.html
-
-    with open_file(file) as f:
-        header = f.readline()
-        prev = f.readline().split(sep)
-        prev = [ele_key(prev[i]) for i in cols]
-
-        for line in f.readlines():
-            line = line.split(sep)
-            cur = [ele_key(line[i]) for i in cols]
-
-            if not key(prev, cur):
-                return False
-            prev = cur
-    return True
+OPTIONAL_FIELDS = ["data_file_tree_hash", "variant_count"]  # written only if computed, e.g. by --tree-hash, --stats
+DATA_PATTERNS = ["*.tsv.gz", "*.tsv"]  # data files of --recursive
+META_SUFFIX = "-meta.yaml"
+META_INDEX_NAME = "meta_index.tsv"  # summary index of --recursive, in the top directory
+DATA_FIELDS = ["is_sorted", "data_file_tree_hash", "variant_count"]  # only from the data, never kept from an old meta file
+INDEX_KEY_FIELDS = ["data_file", "data_file_size", "data_file_mtime_ns"]  # a data file is regenerated if these change
+CATALOG_TABLE = "studies"  # table of --catalog, one row per data file, data_file is the absolute path
+# SQLite type affinity of the catalog columns, others are TEXT; "2022" in an INTEGER column is stored as 2022
+CATALOG_TYPES = {
+    "data_file_size": "INTEGER",
+    "data_file_mtime_ns": "INTEGER",
+    "samples_size": "INTEGER",
+    "minor_allele_freq_lower_limit": "REAL",
+    "is_sorted": "INTEGER",
+    "is_harmonised": "INTEGER",
+    "year": "INTEGER",
+    "variant_count": "INTEGER",
+}
+CATALOG_INDEXES = [["trait_description"], ["samples_ancestry"], ["genome_assembly"], ["samples_size"]]
+CONDITION_PATTERN = re.compile(r"^(\w+)(<=|>=|!=|=|<|>)(.*)$")  # FIELD OP VALUE of --query
+# GWAS-SSF columns read by scanFile
+CHROM_COL, POS_COL, EAF_COL, N_COL = "chromosome", "base_pair_location", "effect_allele_frequency", "n"
 
 
 class metaGWAS:
     def __init__(self, **kwargs):
         self.keywords = FIELDS
         self.meta = {k: kwargs.get(k, DEFAULT_NA) for k in self.keywords}
+        self.meta.update({k: kwargs[k] for k in OPTIONAL_FIELDS if k in kwargs})
 
     def write(self, filename):
         with open(filename, "w") as f:
@@ -106,16 +108,39 @@ def getParser():
             generateMetaFile.py -i yourfile 
         2. -s will check the file is sorted or not:
             generateMetaFile.py -i yourfile -s 
+        3. fill samples_size, minor_allele_freq_lower_limit, coordinate_system and variant_count, and check the order, in one read of the file:
+            generateMetaFile.py -i yourfile --stats -s
+        4. also compute a BLAKE2b tree hash in the same read pass as md5, checksums are cached in yourfile.checksum.json:
+            generateMetaFile.py -i yourfile --tree-hash --threads 4
+        5. update the meta files of a whole tree, only data files changed since the last run are read, the summary
+           of all studies is written to GWAS-Summary-Statistics/meta_index.tsv:
+            generateMetaFile.py --recursive GWAS-Summary-Statistics -s --stats --workers 8
+        6. keep a catalog of all studies, and find them without opening the meta files:
+            generateMetaFile.py --recursive GWAS-Summary-Statistics -s --stats --catalog studies.sqlite
+            generateMetaFile.py --catalog studies.sqlite --query genome_assembly=GRCh38 samples_ancestry=EUR trait_description=CAD 'samples_size>100000'
         """
         ),
     )
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
         "-i",
         "--input",
         dest="input",
-        required=True,
         help="input meta file",
     )
+    inputs.add_argument(
+        "--recursive",
+        dest="recursive",
+        default=None,
+        help=f"directory of data files ({' '.join(DATA_PATTERNS)}), meta files are written for new data files and those whose size or mtime changed since the last run, other fields of an existing meta file (e.g. filled by hand) are kept",
+    )
+    inputs.add_argument(
+        "--query",
+        dest="query",
+        nargs="*",
+        default=None,
+        help="print the studies of --catalog matching all conditions FIELD=VALUE, FIELD!=VALUE, FIELD>NUMBER, FIELD>=NUMBER, FIELD<NUMBER or FIELD<=NUMBER as TSV, e.g. --query trait_description=CAD samples_ancestry=EUR genome_assembly=GRCh38 'samples_size>100000'",
+    )
     parser.add_argument(
         "-s",
         "--check_sort",
@@ -123,6 +148,63 @@ def getParser():
         action="store_true",
         help="check if the file is sorted",
     )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        action="store_true",
+        help="fill samples_size (max of n), minor_allele_freq_lower_limit (min MAF of effect_allele_frequency), coordinate_system (0-based if any base_pair_location is 0) and variant_count, from the same read as md5 and -s",
+    )
+    parser.add_argument(
+        "--tree-hash",
+        dest="tree_hash",
+        action="store_true",
+        help="also compute a BLAKE2b tree hash (data_file_tree_hash) of 4 MiB blocks, in the same read pass as md5",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="number of threads of the tree hash, md5 has its own thread. Default: 1",
+    )
+    parser.add_argument(
+        "--no-checksum-cache",
+        dest="no_checksum_cache",
+        action="store_true",
+        help=f"do not read or write the checksum cache (*{CHECKSUM_CACHE_SUFFIX}), which is reused while the size, mtime and inode of the file are unchanged, --stats and -s results are cached too",
+    )
+    parser.add_argument(
+        "--pattern",
+        dest="pattern",
+        nargs="+",
+        default=DATA_PATTERNS,
+        help=f"file name patterns of data files with --recursive. Default: {' '.join(DATA_PATTERNS)}",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="number of processes reading data files with --recursive. Default: 1",
+    )
+    parser.add_argument(
+        "--force",
+        dest="force",
+        action="store_true",
+        help="with --recursive, regenerate every meta file, e.g. after adding -s or --stats",
+    )
+    parser.add_argument(
+        "--catalog",
+        dest="catalog",
+        default=None,
+        help="SQLite catalog of studies, the rows of -i or of all data files of --recursive are updated (data files removed from DIR are dropped), read by --query",
+    )
+    parser.add_argument(
+        "--index",
+        dest="index",
+        default=None,
+        help=f"summary index of --recursive, one line per data file with its meta fields. Default: DIR/{META_INDEX_NAME}",
+    )
     return parser
 
 
@@ -141,12 +223,274 @@ def parseFileName(filename):
         return None
 
 
-def checksum(filename, hash_factory=hashlib.md5, chunk_num_blocks=128):
+def hashChunks(h, view, chunk_size=CHECKSUM_CHUNK_SIZE):
+    for start in range(0, len(view), chunk_size):
+        h.update(view[start : start + chunk_size])
+    return h.hexdigest()
+
+
+def checksum(filename, hash_factory=hashlib.md5, chunk_size=CHECKSUM_CHUNK_SIZE):
+    """
+    Hash a file through mmap, in large chunks so hashlib releases the GIL for most of the time.
+    """
     h = hash_factory()
+    if os.path.getsize(filename) == 0:  # empty file could not be mapped
+        return h.hexdigest()
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            return hashChunks(h, view, chunk_size)
+        finally:
+            view.release()
+
+
+def treeLeaf(view):
+    return hashlib.blake2b(view, digest_size=32).digest()
+
+
+def multiChecksum(filename, tree_hash=False, threads=1):
+    """
+    MD5 and optionally a BLAKE2b tree hash of a file, in one pass over an mmap of the file.
+
+    Args:
+        filename (str): Path of the file.
+        tree_hash (bool): Also compute the tree hash. Default is False.
+        threads (int): Number of threads hashing the blocks of the tree hash, md5 runs in its own thread.
+
+    Returns:
+        dict: {"md5": hex digest}, and "tree_hash" if tree_hash is True.
+
+    Notes:
+        - The tree hash is the BLAKE2b-256 of the concatenated BLAKE2b-256 digests of each TREE_BLOCK_SIZE block,
+          the blocks are independent, so they are hashed in parallel while md5 runs through the file.
+        - Both read the same mapped pages, so the file is read from disk once.
+    """
+    if not tree_hash:
+        return {"md5": checksum(filename)}
+
+    if os.path.getsize(filename) == 0:  # empty file could not be mapped
+        return {"md5": hashlib.md5().hexdigest(), "tree_hash": hashlib.blake2b(digest_size=32).hexdigest()}
+
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            with ThreadPoolExecutor(threads + 1) as pool:
+                md5 = pool.submit(hashChunks, hashlib.md5(), view)
+                blocks = [view[start : start + TREE_BLOCK_SIZE] for start in range(0, len(view), TREE_BLOCK_SIZE)]
+                leaves = list(pool.map(treeLeaf, blocks))
+                result = {
+                    "md5": md5.result(),
+                    "tree_hash": hashlib.blake2b(b"".join(leaves), digest_size=32).hexdigest(),
+                }
+            for block in blocks:
+                block.release()
+        finally:
+            view.release()
+    return result
+
+
+def inflateChunks(chunks):
+    """
+    Decompress gzip chunks, including multi-member gzip and bgzip.
+    """
+    d = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    for chunk in chunks:
+        while chunk:
+            yield d.decompress(chunk)
+            if d.eof:  # next member
+                chunk = d.unused_data
+                d = zlib.decompressobj(zlib.MAX_WBITS | 32)
+            else:
+                chunk = b""
+
+
+def iterLineBlocks(chunks):
+    """
+    Complete lines of each chunk of bytes, without "\\n"; a partial line is carried over to the next chunk.
+    """
+    tail = b""
+    for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        yield lines
+    if tail:
+        yield [tail]
+
+
+def numbers(values):
+    """
+    float of values, skipping NA and other non-numeric values.
+    """
+    try:
+        return list(map(float, values))
+    except ValueError:
+        numeric = []
+        for value in values:
+            try:
+                numeric.append(float(value))
+            except ValueError:
+                pass
+        return numeric
+
+
+def scanFile(filename, tree_hash=False, sep="\t"):
+    """
+    Checksums, order and statistics of a GWAS-SSF file, in one read of the file with constant memory.
+
+    The compressed bytes are hashed as they are read, then decompressed and parsed line by line.
+
+    Args:
+        filename (str): Path of the file, plain text or gzip/bgzip.
+        tree_hash (bool): Also compute the tree hash, see multiChecksum. Default is False.
+        sep (str): Column separator. Default is tab.
+
+    Returns:
+        dict: "md5" (and "tree_hash"), and "stats" of
+            is_sorted: True if each line has (chromosome, base_pair_location), compared as a pair of integers, not less
+                than that of the line before; equal pairs are sorted. None if a chromosome is not an integer.
+            variant_count: number of data lines.
+            minor_allele_freq_lower_limit: min of min(f, 1 - f) of effect_allele_frequency, None without values.
+            samples_size: max of n, None without values.
+            coordinate_system: "0-based" if any base_pair_location is 0, otherwise "1-based"; None without lines.
+
+    Notes:
+        - chromosome and base_pair_location are the first two columns if they are not in the header.
+    """
+    md5 = hashlib.md5()
+    leaves = []
+
+    def rawChunks():
+        with open(filename, "rb") as f:
+            while chunk := f.read(TREE_BLOCK_SIZE):
+                md5.update(chunk)
+                if tree_hash:
+                    leaves.append(treeLeaf(chunk))
+                yield chunk
+
     with open(filename, "rb") as f:
-        while chunk := f.read(chunk_num_blocks * h.block_size):
-            h.update(chunk)
-    return h.hexdigest()
+        gzipped = f.read(2) == b"\x1f\x8b"
+    blocks = iterLineBlocks(inflateChunks(rawChunks()) if gzipped else rawChunks())
+    header = []
+    for lines in blocks:
+        if lines:
+            header = lines.pop(0).rstrip(b"\r").decode().split(sep)
+            blocks = itertools.chain([lines], blocks)
+            break
+    chrom_col = header.index(CHROM_COL) if CHROM_COL in header else 0
+    pos_col = header.index(POS_COL) if POS_COL in header else 1
+    eaf_col = header.index(EAF_COL) if EAF_COL in header else None
+    n_col = header.index(N_COL) if N_COL in header else None
+
+    sep = sep.encode()
+    max_split = max(col for col in [chrom_col, pos_col, eaf_col, n_col] if col is not None) + 1
+    is_sorted, prev = True, None
+    count, min_maf, max_n, zero_based = 0, None, None, False
+    # each block is parsed column by column, so the loops run in map, min and max; the split rows of a block have
+    # no reference cycles, the collector is paused as it would rescan them again and again
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for lines in blocks:
+            rows = [line.split(sep, max_split) for line in lines if line]
+            if not rows:
+                continue
+            count += len(rows)
+            pos = list(map(int, [ss[pos_col] for ss in rows]))
+            zero_based = zero_based or 0 in pos
+            if is_sorted:
+                try:
+                    keys = list(zip(map(int, [ss[chrom_col] for ss in rows]), pos))
+                except ValueError:  # X, MT, ...
+                    is_sorted = None
+                else:
+                    if (prev is not None and keys[0] < prev) or any(map(operator.gt, keys, keys[1:])):
+                        is_sorted = False
+                    prev = keys[-1]
+            if eaf_col is not None:
+                eaf = numbers([ss[eaf_col] for ss in rows])
+                if eaf:
+                    maf = min(min(eaf), 1 - max(eaf))
+                    min_maf = maf if min_maf is None else min(min_maf, maf)
+            if n_col is not None:
+                n = numbers([ss[n_col] for ss in rows])
+                if n:
+                    max_n = int(max(n)) if max_n is None else max(max_n, int(max(n)))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    result = {"md5": md5.hexdigest()}
+    if tree_hash:
+        result["tree_hash"] = hashlib.blake2b(b"".join(leaves), digest_size=32).hexdigest()
+    result["stats"] = {
+        "is_sorted": is_sorted,
+        "variant_count": count,
+        "minor_allele_freq_lower_limit": None if min_maf is None else round(min_maf, 10),  # 1 - 0.9 is 0.0999...
+        "samples_size": max_n,
+        "coordinate_system": ("0-based" if zero_based else "1-based") if count else None,
+    }
+    return result
+
+
+def fileKey(filename):
+    """
+    (size, mtime in ns, inode) of a file, the checksum cache is valid while it is unchanged.
+    """
+    file_stat = os.stat(filename)
+    return [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino]
+
+
+def cachedFileInfo(filename, tree_hash=False, stats=False, threads=1, use_cache=True):
+    """
+    Checksums, and stats if asked, of a file, reused from the sidecar cache filename + CHECKSUM_CACHE_SUFFIX if the
+    file is unchanged.
+
+    Args:
+        filename (str): Path of the file.
+        tree_hash (bool): Also compute the tree hash. Default is False.
+        stats (bool): Also scan the lines, see scanFile. Default is False.
+        threads (int): See multiChecksum.
+        use_cache (bool): Read and write the cache. Default is True.
+
+    Returns:
+        dict: See multiChecksum, and "stats" of scanFile if stats is True.
+
+    Notes:
+        - The cache is a JSON file of the key (size, mtime, inode) and the results, it is written by rename,
+          so a reader never sees a partial file. The cache is skipped if the directory is not writable.
+        - With stats the checksums come from the same read as the stats, threads is not used.
+    """
+    cache_path = filename + CHECKSUM_CACHE_SUFFIX
+    key = fileKey(filename)
+    needed = ["md5"] + (["tree_hash"] if tree_hash else []) + (["stats"] if stats else [])
+    cached = {}
+    if use_cache and osp.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        if cached.get("key") == key and all(name in cached for name in needed):
+            return {name: cached[name] for name in needed}
+        if cached.get("key") != key:
+            cached = {}
+
+    if stats:
+        result = scanFile(filename, tree_hash)
+    else:
+        result = multiChecksum(filename, tree_hash, threads)
+    if use_cache and fileKey(filename) == key:  # not changed while reading
+        cached.update(result)
+        cached["key"] = key
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if osp.exists(tmp_path):
+                os.remove(tmp_path)
+    return result
 
 
 def getfilename(file):
@@ -164,24 +508,42 @@ def getLastModifyTime(file):
     return formatted_time
 
 
-if __name__ == "__main__":
-    parser = getParser()
-    args = parser.parse_args()
+def generateMeta(
+    file, check_sort=False, stats=False, tree_hash=False, threads=1, use_cache=True, keep=False, fields=None
+):
+    """
+    Write the meta file of a data file.
+
+    Args:
+        file (str): Path of the data file.
+        check_sort (bool): Fill is_sorted. Default is False.
+        stats (bool): Fill samples_size, minor_allele_freq_lower_limit, coordinate_system and variant_count.
+        tree_hash (bool): Fill data_file_tree_hash. Default is False.
+        threads (int): Threads of the tree hash.
+        use_cache (bool): Use the checksum cache. Default is True.
+        keep (bool): Keep the fields of an existing meta file which are not computed here, except DATA_FIELDS which
+            would be out of date. Default is False.
+        fields (dict, optional): Fields known by the caller, e.g. {"is_harmonised": True} of ref_match.py.
+
+    Returns:
+        tuple: (path of the meta file, meta dict)
+    """
     res_dict = {}
-    file = args.input
-
     res_dict["file_type"] = version
     # get md5
 
     filename = getfilename(file)
-    metaFileName = filename + "-meta.yaml"
-    md5 = checksum(file)
+    metaFileName = filename + META_SUFFIX
+    scan = stats or check_sort  # -s reads the lines anyway, so the checksum comes from the same read
+    checksums = cachedFileInfo(file, tree_hash=tree_hash, stats=scan, threads=threads, use_cache=use_cache)
 
     res_dict["data_file_name"] = filename
-    res_dict["data_file_md5sum"] = md5
+    res_dict["data_file_md5sum"] = checksums["md5"]
+    if tree_hash:
+        res_dict["data_file_tree_hash"] = checksums["tree_hash"]
 
     # get additional info
-    getAdditonalInfo = parseFileName(filename)
+    getAdditonalInfo = parseFileName(osp.basename(filename))
     if getAdditonalInfo is not None:
         phenotype, ancestry, year, build, projectShortName = getAdditonalInfo
         res_dict["trait_description"] = phenotype
@@ -192,17 +554,324 @@ if __name__ == "__main__":
 
     # isSorted
 
-    if args.check_sort:
-        isSorted = IsListSorted_fastk(
-            file, key=lambda x, y: x <= y, sep="\t", cols=[0, 1], ele_key=int
-        )
-        res_dict["is_sorted"] = isSorted
-        soted_end = time.time()
+    if check_sort:
+        isSorted = checksums["stats"]["is_sorted"]
+        res_dict["is_sorted"] = DEFAULT_NA if isSorted is None else isSorted
+
+    # stats
+    if stats:
+        for k in ["samples_size", "minor_allele_freq_lower_limit", "coordinate_system", "variant_count"]:
+            if checksums["stats"][k] is not None:
+                res_dict[k] = checksums["stats"][k]
 
     # last modified time
 
     last_modified_time = getLastModifyTime(file)
     res_dict["date_last_modified"] = last_modified_time
+    if fields:
+        res_dict.update(fields)
+
+    if keep and osp.exists(metaFileName):
+        for k, v in readMeta(metaFileName).items():
+            if k not in res_dict and k not in DATA_FIELDS and v != DEFAULT_NA:
+                res_dict[k] = v
 
     gwas = metaGWAS(**res_dict)
     gwas.write(metaFileName)
+    return metaFileName, gwas.meta
+
+
+def readMeta(metaFileName):
+    with open(metaFileName, "r") as f:
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+
+
+def updateMeta(metaFileName, **fields):
+    """
+    Set fields of a meta file, the others are kept, the file is created if not exists.
+
+    Usage Examples:
+        updateMeta("sumstats-meta.yaml", is_harmonised=True)
+    """
+    meta = readMeta(metaFileName) if osp.exists(metaFileName) else {}
+    meta.update(fields)
+    gwas = metaGWAS(**meta)
+    gwas.write(metaFileName)
+    return gwas.meta
+
+
+def findDataFiles(directory, patterns=DATA_PATTERNS, exclude=()):
+    """
+    Data files under directory, sorted; checksum caches, meta files and the paths in exclude are skipped.
+    """
+    exclude = {osp.abspath(path) for path in exclude}
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            if name.endswith(CHECKSUM_CACHE_SUFFIX) or name.endswith(META_SUFFIX):
+                continue
+            path = osp.join(root, name)
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns) and osp.abspath(path) not in exclude:
+                files.append(path)
+    return files
+
+
+def readIndex(index_path):
+    """
+    {data_file: row} of the summary index, {} if it does not exist.
+    """
+    if not osp.exists(index_path):
+        return {}
+    with open(index_path, "r", newline="") as f:
+        return {row["data_file"]: row for row in csv.DictReader(f, delimiter="\t")}
+
+
+def writeIndex(index_path, rows):
+    """
+    Write the summary index by rename, so a reader never sees a partial file.
+    """
+    fields = INDEX_KEY_FIELDS + FIELDS + OPTIONAL_FIELDS
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, delimiter="\t", restval=DEFAULT_NA, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, index_path)
+
+
+def isStale(file, index_row):
+    """
+    The meta file of file is missing, or file changed since the last run.
+
+    Without an index row (e.g. the first run over an existing tree), the meta file is up to date if it is newer
+    than the data file.
+    """
+    metaFileName = getfilename(file) + META_SUFFIX
+    if not osp.exists(metaFileName):
+        return True
+    file_stat = os.stat(file)
+    if index_row is None:
+        return os.stat(metaFileName).st_mtime_ns < file_stat.st_mtime_ns
+    return [index_row["data_file_size"], index_row["data_file_mtime_ns"]] != [
+        str(file_stat.st_size),
+        str(file_stat.st_mtime_ns),
+    ]
+
+
+def studyRow(file, meta):
+    """
+    Row of the index and the catalog: absolute path, size and mtime of the data file, and its meta fields.
+    """
+    file_stat = os.stat(file)
+    row = {
+        "data_file": osp.abspath(file),
+        "data_file_size": file_stat.st_size,
+        "data_file_mtime_ns": file_stat.st_mtime_ns,
+    }
+    row.update({k: DEFAULT_NA if v is None else v for k, v in meta.items()})
+    return row
+
+
+def indexRow(directory, file, meta):
+    row = studyRow(file, meta)
+    row["data_file"] = osp.relpath(file, directory)
+    return row
+
+
+def catalogColumns():
+    return INDEX_KEY_FIELDS + FIELDS + OPTIONAL_FIELDS
+
+
+def openCatalog(catalog_path):
+    """
+    Open the catalog, creating the table and its indexes, and adding the columns of new meta fields.
+    """
+    conn = sqlite3.connect(catalog_path)
+    columns = catalogColumns()
+    definitions = ["data_file TEXT PRIMARY KEY"] + [
+        f"{k} {CATALOG_TYPES.get(k, 'TEXT')}" for k in columns if k != "data_file"
+    ]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} ({', '.join(definitions)})")
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({CATALOG_TABLE})")}
+    for k in columns:
+        if k not in existing:
+            conn.execute(f"ALTER TABLE {CATALOG_TABLE} ADD COLUMN {k} {CATALOG_TYPES.get(k, 'TEXT')}")
+    for index_columns in CATALOG_INDEXES:
+        name = f"{CATALOG_TABLE}_{'_'.join(index_columns)}"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {CATALOG_TABLE} ({', '.join(index_columns)})")
+    return conn
+
+
+def updateCatalog(catalog_path, rows, directory=None):
+    """
+    Insert or replace rows of studyRow in the catalog, in one transaction.
+
+    Args:
+        catalog_path (str): Path of the SQLite catalog.
+        rows (list): Rows of studyRow.
+        directory (str): Rows of data files under directory which are not in rows are deleted. Default is None.
+    """
+    columns = catalogColumns()
+    values = [
+        [None if row.get(k, DEFAULT_NA) == DEFAULT_NA else row[k] for k in columns] for row in rows
+    ]
+    conn = openCatalog(catalog_path)
+    try:
+        with conn:
+            if directory is not None:
+                prefix = osp.join(osp.abspath(directory), "")
+                current = {row["data_file"] for row in rows}
+                for (data_file,) in conn.execute(
+                    f"SELECT data_file FROM {CATALOG_TABLE} WHERE substr(data_file, 1, ?) = ?", (len(prefix), prefix)
+                ).fetchall():
+                    if data_file not in current:
+                        conn.execute(f"DELETE FROM {CATALOG_TABLE} WHERE data_file = ?", (data_file,))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {CATALOG_TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                values,
+            )
+    finally:
+        conn.close()
+
+
+def parseCondition(condition):
+    """
+    (column, operator, value) of FIELD OP VALUE, the value is a number for <, <=, > and >=.
+    """
+    match = CONDITION_PATTERN.match(condition)
+    if match is None:
+        raise ValueError(f"{condition} is not FIELD=VALUE, FIELD!=VALUE, FIELD>NUMBER, FIELD>=NUMBER, FIELD<NUMBER or FIELD<=NUMBER")
+    column, op, value = match.groups()
+    if column not in catalogColumns():
+        raise ValueError(f"{column} is not in the catalog, should be one of {catalogColumns()}")
+    if op in ["<", "<=", ">", ">="]:
+        value = float(value)
+    elif value.lower() in ["true", "false"] and CATALOG_TYPES.get(column) == "INTEGER":  # is_sorted=true
+        value = int(value.lower() == "true")
+    return column, op, value
+
+
+def queryCatalog(catalog_path, conditions=()):
+    """
+    Rows of the catalog matching all conditions, see parseCondition, sorted by data_file.
+
+    Returns:
+        tuple: (columns, list of rows)
+    """
+    where, params = [], []
+    for condition in conditions:
+        column, op, value = parseCondition(condition)
+        where.append(f"{column} {op} ?")
+        params.append(value)
+    sql = f"SELECT * FROM {CATALOG_TABLE}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY data_file"
+    conn = openCatalog(catalog_path)
+    try:
+        cursor = conn.execute(sql, params)
+        return [d[0] for d in cursor.description], cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def generateTree(
+    directory, patterns=DATA_PATTERNS, index_path=None, workers=1, force=False, catalog=None, **options
+):
+    """
+    Write the meta files of the data files under directory which changed since the last run, and the summary index.
+
+    Args:
+        directory (str): Top directory.
+        patterns (list): File name patterns of data files.
+        index_path (str): Summary index. Default is directory/META_INDEX_NAME.
+        workers (int): Number of processes running generateMeta.
+        force (bool): Regenerate every meta file. Default is False.
+        catalog (str): Also update this SQLite catalog, see updateCatalog. Default is None.
+        **options: See generateMeta, keep is always True.
+
+    Returns:
+        tuple: (number of data files, number of meta files written, number of failed data files)
+
+    Notes:
+        - A data file which fails (e.g. malformed lines) is reported and skipped, it has no row in the index.
+    """
+    index_path = index_path if index_path else osp.join(directory, META_INDEX_NAME)
+    previous = readIndex(index_path)
+    files = findDataFiles(directory, patterns, exclude=[index_path])
+    stale = [file for file in files if force or isStale(file, previous.get(osp.relpath(file, directory)))]
+    stale_set = set(stale)
+
+    metas, failed = {}, 0
+    if workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(generateMeta, file, keep=True, **options): file for file in stale}
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    metaFileName, metas[file] = future.result()
+                    sys.stderr.write(f"{metaFileName}\n")
+                except Exception as e:
+                    failed += 1
+                    sys.stderr.write(f"{file} failed: {e}\n")
+    else:
+        for file in stale:
+            try:
+                metaFileName, metas[file] = generateMeta(file, keep=True, **options)
+                sys.stderr.write(f"{metaFileName}\n")
+            except Exception as e:
+                failed += 1
+                sys.stderr.write(f"{file} failed: {e}\n")
+
+    rows, catalog_rows = [], []
+    for file in files:
+        if file in stale_set:
+            if file not in metas:
+                continue  # failed, no row so it is tried again next time
+            meta = metas[file]
+        else:
+            meta = readMeta(getfilename(file) + META_SUFFIX)
+        rows.append(indexRow(directory, file, meta))
+        catalog_rows.append(studyRow(file, meta))
+    writeIndex(index_path, rows)
+    if catalog:
+        updateCatalog(catalog, catalog_rows, directory=directory)
+    return len(files), len(metas), failed
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+    options = {
+        "check_sort": args.check_sort,
+        "stats": args.stats,
+        "tree_hash": args.tree_hash,
+        "threads": args.threads,
+        "use_cache": not args.no_checksum_cache,
+    }
+
+    if args.query is not None:
+        if not args.catalog:
+            parser.error("--query needs --catalog")
+        if not osp.exists(args.catalog):
+            raise FileNotFoundError(f"catalog {args.catalog} does not exist")
+        columns, rows = queryCatalog(args.catalog, args.query)
+        writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows([DEFAULT_NA if v is None else v for v in row] for row in rows)
+    elif args.recursive:
+        total, written, failed = generateTree(
+            args.recursive,
+            patterns=args.pattern,
+            index_path=args.index,
+            workers=args.workers,
+            force=args.force,
+            catalog=args.catalog,
+            **options,
+        )
+        sys.stderr.write(f"{written} of {total} meta files are updated, {failed} failed\n")
+    else:
+        metaFileName, meta = generateMeta(args.input, **options)
+        if args.catalog:
+            updateCatalog(args.catalog, [studyRow(args.input, meta)])
@@ -0,0 +1,550 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description: Shared I/O layer: plain/gzip/bgzip input, BGZF output and line-aligned shards for multi-process formatting
+@Date     :2026/10/17 10:12:31
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import gzip
+import io
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+GZIP_MAGIC = b"\x1f\x8b"
+BGZF_HEADER_SIZE = 18  # fixed header of a BGZF block, BSIZE at the end
+BGZF_BLOCK_SIZE = 0xFF00  # max uncompressed bytes of a block, same as bgzip
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+IO_BUFFER_SIZE = 4 * 1024 * 1024
+TABIX_MAGIC = b"TBI\x01"
+
+
+def isGzip(path):
+    """
+    Check whether a file is gzip compressed (including bgzip) by its magic number.
+    """
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def readBGZFBlockSize(header):
+    """
+    Parse the total size of a BGZF block from its header.
+
+    Args:
+        header (bytes): The first bytes of a block, at least 18 bytes.
+
+    Returns:
+        int or None: Total block size (BSIZE + 1), or None if it is not a BGZF block.
+
+    Notes:
+        - A BGZF block is a gzip member with FEXTRA flag and an extra subfield 'BC' holding BSIZE.
+        - See SAMv1.pdf section 4.1: https://samtools.github.io/hts-specs/SAMv1.pdf
+    """
+    if len(header) < BGZF_HEADER_SIZE or header[:4] != b"\x1f\x8b\x08\x04":
+        return None
+    xlen = struct.unpack("<H", header[10:12])[0]
+    extra = header[12 : 12 + xlen]
+    idx = 0
+    while idx + 4 <= len(extra):
+        si1, si2, slen = extra[idx], extra[idx + 1], struct.unpack("<H", extra[idx + 2 : idx + 4])[0]
+        if si1 == 66 and si2 == 67 and slen == 2:  # 'B' 'C'
+            return struct.unpack("<H", extra[idx + 4 : idx + 6])[0] + 1
+        idx += 4 + slen
+    return None
+
+
+def isBGZF(path):
+    """
+    Check whether a file is bgzip compressed (BGZF), which could be split by blocks.
+    """
+    with open(path, "rb") as f:
+        return readBGZFBlockSize(f.read(BGZF_HEADER_SIZE)) is not None
+
+
+def iterBGZFBlocks(path):
+    """
+    Iterate over the blocks of a BGZF file by reading their headers only.
+
+    Yields:
+        tuple: (offset, size) of each block in the compressed file.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            header = f.read(BGZF_HEADER_SIZE)
+            if not header:
+                break
+            size = readBGZFBlockSize(header)
+            if size is None:
+                raise ValueError(f"{path} is not a valid BGZF file at offset {offset}")
+            yield offset, size
+            offset += size
+            f.seek(offset)
+
+
+def decompressBGZFBlock(f, offset):
+    """
+    Decompress a single BGZF block at offset of an opened binary file.
+
+    Returns:
+        tuple: (data, next_offset), data is b"" at the end of file.
+    """
+    f.seek(offset)
+    header = f.read(BGZF_HEADER_SIZE)
+    if not header:
+        return b"", offset
+    size = readBGZFBlockSize(header)
+    if size is None:
+        raise ValueError(f"not a valid BGZF block at offset {offset}")
+    block = header + f.read(size - BGZF_HEADER_SIZE)
+    return inflateBGZFBlock(block), offset + size
+
+
+def inflateBGZFBlock(block):
+    """
+    Decompress a whole BGZF block (header, deflate data, CRC32 and ISIZE).
+    """
+    # skip gzip header (12 bytes + XLEN), the last 8 bytes are CRC32 and ISIZE
+    xlen = struct.unpack("<H", block[10:12])[0]
+    return zlib.decompress(block[12 + xlen : -8], -15)
+
+
+def deflateBGZFBlock(data, level=6):
+    """
+    Compress at most BGZF_BLOCK_SIZE bytes into a BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    bsize = BGZF_HEADER_SIZE + len(compressed) + 8 - 1
+    header = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00" + struct.pack("<H", bsize)
+    return header + compressed + struct.pack("<II", zlib.crc32(data), len(data))
+
+
+def plainShards(path, start, shard_size):
+    """
+    Split a plain text file into byte ranges.
+
+    Args:
+        path (str): Path of the file.
+        start (int): Offset to start from, e.g. the offset after the header line.
+        shard_size (int): Approximate size of each shard in bytes.
+
+    Returns:
+        list: (start, end) byte ranges; lines belong to the range where they start, see readPlainShard.
+    """
+    file_size = os.path.getsize(path)
+    shards = []
+    while start < file_size:
+        end = min(start + shard_size, file_size)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def readPlainShard(path, start, end):
+    """
+    Read all lines starting within [start, end) of a plain text file.
+
+    Returns:
+        bytes: Complete lines, the last line ends with b"\\n" unless it is the end of the file.
+    """
+    with open(path, "rb") as f:
+        if start > 0:  # skip the line that starts in the previous shard
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        if pos >= end:
+            return b""
+        data = f.read(end - pos)
+        if data and not data.endswith(b"\n"):  # finish the last line
+            data += f.readline()
+    return data
+
+
+def bgzfShards(path, shard_size):
+    """
+    Split a BGZF file into groups of consecutive blocks.
+
+    Args:
+        path (str): Path of the BGZF file.
+        shard_size (int): Approximate compressed size of each shard in bytes.
+
+    Returns:
+        list: (start, end, prev_block) compressed offsets; prev_block is the offset of the last block
+            of the previous shard (None for the first one), see readBGZFShard.
+    """
+    shards = []
+    shard_start = 0
+    prev_block = None
+    end = 0
+    for offset, size in iterBGZFBlocks(path):
+        end = offset + size
+        if end - shard_start >= shard_size:
+            shards.append((shard_start, end, prev_block))
+            shard_start = end
+            prev_block = offset
+    if end > shard_start:
+        shards.append((shard_start, end, prev_block))
+    return shards
+
+
+def readBGZFShard(path, start, end, prev_block=None):
+    """
+    Read all lines starting within the uncompressed data of BGZF blocks in [start, end).
+
+    Args:
+        path (str): Path of the BGZF file.
+        start (int): Compressed offset of the first block of the shard.
+        end (int): Compressed offset after the last block of the shard.
+        prev_block (int, optional): Offset of the last block of the previous shard. None means this is
+            the first shard, then the first line (header) is skipped.
+
+    Returns:
+        bytes: Complete lines, the last line ends with b"\\n" unless it is the end of the file.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = gzip.decompress(f.read(end - start))
+
+        # does the first line of this shard start at data[0]?
+        if prev_block is None:
+            line_start = False  # header line
+        else:
+            prev_data, _ = decompressBGZFBlock(f, prev_block)
+            # an empty block only shows up after a complete file, e.g. cat a.gz b.gz
+            line_start = prev_data.endswith(b"\n") or prev_data == b""
+        if not line_start:
+            idx = data.find(b"\n")
+            if idx == -1:  # no line starts in this shard
+                return b""
+            data = data[idx + 1 :]
+
+        if data and not data.endswith(b"\n"):  # finish the last line from the next blocks
+            tail = [data]
+            offset = end
+            while True:
+                block, next_offset = decompressBGZFBlock(f, offset)
+                if next_offset == offset:  # end of file
+                    break
+                offset = next_offset
+                idx = block.find(b"\n")
+                if idx != -1:
+                    tail.append(block[: idx + 1])
+                    break
+                tail.append(block)
+            data = b"".join(tail)
+    return data
+
+
+def readTabixIndex(path):
+    """
+    Read the header and the linear index of a tabix index (.tbi).
+
+    Args:
+        path (str): Path of the .tbi file.
+
+    Returns:
+        tuple: (header, linear). header is a dict of format, col_seq, col_beg, col_end (1-based columns), meta
+            (comment char) and skip (header lines). linear is {sequence name: sorted virtual offsets}, the
+            distinct offsets of the first record in each 16 kb window of the sequence.
+
+    Notes:
+        - A virtual offset is (compressed offset of the BGZF block << 16) | offset in the uncompressed block.
+        - See tabix.pdf: https://samtools.github.io/hts-specs/tabix.pdf
+    """
+    with open(path, "rb") as f:
+        data = gzip.decompress(f.read())
+    if data[:4] != TABIX_MAGIC:
+        raise ValueError(f"{path} is not a tabix index")
+
+    n_ref, fmt, col_seq, col_beg, col_end, meta, skip, l_nm = struct.unpack_from("<8i", data, 4)
+    pos = 36
+    names = [name.decode() for name in data[pos : pos + l_nm].split(b"\0")[:n_ref]]
+    pos += l_nm
+
+    linear = {}
+    for name in names:
+        (n_bin,) = struct.unpack_from("<i", data, pos)
+        pos += 4
+        for _ in range(n_bin):
+            _, n_chunk = struct.unpack_from("<Ii", data, pos)
+            pos += 8 + 16 * n_chunk
+        (n_intv,) = struct.unpack_from("<i", data, pos)
+        pos += 4
+        offsets = struct.unpack_from(f"<{n_intv}Q", data, pos)
+        pos += 8 * n_intv
+        linear[name] = sorted(set(offsets) - {0})
+
+    header = {
+        "format": fmt,
+        "col_seq": col_seq,
+        "col_beg": col_beg,
+        "col_end": col_end,
+        "meta": chr(meta),
+        "skip": skip,
+    }
+    return header, linear
+
+
+def readBGZFLines(f, virtual_offset, n):
+    """
+    Read at most n lines of an opened BGZF file from a virtual offset, e.g. from readTabixIndex.
+
+    Args:
+        f: BGZF file opened in binary mode.
+        virtual_offset (int): Virtual offset of the start of a line.
+        n (int): Max number of lines.
+
+    Returns:
+        list: Lines as bytes without b"\n", fewer than n at the end of the file.
+    """
+    offset, start = virtual_offset >> 16, virtual_offset & 0xFFFF
+    data, offset = decompressBGZFBlock(f, offset)
+    data = data[start:]
+    while data.count(b"\n") < n:
+        more, offset = decompressBGZFBlock(f, offset)
+        if not more:
+            break
+        data += more
+    lines = data.split(b"\n")
+    if lines[-1] == b"" or len(lines) > n:  # the last one is empty or not complete
+        lines.pop()
+    return lines[:n]
+
+
+class BGZFReader(io.RawIOBase):
+    """
+    Read a BGZF stream, blocks are decompressed by a thread pool ahead of the reader.
+
+    Args:
+        raw: Binary stream of the BGZF file, could be non-seekable (e.g. stdin).
+        threads (int): Number of decompress threads, 1 means in the reading thread.
+
+    Notes:
+        - zlib releases the GIL, so blocks are decompressed in parallel.
+        - Wrap it by io.BufferedReader and io.TextIOWrapper to read lines, see openInput.
+    """
+
+    def __init__(self, raw, threads=1):
+        self.raw = raw
+        self.pool = ThreadPoolExecutor(threads) if threads > 1 else None
+        self.max_pending = threads * 16
+        self.pending = deque()
+        self.data = b""
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readBlock(self):
+        header = self.raw.read(BGZF_HEADER_SIZE)
+        if not header:
+            return None
+        size = readBGZFBlockSize(header)
+        if size is None:
+            raise ValueError("not a valid BGZF block, the file may be gzip but not bgzip")
+        return header + self.raw.read(size - BGZF_HEADER_SIZE)
+
+    def nextData(self):
+        if self.pool is None:
+            block = self.readBlock()
+            return None if block is None else inflateBGZFBlock(block)
+        while len(self.pending) < self.max_pending:
+            block = self.readBlock()
+            if block is None:
+                break
+            self.pending.append(self.pool.submit(inflateBGZFBlock, block))
+        if not self.pending:
+            return None
+        return self.pending.popleft().result()
+
+    def readinto(self, b):
+        while self.pos >= len(self.data):
+            data = self.nextData()
+            if data is None:
+                return 0
+            self.data, self.pos = data, 0
+        n = min(len(b), len(self.data) - self.pos)
+        b[:n] = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+            self.raw.close()
+        super().close()
+
+
+class ReadaheadReader(io.RawIOBase):
+    """
+    Read a binary stream (e.g. gzip.GzipFile) in a background thread.
+
+    Notes:
+        - A gzip member can not be decompressed in parallel, but zlib releases the GIL, so
+          decompression runs alongside the parsing in the main thread like `zcat file | script`.
+    """
+
+    def __init__(self, raw, chunk_size=IO_BUFFER_SIZE, max_chunks=4):
+        self.raw = raw
+        self.chunks = queue.Queue(max_chunks)
+        self.data = b""
+        self.pos = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.produce, args=(chunk_size,), daemon=True)
+        self.thread.start()
+
+    def produce(self, chunk_size):
+        try:
+            while True:
+                chunk = self.raw.read(chunk_size)
+                self.chunks.put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:  # re-raised in the reading thread
+            self.error = e
+            self.chunks.put(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.data is None:  # end of stream
+            return 0
+        while self.pos >= len(self.data):
+            data = self.chunks.get()
+            if self.error is not None:
+                raise self.error
+            if not data:
+                self.data = None
+                return 0
+            self.data, self.pos = data, 0
+        n = min(len(b), len(self.data) - self.pos)
+        b[:n] = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+class BGZFWriter(io.RawIOBase):
+    """
+    Write a BGZF stream (bgzip format, could be indexed by tabix) with parallel block compression.
+
+    Args:
+        raw: Binary stream of the output file.
+        threads (int): Number of compress threads, 1 means in the writing thread.
+        level (int): zlib compress level. Default is 6, the same as bgzip.
+
+    Notes:
+        - The EOF block is written on close.
+        - Wrap it by io.BufferedWriter and io.TextIOWrapper to write lines, see openOutput.
+    """
+
+    def __init__(self, raw, threads=1, level=6):
+        self.raw = raw
+        self.level = level
+        self.pool = ThreadPoolExecutor(threads) if threads > 1 else None
+        self.max_pending = threads * 4
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def writeBlock(self, data):
+        if self.pool is None:
+            self.raw.write(deflateBGZFBlock(data, self.level))
+            return
+        self.pending.append(self.pool.submit(deflateBGZFBlock, data, self.level))
+        while len(self.pending) > self.max_pending:
+            self.raw.write(self.pending.popleft().result())
+
+    def write(self, b):
+        self.buffer += b
+        if len(self.buffer) >= BGZF_BLOCK_SIZE:
+            view = memoryview(self.buffer)
+            end = len(self.buffer) - len(self.buffer) % BGZF_BLOCK_SIZE
+            for start in range(0, end, BGZF_BLOCK_SIZE):
+                self.writeBlock(bytes(view[start : start + BGZF_BLOCK_SIZE]))
+            view.release()
+            del self.buffer[:end]
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            if self.buffer:
+                self.writeBlock(bytes(self.buffer))
+                self.buffer = bytearray()
+            while self.pending:
+                self.raw.write(self.pending.popleft().result())
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.raw.write(BGZF_EOF)
+            self.raw.close()
+        super().close()
+
+
+def openInput(path=None, threads=1):
+    """
+    Open the input as a text stream, gzip/bgzip is detected by magic number.
+
+    Args:
+        path (str, optional): Path of the input file. None or "-" means stdin.
+        threads (int): Number of decompress threads for bgzip input. Default is 1.
+
+    Returns:
+        io.TextIOWrapper: Text stream of the input.
+
+    Notes:
+        - bgzip input (file or stdin) is decompressed by BGZFReader, blocks in parallel.
+        - gzip input is decompressed by a background thread, see ReadaheadReader.
+        - plain text stdin is returned as sys.stdin.
+    """
+    if path is None or path == "-":
+        raw = sys.stdin.buffer
+        magic = raw.peek(BGZF_HEADER_SIZE)[:BGZF_HEADER_SIZE]
+        if magic[:2] != GZIP_MAGIC:
+            return sys.stdin
+    else:
+        raw = open(path, "rb", buffering=IO_BUFFER_SIZE)
+        magic = raw.peek(BGZF_HEADER_SIZE)[:BGZF_HEADER_SIZE]
+        if magic[:2] != GZIP_MAGIC:
+            return io.TextIOWrapper(raw)
+
+    if readBGZFBlockSize(magic) is not None:
+        reader = BGZFReader(raw, threads)
+    else:
+        reader = ReadaheadReader(gzip.GzipFile(fileobj=raw, mode="rb"))
+    return io.TextIOWrapper(io.BufferedReader(reader, IO_BUFFER_SIZE))
+
+
+def openOutput(path=None, threads=1, level=6):
+    """
+    Open the output as a text stream, "*.gz" and "*.bgz" are written as bgzip (BGZF).
+
+    Args:
+        path (str, optional): Path of the output file. None or "-" means stdout.
+        threads (int): Number of compress threads for bgzip output. Default is 1.
+        level (int): zlib compress level of bgzip output. Default is 6.
+
+    Returns:
+        io.TextIOWrapper: Text stream of the output, close it to finish the file.
+    """
+    if path is None or path == "-":
+        return sys.stdout
+    raw = open(path, "wb")
+    if path.endswith(".gz") or path.endswith(".bgz"):
+        raw = BGZFWriter(raw, threads, level)
+    return io.TextIOWrapper(io.BufferedWriter(raw, IO_BUFFER_SIZE))
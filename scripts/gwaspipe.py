@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description:       : run GWASFormat.py, resetID2.py, versionConvert.py and chrFormat.py as stages of one process
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import shlex
+import sys
+import textwrap
+import warnings
+from itertools import islice
+from signal import SIG_DFL, SIGPIPE, signal
+
+import chrFormat
+import GWASFormat
+import resetID2
+import versionConvert
+from gwas_io import openInput, openOutput
+
+BATCH_SIZE = 16384  # lines split and passed through the stages at once, larger blocks make the garbage collector slower
+
+warnings.filterwarnings("ignore")
+signal(
+    SIGPIPE, SIG_DFL
+)  # prevent IOError: [Errno 32] Broken pipe. If pipe closed by 'head'.
+
+
+class Stage:
+    """
+    One stage of the pipeline, works on the fields of a row.
+
+    The first row reaching a stage is passed to header() unless the stage has --no-header, the others to row().
+    row() returns None to drop the row. Rows reach a stage in blocks through processBlock(), a stage may override it
+    to work on the whole block. finish() is called after the last row.
+
+    Attributes:
+        delimter (str): Delimiter to split the input, None is any whitespace.
+        out_delimter (str): Delimiter to join the output.
+    """
+
+    def __init__(self):
+        self.delimter = None
+        self.out_delimter = "\t"
+        self.need_header = True
+
+    def process(self, ss):
+        if self.need_header:
+            self.need_header = False
+            return self.header(ss)
+        return self.row(ss)
+
+    def processBlock(self, rows):
+        """
+        process() each row of a block, the dropped rows are removed.
+        """
+        out = []
+        for ss in rows:
+            ss = self.process(ss)
+            if ss is not None:
+                out.append(ss)
+        return out
+
+    def header(self, ss):
+        return ss
+
+    def row(self, ss):
+        return ss
+
+    def finish(self):
+        pass
+
+
+class FormatStage(Stage):
+    """
+    GWASFormat.py, arguments are the same as GWASFormat.py.
+    """
+
+    def __init__(self, argv):
+        super().__init__()
+        args = GWASFormat.getParser().parse_args(argv)
+        self.delimter = args.delimter
+        self.other_cols = args.other_cols
+        self.column_mapping = GWASFormat.getColumnMapping(args)
+
+    def header(self, ss):
+        self.column_mapping = GWASFormat.mapColumns(
+            self.column_mapping, ss, self.other_cols
+        )
+        self.formatRow = GWASFormat.compileRowFormatter(
+            GWASFormat.buildColumnPlan(self.column_mapping), delimter=None
+        )
+        return list(self.column_mapping.keys())
+
+    def row(self, ss):
+        return self.formatRow(ss)
+
+
+class ResetIDStage(Stage):
+    """
+    resetID2.py, arguments are the same as resetID2.py.
+    """
+
+    def __init__(self, argv):
+        super().__init__()
+        args = resetID2.getParser().parse_args(argv)
+        if args.emit_map or args.splice or args.dedupe:
+            raise ValueError(
+                "--emit-map, --splice and --dedupe of resetID2.py are not supported as a stage, run resetID2.py"
+            )
+        self.args = args
+        self.delimter = args.delimiter
+        self.out_delimter = "\t" if args.delimiter is None else args.delimiter
+        self.need_header = not args.no_header
+        self.add_col = True if args.add_col else False
+        self.header_cols = None
+
+        orderList = args.col_order
+        if orderList == []:
+            orderList = [3, 1, 2, 4, 5]
+        if args.no_header:
+            try:
+                orderList = [int(x) for x in orderList]
+            except:
+                raise ValueError("if no header, the orderList should be int not str")
+        if self.add_col:
+            if len(orderList) == 4:
+                orderList = ["-1 "] + orderList
+            else:
+                raise ValueError("if add_col is True, the orderList should be 4 not 5")
+        self.orderList = orderList
+
+    def header(self, ss):
+        self.header_cols, self.orderList = resetID2.resetHeader(
+            ss,
+            self.orderList,
+            new_col_name=self.args.add_col,
+            need_sort=self.args.sort,
+            drop_suffix=self.args.drop_suffix,
+        )
+        self.setID = self.makeIDBuilder()
+        return self.header_cols
+
+    def makeIDBuilder(self):
+        return resetID2.makeIDBuilder(
+            self.orderList,
+            ID_delimter=self.args.id_delimiter,
+            need_sort=self.args.sort,
+            needChr=self.args.add_chr,
+            includeOld=self.args.keep,
+        )
+
+    def row(self, ss):
+        if self.header_cols is None:  # --no-header, fake header from the first row
+            self.header_cols = list(range(1, len(ss) + 1 + self.add_col))
+            self.orderList = [resetID2.header_mapper(int(x), self.header_cols) for x in self.orderList]
+            self.setID = self.makeIDBuilder()
+        if self.add_col:
+            ss.append("")
+        self.setID(ss)
+        return ss
+
+
+class LiftoverStage(Stage):
+    """
+    versionConvert.py, arguments are the same as versionConvert.py.
+
+    With --engine numpy (the default if numpy is installed), each block is converted by liftoverBlock with ChainLifter
+    as versionConvert.py, blocks with a bad row fall back to liftoverLine, which looks up the ChainTarget of the row.
+    --sorted-input keeps one ChainCursor of each position column across the blocks, it needs --engine numpy.
+
+    Leading arguments without "-" are the chain, e.g. `liftover hg19 hg38` is `-c hg19 hg38`,
+    and -i defaults to `chromosome base_pair_location` of the GWASFormat.py output.
+    """
+
+    def __init__(self, argv):
+        super().__init__()
+        if argv and not argv[0].startswith("-"):
+            argv = ["-c"] + argv
+        if "-i" not in argv and "--input_cols" not in argv:
+            argv = argv + ["-i", "chromosome", "base_pair_location"]
+        args = versionConvert.getParser().parse_args(argv)
+        self.args = args
+        self.delimter = args.delimter
+        self.out_delimter = "\t" if args.delimter is None else args.delimter
+        self.need_header = not args.no_header
+        self.drop = args.drop_unSameChromosome
+
+        if args.zero_based:
+            sys.stderr.write(
+                "Warning: zero-based option is on, so the input file should be zero-based, if not, please turn off this option!\n"
+            )
+            self.minus_pos = 0
+        else:
+            sys.stderr.write(
+                "Warning: zero-based option is off, so the input file should be one-based (e.g. GWAS Summary Files), if not, please turn on this option!\n"
+            )
+            self.minus_pos = 1
+
+        if len(args.chain) == 2:
+            target, self.query = args.chain
+            chainPath = None
+        elif len(args.chain) == 3:
+            target, self.query, chainPath = args.chain
+        else:
+            raise ValueError(
+                "chain args error, please check, would be -c hg19 hg38 or -c hg19 hg38 chainFilePath or other version"
+            )
+        self.numpy_engine = args.engine == "numpy"
+        if args.sorted_input and not self.numpy_engine:
+            raise ValueError("--sorted-input needs --engine numpy")
+        if self.numpy_engine:
+            self.lifter = versionConvert.ChainLifter.fromCache(
+                versionConvert.getChainPath(target, self.query, chainPath), use_cache=not args.no_chain_cache
+            )
+        else:
+            self.lifter = versionConvert.get_lifter(target, self.query, cache=chainPath)
+
+        self.input_cols = args.input_cols
+        if len(self.input_cols) <= 1:
+            raise ValueError("input cols error, please check, at least 1 col")
+        elif len(self.input_cols) >= 3 and not self.drop:
+            raise ValueError(
+                "input cols error, please check, if you are converting more than 1 postion col, you should use --drop option to avoid the not same chromosome problem, especially when the chrmosome of converted cols are different."
+            )
+        if args.no_header:
+            self.input_cols = [int(x) for x in self.input_cols]
+
+        self.line_idx = 2 if args.no_header else 1
+        self.counts = {
+            "unmapped": 0,
+            "multiple": 0,
+            "notSameChr": 0,
+            "key_error": 0,
+            "notChr": 0,
+        }
+        self.notChrList = set()
+        self.cursors = [versionConvert.ChainCursor() for _ in self.input_cols[1:]] if args.sorted_input else None
+
+    def header(self, ss):
+        self.line_idx += 1
+        ss, self.input_cols = versionConvert.liftoverHeader(
+            ss, self.input_cols, self.query, self.args.no_suffix, self.args.add_last
+        )
+        return ss
+
+    def row(self, ss):
+        self.line_idx += 1
+        ss, line_need_skip = versionConvert.liftoverLine(
+            ss,
+            self.lifter,
+            self.input_cols,
+            self.counts,
+            self.notChrList,
+            minus_pos=self.minus_pos,
+            keep_unmapped=self.args.keep_unmapped,
+            drop=self.drop,
+            addLast=self.args.add_last,
+        )
+        if line_need_skip and not self.args.keep_unmapped:
+            return None
+        return ss
+
+    def processBlock(self, rows):
+        if not self.numpy_engine:
+            return super().processBlock(rows)
+        if self.need_header and rows:
+            return [self.process(rows[0])] + self.processBlock(rows[1:])
+        if not rows:
+            return rows
+        self.line_idx += len(rows)
+        return versionConvert.liftoverBlock(
+            rows,
+            self.lifter,
+            self.input_cols,
+            self.counts,
+            self.notChrList,
+            minus_pos=self.minus_pos,
+            keep_unmapped=self.args.keep_unmapped,
+            drop=self.drop,
+            addLast=self.args.add_last,
+            cursors=self.cursors,
+        )
+
+    def finish(self):
+        versionConvert.reportLiftover(
+            self.counts,
+            self.notChrList,
+            self.line_idx,
+            drop=self.drop,
+            no_header=self.args.no_header,
+        )
+        if self.cursors is not None:
+            fallback = sum(cursor.fallback for cursor in self.cursors)
+            sys.stderr.write(f"sorted-input fallback count: {fallback}\n")
+            if fallback > 0:
+                sys.stderr.write(
+                    "Warning: input is not sorted by chromosome and position, positions out of order are mapped by binary search\n"
+                )
+
+
+class ChrStage(Stage):
+    """
+    chrFormat.py, arguments are the same as chrFormat.py.
+    """
+
+    def __init__(self, argv):
+        super().__init__()
+        args = chrFormat.getParser().parse_args(argv)
+        self.col = args.col
+        self.chr_table = chrFormat.CHR_TABLE if args.add_chr else chrFormat.NOCHR_TABLE
+        self.out_delimter = "\t" if not args.delimiter else args.delimiter
+
+    def row(self, ss):
+        ss[self.col - 1] = self.chr_table[ss[self.col - 1]]
+        return ss
+
+
+STAGES = {
+    "format": FormatStage,
+    "resetid": ResetIDStage,
+    "liftover": LiftoverStage,
+    "chr": ChrStage,
+}
+
+
+def parseStages(stage_str):
+    """
+    Parse the stage list into stages.
+
+    Args:
+        stage_str (str): Stages separated by a standalone "|", e.g. "format -i 1 2 5 4 8 9 6 10 | chr --add-chr".
+
+    Returns:
+        list: Stage objects in order.
+
+    Raises:
+        ValueError: If a stage is empty or unknown.
+    """
+    stages = []
+    argvs = [[]]
+    for token in shlex.split(stage_str):
+        if token == "|":
+            argvs.append([])
+        else:
+            argvs[-1].append(token)
+
+    for argv in argvs:
+        if not argv:
+            raise ValueError(f"empty stage in: {stage_str}")
+        name, stage_args = argv[0], argv[1:]
+        if name not in STAGES:
+            raise ValueError(
+                f"unknown stage {name}, should be one of {', '.join(STAGES.keys())}"
+            )
+        stages.append(STAGES[name](stage_args))
+    return stages
+
+
+def runPipeline(stages, input_file, output_file):
+    """
+    Split each line once, run it through all stages and join it once, BATCH_SIZE lines at a time.
+
+    Args:
+        stages (list): Stage objects from parseStages.
+        input_file: Text input.
+        output_file: Text output.
+    """
+    delimter = stages[0].delimter
+    out_delimter = stages[-1].out_delimter
+    for block in iter(lambda: list(islice(input_file, BATCH_SIZE)), []):
+        rows = [line.strip().split(delimter) for line in block]
+        for stage in stages:
+            rows = stage.processBlock(rows)
+        output_file.write("".join([out_delimter.join(ss) + "\n" for ss in rows]))
+
+    for stage in stages:
+        stage.finish()
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog run GWASFormat.py, resetID2.py, versionConvert.py and chrFormat.py as stages of one process.
+        Each row is split once, passed as a list through the stages and joined once at the end.
+
+        Stages (arguments are the same as the script):
+            format      GWASFormat.py
+            resetid     resetID2.py
+            liftover    versionConvert.py, `liftover hg19 hg38 [chainPath]` is `-c hg19 hg38 [chainPath]`, -i defaults to chromosome base_pair_location
+            chr         chrFormat.py
+
+        The output is the same as piping the scripts, unless some fields are empty or contain whitespace, which are not split again between stages.
+
+        Example Code:
+            %prog "format -i 1 2 5 4 BETA SE A1FREQ LOG10P --pval-type log10p | resetid -s -i variant_id chromosome base_pair_location other_allele effect_allele | liftover hg19 hg38 | chr --add-chr" -I sumstats.tsv.gz -O sumstats.hg38.tsv.gz
+        """
+        ),
+    )
+    parser.add_argument(
+        "stages",
+        help='Stages separated by a standalone "|", quote the whole list.',
+    )
+    parser.add_argument(
+        "-I",
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip). Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    stages = parseStages(args.stages)
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
+    runPipeline(stages, input_file, output_file)
+
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description:       : fill rsID by chr, pos, ref, alt from a sorted and memory-mapped dbSNP index
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import json
+import mmap
+import os
+import os.path as osp
+import shutil
+import sys
+import tempfile
+import textwrap
+import warnings
+from itertools import islice
+from signal import SIG_DFL, SIGPIPE, signal
+
+import numpy as np
+
+from chrom_table import NUMERIC_CHR, ChromTable, numericChr
+from gwas_io import openInput, openOutput
+from resetID2 import header_mapper
+
+INDEX_VERSION = 1  # bump if the files of the index change
+INDEX_ARRAYS = {"pos": "<u4", "rsid": "<u8", "allele_offsets": "<u8"}  # raw arrays of the index, name => dtype
+INDEX_CHUNK_SIZE = 1 << 20  # records buffered by buildIndex before appended to the files
+LOOKUP_BATCH_SIZE = 65536  # lines looked up at once
+NA = "#NA"
+
+# RefSeq accessions of dbSNP VCF, NC_000001 => "1", ..., NC_000024 => "24", NC_012920 (rCRS) and NC_001807 => "25"
+REFSEQ_CHR = {f"NC_{i:06d}": str(i) for i in range(1, 25)}
+REFSEQ_CHR.update({"NC_012920": "25", "NC_001807": "25"})
+
+warnings.filterwarnings("ignore")
+signal(
+    SIGPIPE, SIG_DFL
+)  # prevent IOError: [Errno 32] Broken pipe. If pipe closed by 'head'.
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog fill the rsid column by chromosome, position, ref and alt from a dbSNP index
+
+        The index is built once from a dbSNP VCF (plain, gzip or bgzip) by --build, it is a folder of raw arrays
+        sorted by chromosome and position, which are memory-mapped and never loaded into RAM.
+        Each batch of rows is looked up by binary search in the positions of its chromosome, so sorted input reads
+        the index from start to end as a merge join.
+
+        Alleles are matched in either order, e.g. A/G of the row matches REF=G ALT=A of dbSNP.
+        Multi-allelic records of dbSNP are split into one record per ALT.
+        Unmatched rows keep the value of the rsid column, or #NA if the column is added.
+
+        Example Code:
+            1. build the index: %prog --build GCF_000001405.25.gz -x dbsnp_b156_GRCh37.rsid
+            2. fill rsid of GWASFormat.py output: zcat sumstats.tsv.gz | %prog -x dbsnp_b156_GRCh37.rsid | bgzip > sumstats.rsid.tsv.gz
+            3. by variant_id (chr:pos:ref:alt): %prog -x dbsnp_b156_GRCh37.rsid -col variant_id -c rsid --input sumstats.tsv.gz -O sumstats.rsid.tsv.gz
+        """
+        ),
+    )
+    parser.add_argument(
+        "-x",
+        "--index",
+        dest="index",
+        required=True,
+        help="Folder of the dbSNP index, written by --build.",
+    )
+    parser.add_argument(
+        "--build",
+        dest="build",
+        default=None,
+        help="Build the index from this dbSNP VCF and exit. Records of each chromosome must be contiguous and sorted by position, as the VCF of dbSNP.",
+    )
+    parser.add_argument(
+        "-i",
+        "--cols",
+        dest="cols",
+        nargs=4,
+        default=["chromosome", "base_pair_location", "other_allele", "effect_allele"],
+        help="Columns of chromosome, position, ref and alt, by index (starts from 1) or name. Default: chromosome base_pair_location other_allele effect_allele",
+    )
+    parser.add_argument(
+        "-col",
+        "--id-col",
+        dest="id_col",
+        default=None,
+        help="Use the variant ID column (chr:pos:ref:alt) instead of -i, by index or name.",
+    )
+    parser.add_argument(
+        "-I",
+        "--id-delimiter",
+        dest="id_delimiter",
+        default=":",
+        help="Delimiter of the variant ID of -col. Default: ':'.",
+    )
+    parser.add_argument(
+        "-c",
+        "--rsid-col",
+        dest="rsid_col",
+        default="rsid",
+        help="Column to fill, added to the end if not in the header. Default: rsid.",
+    )
+    parser.add_argument(
+        "-d",
+        "--delimiter",
+        dest="delimiter",
+        default="\t",
+        help="Delimiter of the input and output. Default: tab.",
+    )
+    parser.add_argument(
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip), with header. Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
+    return parser
+
+
+def dbsnpChr(x):
+    """
+    Chromosome of dbSNP VCF as numericChr, RefSeq accessions are converted and None for unplaced contigs.
+
+    Usage Examples:
+        dbsnpChr("NC_000023.10")  # Returns "23"
+        dbsnpChr("NT_113878.1")  # Returns None
+        dbsnpChr("chrX")  # Returns "23"
+    """
+    if x.startswith(("NC_", "NT_", "NW_")):
+        return REFSEQ_CHR.get(x.split(".")[0])
+    return numericChr(x)
+
+
+DBSNP_CHR = ChromTable(dbsnpChr)
+
+
+def writeChunk(files, pos, rsid, alleles, blob_size):
+    """
+    Append records to the files of the index.
+
+    Returns:
+        int: Size of the allele blob after this chunk.
+    """
+    blob = "".join(alleles).encode("ascii")
+    lengths = np.fromiter(map(len, alleles), dtype=np.uint64, count=len(alleles))
+    files["pos"].write(np.array(pos, dtype=INDEX_ARRAYS["pos"]).tobytes())
+    files["rsid"].write(np.array(rsid, dtype=INDEX_ARRAYS["rsid"]).tobytes())
+    files["allele_offsets"].write((blob_size + np.cumsum(lengths)).astype(INDEX_ARRAYS["allele_offsets"]).tobytes())
+    files["alleles"].write(blob)
+    return blob_size + len(blob)
+
+
+def buildIndex(vcf_path, index_path, threads=1):
+    """
+    Build the dbSNP index from a VCF.
+
+    Args:
+        vcf_path (str): dbSNP VCF, plain, gzip or bgzip.
+        index_path (str): Output folder, must not exist.
+        threads (int): Threads to decompress bgzip.
+
+    Returns:
+        int: Number of records.
+
+    Raises:
+        FileExistsError: If index_path exists.
+        ValueError: If a chromosome is not contiguous or positions are not sorted.
+
+    Notes:
+        - Only IDs starting with "rs" are kept, the first one if more, e.g. "rs1;rs2" => 1.
+        - Each record is pos (uint32), rsid (uint64) and "REF\\tALT" in the allele blob, the alleles of record k
+          are alleles[allele_offsets[k]:allele_offsets[k + 1]].
+        - [name, start, end] of each chromosome is in index.json, records are read INDEX_CHUNK_SIZE at a time.
+        - The index is written to a temporary folder and renamed, so a failed build never leaves a partial index.
+    """
+    if osp.exists(index_path):
+        raise FileExistsError(f"{index_path} exists, remove it to build again")
+
+    tmp_path = tempfile.mkdtemp(prefix=".tmp_", dir=osp.dirname(osp.abspath(index_path)))
+    try:
+        files = {name: open(osp.join(tmp_path, f"{name}.bin"), "wb") for name in [*INDEX_ARRAYS, "alleles"]}
+        files["allele_offsets"].write(np.zeros(1, dtype=INDEX_ARRAYS["allele_offsets"]).tobytes())
+
+        chroms = []  # [name, start, end]
+        n, blob_size, last_pos = 0, 0, 0
+        pos_buf, rsid_buf, allele_buf = [], [], []
+        with openInput(vcf_path, threads) as vcf:
+            for line in vcf:
+                if line.startswith("#"):
+                    continue
+                chrom, pos, ids, ref, alts = line.split("\t", 5)[:5]
+                if not ids.startswith("rs"):
+                    continue
+                chrom = DBSNP_CHR[chrom]
+                if chrom is None:
+                    continue
+                if not chroms or chroms[-1][0] != chrom:
+                    if any(x[0] == chrom for x in chroms):
+                        raise ValueError(f"chromosome {chrom} is not contiguous in {vcf_path}, sort it by bcftools sort")
+                    if chroms:
+                        chroms[-1][2] = n
+                    chroms.append([chrom, n, n])
+                    last_pos = 0
+
+                pos = int(pos)
+                if pos < last_pos:
+                    raise ValueError(f"{chrom}:{pos} is after {chrom}:{last_pos} in {vcf_path}, sort it by bcftools sort")
+                last_pos = pos
+                rsid = int(ids[2:].split(";", 1)[0])
+                for alt in alts.split(","):
+                    pos_buf.append(pos)
+                    rsid_buf.append(rsid)
+                    allele_buf.append(f"{ref}\t{alt}")
+                    n += 1
+
+                if len(pos_buf) >= INDEX_CHUNK_SIZE:
+                    blob_size = writeChunk(files, pos_buf, rsid_buf, allele_buf, blob_size)
+                    pos_buf, rsid_buf, allele_buf = [], [], []
+        blob_size = writeChunk(files, pos_buf, rsid_buf, allele_buf, blob_size)
+        if chroms:
+            chroms[-1][2] = n
+
+        for f in files.values():
+            f.close()
+        with open(osp.join(tmp_path, "index.json"), "w") as f:
+            json.dump(
+                {"version": INDEX_VERSION, "source": osp.basename(vcf_path), "records": n, "chroms": chroms},
+                f,
+            )
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o777 & ~umask)  # mkdtemp is 0700
+        os.rename(tmp_path, index_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return n
+
+
+class RsidIndex:
+    """
+    Memory-mapped dbSNP index written by buildIndex.
+
+    Usage Examples:
+        index = RsidIndex("dbsnp_b156_GRCh37.rsid")
+        index.lookup(["1", "1"], [10177, 10352], ["A", "T"], ["AC", "TA"])  # Returns [367896724, 555500075]
+    """
+
+    def __init__(self, path):
+        with open(osp.join(path, "index.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"index version {meta['version']} is not {INDEX_VERSION}, build it again")
+        self.records = meta["records"]
+        self.chroms = {name: (start, end) for name, start, end in meta["chroms"]}
+
+        for name, dtype in INDEX_ARRAYS.items():
+            array_path = osp.join(path, f"{name}.bin")
+            if osp.getsize(array_path) == 0:  # an empty file can not be mapped
+                setattr(self, name, np.zeros(0, dtype=dtype))
+            else:
+                setattr(self, name, np.memmap(array_path, dtype=dtype, mode="r"))
+        with open(osp.join(path, "alleles.bin"), "rb") as f:
+            self.alleles = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if osp.getsize(f.name) else b""
+
+    def lookup(self, chroms, pos, refs, alts):
+        """
+        rsID of a batch of variants.
+
+        Args:
+            chroms (list): Chromosomes as numericChr.
+            pos (list): Positions, int, -1 if invalid.
+            refs (list): Ref alleles.
+            alts (list): Alt alleles.
+
+        Returns:
+            list: rs number (int) of each variant, None if not matched. The first record is used if more match.
+        """
+        out = [None] * len(pos)
+        groups = {}
+        for i, chrom in enumerate(chroms):
+            groups.setdefault(chrom, []).append(i)
+
+        for chrom, rows in groups.items():
+            if chrom not in self.chroms:
+                continue
+            start, end = self.chroms[chrom]
+            query = np.fromiter((pos[i] for i in rows), dtype=np.int64, count=len(rows))
+            valid = (query > 0) & (query <= np.iinfo(self.pos.dtype).max)
+            query = np.where(valid, query, 0).astype(self.pos.dtype)  # same dtype, the memmap is never cast
+
+            chrom_pos = self.pos[start:end]
+            left = np.searchsorted(chrom_pos, query, side="left")
+            counts = np.where(valid, np.searchsorted(chrom_pos, query, side="right") - left, 0)
+
+            # records of all rows: [left, left + count) of each row
+            hit_rows = np.flatnonzero(counts)
+            hit_counts = counts[hit_rows]
+            total = int(hit_counts.sum())
+            if total == 0:
+                continue
+            records = start + np.repeat(left[hit_rows] - np.cumsum(hit_counts) + hit_counts, hit_counts) + np.arange(total)
+            owners = np.repeat(hit_rows, hit_counts).tolist()
+            lo = self.allele_offsets[records].tolist()
+            hi = self.allele_offsets[records + 1].tolist()
+            rsids = self.rsid[records].tolist()
+
+            for owner, a, b, rsid in zip(owners, lo, hi, rsids):
+                i = rows[owner]
+                if out[i] is not None:
+                    continue
+                ref, _, alt = self.alleles[a:b].decode().partition("\t")
+                if (ref == refs[i] and alt == alts[i]) or (ref == alts[i] and alt == refs[i]):
+                    out[i] = rsid
+        return out
+
+
+def parsePos(x):
+    return int(x) if x.isdigit() else -1
+
+
+def annotateBlock(rows, index, cols, rsid_idx, id_col=None, id_delimiter=":"):
+    """
+    Fill the rsid column of split rows in place.
+
+    Args:
+        rows (list): Split rows.
+        index (RsidIndex): dbSNP index.
+        cols (list): 0-based columns of chromosome, position, ref and alt.
+        rsid_idx (int): 0-based rsid column, appended to the rows if it is the length of the header.
+        id_col (int, optional): 0-based variant ID column, used instead of cols.
+        id_delimiter (str): Delimiter of the variant ID.
+
+    Returns:
+        int: Number of matched rows.
+    """
+    if id_col is not None:
+        keys = []
+        for ss in rows:
+            key = ss[id_col].split(id_delimiter, 3)
+            keys.append(key if len(key) == 4 else ["", "", "", ""])
+    else:
+        chr_idx, pos_idx, ref_idx, alt_idx = cols
+        keys = [(ss[chr_idx], ss[pos_idx], ss[ref_idx], ss[alt_idx]) for ss in rows]
+
+    chroms = [NUMERIC_CHR[key[0]] for key in keys]
+    pos = [parsePos(key[1]) for key in keys]
+    rsids = index.lookup(chroms, pos, [key[2] for key in keys], [key[3] for key in keys])
+
+    matched = 0
+    for ss, rsid in zip(rows, rsids):
+        if len(ss) == rsid_idx:  # added column
+            ss.append(NA)
+        if rsid is not None:
+            ss[rsid_idx] = f"rs{rsid}"
+            matched += 1
+    return matched
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+
+    if args.build:
+        n = buildIndex(args.build, args.index, args.threads)
+        sys.stderr.write(f"{n} records of {args.build} are written to {args.index}\n")
+        sys.exit(0)
+
+    index = RsidIndex(args.index)
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
+    delimter = args.delimiter
+
+    line = input_file.readline()
+    while line.startswith("##"):
+        output_file.write(line)
+        line = input_file.readline()
+    header = line.rstrip("\r\n").split(delimter)
+    cols = [header_mapper(x, header) - 1 for x in args.cols] if args.id_col is None else None
+    id_col = header_mapper(args.id_col, header) - 1 if args.id_col is not None else None
+    if args.rsid_col in header:
+        rsid_idx = header.index(args.rsid_col)
+    else:
+        rsid_idx = len(header)
+        header.append(args.rsid_col)
+    output_file.write(delimter.join(header) + "\n")
+
+    total, matched = 0, 0
+    for block in iter(lambda: list(islice(input_file, LOOKUP_BATCH_SIZE)), []):
+        rows = [x.rstrip("\r\n").split(delimter) for x in block]
+        matched += annotateBlock(rows, index, cols, rsid_idx, id_col, args.id_delimiter)
+        total += len(rows)
+        output_file.writelines(f"{delimter.join(ss)}\n" for ss in rows)
+
+    sys.stderr.write(f"{matched} of {total} variants are matched to rsID\n")
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
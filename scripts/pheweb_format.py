@@ -13,6 +13,9 @@ import textwrap
 from signal import SIG_DFL, SIGPIPE, signal
 import math
 
+from chrom_table import PHEWEB_CHR
+from gwas_io import openInput, openOutput
+
 
 warnings.filterwarnings("ignore")
 signal(
@@ -52,6 +55,7 @@ def getParser():
         Example:zcat _crp.regenie.gz| pheweb_format.py -i 1 2 4 5 6 --log10P --beta '-5' --sebeta '-4' --af 6 --num_samples 7 | column -t
         
         If is by GWASFormat, then pheweb_format.py -i 1 2 4 3 8 --af 7
+        Read and write bgzip directly: pheweb_format.py -I yourfile.tsv.gz -O yourfile.pheweb.tsv.gz -i 1 2 4 3 8 --af 7
 
         Ohter format
             | Column Description                        | Name         | Command Line Argument | Other Allowed Column Names | Allowed Values                                        |
@@ -142,27 +146,33 @@ def getParser():
         type=int,
         help="Number of Cases. Integer, must be the same for every variant in its phenotype.",
     )
+    parser.add_argument(
+        "-I",
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip). Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
 
     return parser
 
 
 def formatChr(x, nochr=False):
-    if x.startswith("chr"):
-        return x
-    elif x.isdigit():
-        if int(x) < 23:
-            return "chr" + str(int(x))
-        else:
-            if x == "23":
-                return "chrX"
-            elif x == "24":
-                return "chrY"
-            elif x == "25":
-                return "chrX"
-            elif x == "26":
-                return "chrMT"
-    else:
-        return x
+    return PHEWEB_CHR[x]
 
 
 # def resetID(line, orderList, IncludeOld=False, is_sort=False, delimter=None,addChr=False):
@@ -271,8 +281,10 @@ if __name__ == "__main__":
     islog10P = args.log10P
     delimter = None
 
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
     line_idx = 1
-    for line in sys.stdin:
+    for line in input_file:
         ss = line.split(delimter)
         formated_ss = []
         for k, v in column_mapping.items():
@@ -292,10 +304,10 @@ if __name__ == "__main__":
             if delimter is not None
             else "\t".join(formated_ss)
         )
-        sys.stdout.write(f"{formated_ss}\n")
+        output_file.write(f"{formated_ss}\n")
         line_idx += 1
 
-
-sys.stdout.close()
-sys.stderr.flush()
-sys.stderr.close()
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
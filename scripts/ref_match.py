@@ -0,0 +1,504 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Description:       : harmonise GWAS summary statistics to the reference genome, other_allele is the reference base
+@Date     :2026/10/17
+@Author      :Tingfeng Xu
+@version      :1.0
+"""
+import argparse
+import sys
+import textwrap
+import warnings
+from itertools import islice, product
+from signal import SIG_DFL, SIGPIPE, signal
+
+import numpy as np
+
+from check_genome_build import MmapFasta, loadFasta
+from chrom_table import ChromTable, numericChr
+from generateMetaFile import generateMeta, updateMeta
+from gwas_io import isGzip, openInput, openOutput
+from resetID2 import header_mapper
+
+HARMONISE_BATCH_SIZE = 65536  # lines harmonised at once, reference bases of a batch are fetched contig by contig
+NA = "#NA"
+NA_VALUES = {"#NA", "NA", "NaN", "nan", ""}  # values never flipped
+COMPLEMENT = {"A": "T", "T": "A", "C": "G", "G": "C"}
+EFFECT_COLS = {"beta": "beta", "odds_ratio": "ratio", "hazard_ratio": "ratio"}  # effect column => how it is flipped
+PALINDROMIC_MODES = ["forward", "drop"]
+# actions of harmonise, the counts are reported in this order
+ALIGNED, SWAPPED, FLIPPED, FLIPPED_SWAPPED = "aligned", "swapped", "strand_flipped", "strand_flipped_swapped"
+UNMATCHED, NO_REFERENCE, NOT_SNP = "unmatched", "no_reference", "not_snp"
+ACTIONS = [ALIGNED, SWAPPED, FLIPPED, FLIPPED_SWAPPED, UNMATCHED, NO_REFERENCE, NOT_SNP]
+
+warnings.filterwarnings("ignore")
+signal(
+    SIGPIPE, SIG_DFL
+)  # prevent IOError: [Errno 32] Broken pipe. If pipe closed by 'head'.
+
+
+def getParser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(
+            """
+        %prog harmonise the alleles of GWASFormat.py output to the reference genome in one pass
+
+        For each SNP the reference base is read from the fasta, alleles are oriented so that other_allele is the
+        reference base and effect_allele is the alternative:
+            aligned                 other_allele is the reference base, unchanged
+            swapped                 effect_allele is the reference base, alleles are swapped, effect and frequency flipped
+            strand_flipped          reverse strand, alleles are complemented
+            strand_flipped_swapped  reverse strand and swapped
+        beta and the ci are negated, odds_ratio and hazard_ratio and the ci are inverted, effect_allele_frequency is 1 - eaf.
+        The ref_allele column is set to OA (GWAS-SSF: the other allele is the reference) for the harmonised rows.
+
+        Palindromic SNPs (A/T, C/G) can not tell a strand flip from a swap, they are taken as forward strand by
+        default or dropped by --palindromic drop. Indels, unmatched SNPs and SNPs without a reference base are
+        kept unchanged, or dropped by --drop. The counts of each case are written to stderr.
+
+        An uncompressed fasta is read through mmap, a bgzip fasta through pyfaidx, in both cases the positions of a
+        batch are fetched contig by contig in sorted order. Chromosomes are matched as 1-22, X/23, Y/24, MT/M/25,
+        with or without chr prefix.
+
+        Example Code:
+            zcat sumstats.tsv.gz | %prog -r GRCh37.fasta | bgzip > sumstats.harmonised.tsv.gz
+            %prog -r GRCh37.fasta.gz -col variant_id --input sumstats.tsv.gz -O sumstats.harmonised.tsv.gz --meta
+        """
+        ),
+    )
+    parser.add_argument(
+        "-r",
+        "--ref",
+        dest="ref",
+        required=True,
+        help="Reference genome fasta, plain or bgzip (with .fai and .gzi, by pyfaidx).",
+    )
+    parser.add_argument(
+        "-i",
+        "--cols",
+        dest="cols",
+        nargs=4,
+        default=["chromosome", "base_pair_location", "effect_allele", "other_allele"],
+        help="Columns of chromosome, position, effect allele and other allele, by index (starts from 1) or name. Default: chromosome base_pair_location effect_allele other_allele",
+    )
+    parser.add_argument(
+        "--effect",
+        dest="effect",
+        default=None,
+        help=f"Effect column, by index or name, inverted if named odds_ratio or hazard_ratio, else negated as beta. Default: the first of {', '.join(EFFECT_COLS)} in the header.",
+    )
+    parser.add_argument(
+        "--eaf",
+        dest="eaf",
+        default="effect_allele_frequency",
+        help="Effect allele frequency column, by index or name, skipped if not in the header. Default: effect_allele_frequency",
+    )
+    parser.add_argument(
+        "-c",
+        "--ref-col",
+        dest="ref_col",
+        default="ref_allele",
+        help="Column set to OA for harmonised rows, added to the end if not in the header. Default: ref_allele",
+    )
+    parser.add_argument(
+        "-col",
+        "--id-col",
+        dest="id_col",
+        default=None,
+        help="Variant ID column (chr:pos:allele:allele) to update with the harmonised alleles, by index or name. Default: none.",
+    )
+    parser.add_argument(
+        "-I",
+        "--id-delimiter",
+        dest="id_delimiter",
+        default=":",
+        help="Delimiter of the variant ID of -col. Default: ':'.",
+    )
+    parser.add_argument(
+        "--palindromic",
+        dest="palindromic",
+        choices=PALINDROMIC_MODES,
+        default="forward",
+        help="forward: take palindromic SNPs as forward strand; drop: drop them. Default: forward",
+    )
+    parser.add_argument(
+        "--drop",
+        dest="drop",
+        action="store_true",
+        help="Drop the rows which are not harmonised: indels, unmatched SNPs and SNPs without a reference base.",
+    )
+    parser.add_argument(
+        "-m",
+        "--meta",
+        dest="meta",
+        nargs="?",
+        const=True,
+        default=None,
+        help="Set is_harmonised: true in the meta file. With a path, the meta file is updated; without, the meta file of -O is written by generateMetaFile.py, keeping the fields of an existing one.",
+    )
+    parser.add_argument(
+        "-d",
+        "--delimiter",
+        dest="delimiter",
+        default="\t",
+        help="Delimiter of the input and output. Default: tab.",
+    )
+    parser.add_argument(
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip), with header. Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
+    return parser
+
+
+def harmoniseAction(ea, oa, ref):
+    """
+    How to orient a SNP to the reference base.
+
+    Returns:
+        tuple: (action, effect_allele, other_allele) after harmonising.
+
+    Usage Examples:
+        harmoniseAction("G", "A", "A")  # Returns ("aligned", "G", "A")
+        harmoniseAction("A", "G", "A")  # Returns ("swapped", "G", "A")
+        harmoniseAction("C", "T", "A")  # Returns ("strand_flipped", "G", "A")
+    """
+    if oa == ref:
+        return ALIGNED, ea, oa
+    if ea == ref:
+        return SWAPPED, oa, ea
+    ea_c, oa_c = COMPLEMENT[ea], COMPLEMENT[oa]
+    if oa_c == ref:
+        return FLIPPED, ea_c, oa_c
+    if ea_c == ref:
+        return FLIPPED_SWAPPED, oa_c, ea_c
+    return UNMATCHED, ea, oa
+
+
+# (effect_allele, other_allele, reference base) => (action, effect_allele, other_allele, palindromic) of all SNPs
+HARMONISE_TABLE = {
+    (ea, oa, ref): (*harmoniseAction(ea, oa, ref), COMPLEMENT[ea] == oa)
+    for ea, oa, ref in product(COMPLEMENT, repeat=3)
+    if ea != oa
+}
+
+
+class FaidxFasta:
+    """
+    Reference genome of a bgzip fasta through pyfaidx, with the same index and fetchContig as MmapFasta.
+
+    The span of the positions is read at once, so sorted input reads each block of the fasta once.
+    """
+
+    def __init__(self, refSeq_path):
+        self.fasta = loadFasta()(refSeq_path, rebuild=False)
+        self.index = {name: (len(record),) for name, record in self.fasta.records.items()}
+
+    def fetchContig(self, contig, positions):
+        """
+        See MmapFasta.fetchContig.
+        """
+        length = self.index[contig][0]
+        bases = np.zeros(len(positions), dtype=np.uint8)
+        in_contig = np.flatnonzero((positions >= 1) & (positions <= length))
+        if len(in_contig) == 0:
+            return bases
+        pos = positions[in_contig]
+        lo, hi = int(pos.min()), int(pos.max())
+        span = np.frombuffer(self.fasta[contig][lo - 1 : hi].seq.encode("ascii"), dtype=np.uint8)
+        bases[in_contig] = span[pos - lo]
+        return bases
+
+
+def openFasta(refSeq_path):
+    """
+    MmapFasta of an uncompressed fasta, FaidxFasta of a bgzip fasta.
+    """
+    if isGzip(refSeq_path):
+        return FaidxFasta(refSeq_path)
+    return MmapFasta(refSeq_path)
+
+
+def contigNames(fasta):
+    """
+    numericChr (M as MT) => contig name of the fasta, the first contig is kept if more have the same name.
+    """
+    names = {}
+    for name in fasta.index:
+        names.setdefault(numericChr(name, m_as_mt=True), name)
+    return names
+
+
+def negateText(x):
+    """
+    -x without parsing the number, so the digits are kept, e.g. "0.0123" => "-0.0123".
+    """
+    if x in NA_VALUES:
+        return x
+    if x.startswith("-"):
+        return x[1:]
+    if x.startswith("+"):
+        return "-" + x[1:]
+    try:
+        if float(x) == 0:
+            return x
+    except ValueError:
+        return x
+    return "-" + x
+
+
+def inverseText(x):
+    try:
+        return repr(1 / float(x))
+    except (ValueError, ZeroDivisionError):
+        return x
+
+
+def complementFreq(x):
+    """
+    1 - x with the same decimal places as x, e.g. "0.571" => "0.429".
+    """
+    try:
+        value = 1 - float(x)
+    except ValueError:
+        return x
+    if "." in x and "e" not in x and "E" not in x:
+        return f"{value:.{len(x) - x.index('.') - 1}f}"
+    return repr(value)
+
+
+class Harmoniser:
+    """
+    Harmonise batches of split rows.
+
+    Args:
+        fasta (MmapFasta or FaidxFasta): Reference genome.
+        cols (list): 0-based columns of chromosome, position, effect allele and other allele.
+        ref_idx (int): 0-based ref_allele column, appended to the rows if it is the length of the header.
+        effect_idx (int, optional): 0-based effect column.
+        effect_type (str): "beta" or "ratio".
+        eaf_idx (int, optional): 0-based effect allele frequency column.
+        ci_idx (tuple, optional): 0-based (ci_upper, ci_lower) columns.
+        id_idx (int, optional): 0-based variant ID column.
+        id_delimiter (str): Delimiter of the variant ID.
+        palindromic (str): One of PALINDROMIC_MODES.
+        drop (bool): Drop the rows which are not harmonised.
+
+    Attributes:
+        counts (dict): Rows of each of ACTIONS, and "palindromic".
+    """
+
+    def __init__(
+        self,
+        fasta,
+        cols,
+        ref_idx,
+        effect_idx=None,
+        effect_type="beta",
+        eaf_idx=None,
+        ci_idx=None,
+        id_idx=None,
+        id_delimiter=":",
+        palindromic="forward",
+        drop=False,
+    ):
+        self.fasta = fasta
+        self.contigs = contigNames(fasta)
+        self.chr_table = ChromTable(numericChr, m_as_mt=True)
+        self.cols = cols
+        self.ref_idx = ref_idx
+        self.effect_idx = effect_idx
+        self.flipEffect = negateText if effect_type == "beta" else inverseText
+        self.eaf_idx = eaf_idx
+        self.ci_idx = ci_idx
+        self.id_idx = id_idx
+        self.id_delimiter = id_delimiter
+        self.palindromic = palindromic
+        self.drop = drop
+        self.counts = dict.fromkeys(ACTIONS + ["palindromic"], 0)
+
+    def referenceBases(self, rows):
+        """
+        Uppercase reference base of each row, "\\0" if the contig or position is not in the fasta.
+        """
+        chr_idx, pos_idx = self.cols[0], self.cols[1]
+        n = len(rows)
+        chroms = [ss[chr_idx] for ss in rows]
+        pos_text = [ss[pos_idx] for ss in rows]
+        try:
+            pos = np.array(pos_text).astype(np.int64)
+        except ValueError:  # NA positions
+            pos = np.fromiter((int(x) if x.isdigit() else 0 for x in pos_text), dtype=np.int64, count=n)
+
+        bases = np.zeros(n, dtype=np.uint8)
+        code_of = {chrom: i for i, chrom in enumerate(dict.fromkeys(chroms))}
+        codes = np.fromiter(map(code_of.__getitem__, chroms), dtype=np.int64, count=n) if len(code_of) > 1 else None
+        for chrom, code in code_of.items():
+            contig = self.contigs.get(self.chr_table[chrom])
+            if contig is None:
+                continue
+            if codes is None:
+                bases = self.fasta.fetchContig(contig, pos)
+            else:
+                idx = np.flatnonzero(codes == code)
+                bases[idx] = self.fasta.fetchContig(contig, pos[idx])
+        bases = np.where((bases >= 97) & (bases <= 122), bases - 32, bases).astype(np.uint8)  # soft-masked
+        return bases.tobytes().decode("latin-1")
+
+    def flipRow(self, ss, action):
+        """
+        Flip effect, ci and effect allele frequency of a swapped row.
+        """
+        if action != SWAPPED and action != FLIPPED_SWAPPED:
+            return
+        if self.effect_idx is not None:
+            ss[self.effect_idx] = self.flipEffect(ss[self.effect_idx])
+        if self.ci_idx is not None:
+            upper, lower = self.ci_idx
+            ss[upper], ss[lower] = self.flipEffect(ss[lower]), self.flipEffect(ss[upper])
+        if self.eaf_idx is not None:
+            ss[self.eaf_idx] = complementFreq(ss[self.eaf_idx])
+
+    def updateID(self, ss, ea, oa, new_ea, new_oa):
+        parts = ss[self.id_idx].split(self.id_delimiter)
+        if len(parts) != 4:
+            return
+        if parts[2] == oa and parts[3] == ea:
+            parts[2], parts[3] = new_oa, new_ea
+        elif parts[2] == ea and parts[3] == oa:
+            parts[2], parts[3] = new_ea, new_oa
+        else:
+            return
+        ss[self.id_idx] = self.id_delimiter.join(parts)
+
+    def harmonise(self, rows):
+        """
+        Harmonise split rows in place.
+
+        Returns:
+            list: The rows kept.
+        """
+        _, _, ea_idx, oa_idx = self.cols
+        ref_idx, counts = self.ref_idx, self.counts
+        out = []
+        for ss, ref in zip(rows, self.referenceBases(rows)):
+            if len(ss) == ref_idx:  # added column
+                ss.append(NA)
+            ea, oa = ss[ea_idx], ss[oa_idx]
+            hit = HARMONISE_TABLE.get((ea, oa, ref))
+            if hit is None:
+                action = NOT_SNP if (ea, oa, "A") not in HARMONISE_TABLE else NO_REFERENCE
+                counts[action] += 1
+                if not self.drop:
+                    out.append(ss)
+                continue
+
+            action, new_ea, new_oa, palindromic = hit
+            if palindromic:
+                counts["palindromic"] += 1
+                if self.palindromic == "drop":
+                    continue
+            counts[action] += 1
+            if action == UNMATCHED:
+                if not self.drop:
+                    out.append(ss)
+                continue
+
+            if action != ALIGNED:
+                ss[ea_idx], ss[oa_idx] = new_ea, new_oa
+                self.flipRow(ss, action)
+                if self.id_idx is not None:
+                    self.updateID(ss, ea, oa, new_ea, new_oa)
+            ss[ref_idx] = "OA"
+            out.append(ss)
+        return out
+
+
+def columnIndex(x, header):
+    return header_mapper(x, header) - 1
+
+
+def optionalColumnIndex(x, header):
+    """
+    0-based column of x, None if x is None or a name not in the header.
+    """
+    if x is None or (x not in header and not x.lstrip("-").isdigit()):
+        return None
+    return columnIndex(x, header)
+
+
+if __name__ == "__main__":
+    parser = getParser()
+    args = parser.parse_args()
+    if args.meta is True and args.output is None:
+        raise ValueError("--meta without a path needs -O, or give the meta file: --meta sumstats-meta.yaml")
+
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
+    delimter = args.delimiter
+
+    line = input_file.readline()
+    while line.startswith("##"):
+        output_file.write(line)
+        line = input_file.readline()
+    header = line.rstrip("\r\n").split(delimter)
+
+    effect_idx = optionalColumnIndex(args.effect or next((x for x in EFFECT_COLS if x in header), None), header)
+    if effect_idx is None:
+        sys.stderr.write(f"no {'/'.join(EFFECT_COLS)} column, only the alleles and frequency are harmonised\n")
+    ci_idx = (header.index("ci_upper"), header.index("ci_lower")) if "ci_upper" in header and "ci_lower" in header else None
+    if args.ref_col in header:
+        ref_idx = header.index(args.ref_col)
+    else:
+        ref_idx = len(header)
+        header.append(args.ref_col)
+
+    harmoniser = Harmoniser(
+        openFasta(args.ref),
+        [columnIndex(x, header) for x in args.cols],
+        ref_idx,
+        effect_idx=effect_idx,
+        effect_type=EFFECT_COLS.get(header[effect_idx], "beta") if effect_idx is not None else "beta",
+        eaf_idx=optionalColumnIndex(args.eaf, header),
+        ci_idx=ci_idx,
+        id_idx=columnIndex(args.id_col, header) if args.id_col is not None else None,
+        id_delimiter=args.id_delimiter,
+        palindromic=args.palindromic,
+        drop=args.drop,
+    )
+    output_file.write(delimter.join(header) + "\n")
+
+    for block in iter(lambda: list(islice(input_file, HARMONISE_BATCH_SIZE)), []):
+        rows = harmoniser.harmonise([x.rstrip("\r\n").split(delimter) for x in block])
+        output_file.writelines(f"{delimter.join(ss)}\n" for ss in rows)
+    output_file.close()
+
+    counts = harmoniser.counts
+    sys.stderr.write("".join(f"{k}\t{v}\n" for k, v in counts.items()))
+    if args.meta is True:
+        metaFileName, _ = generateMeta(args.output, keep=True, fields={"is_harmonised": True})
+        sys.stderr.write(f"is_harmonised is set in {metaFileName}\n")
+    elif args.meta:
+        updateMeta(args.meta, is_harmonised=True)
+        sys.stderr.write(f"is_harmonised is set in {args.meta}\n")
+
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
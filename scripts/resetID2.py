@@ -7,11 +7,31 @@
 @version      :2.0
 """
 import argparse
+import itertools
+import operator
 import sys
 import warnings
 import textwrap
+from hashlib import blake2b
 from signal import SIG_DFL, SIGPIPE, signal
 
+from chrom_table import MAX_CACHE_SIZE, NUMERIC_CHR, PREFIXED_CHR
+from gwas_io import openInput, openOutput
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEDUPE_MODES = ["report", "drop", "suffix"]
+DEDUPE_BATCH_SIZE = 4096  # IDs hashed and inserted at once, small batches of split rows keep the garbage collector cheap
+DEDUPE_SUFFIX = "_dup"  # suffix mode: the 2nd and later copies of ID are ID_dup1, ID_dup2, ...
+DEDUPE_REPORT_LIMIT = 20  # duplicated IDs listed in the report
+ID_TABLE_SIZE = 1 << 20  # initial slots of IDHashSet, doubled when more than ID_TABLE_LOAD full
+ID_TABLE_LOAD = 0.75
+ID_GROW_CHUNK = 1 << 16  # hashes moved to the doubled table at once
+HASH_WIDTH = 64  # IDs up to this many bytes are hashed in one vectorized pass
+
 
 warnings.filterwarnings("ignore")
 signal(
@@ -51,11 +71,17 @@ def getParser():
                This renames the 'variant_id' column and formats it as chr:pos:ref:alt, 
                sorts ref and alt alleles, and adds 'chr' prefix to chr column.
             4. if the format is by GWASFormat then `resetID2.py -i variant_id 1 2 4 3` is ok 
+            5. read and write bgzip files directly: `resetID2.py --input test.tsv.gz -O test.newid.tsv.gz -i variant_id 1 2 4 3`
             
 
             For Plink Users:
             1. cat g1000_eur_GRCh38.pvar | resetID2.py -i 1 2 4 5 --add-col new_id | tail -n +2 |awk '{print $3, $6}' > id.map
             2. plink2 --pfile g1000_eur_GRCh38 --update-name  id.map --make-just-pvar --out g1000_eur_GRCh38  
+            or without awk, '##' lines of pvar and VCF are understood:
+            1. resetID2.py --input g1000_eur_GRCh38.pvar -i ID '#CHROM' POS REF ALT --emit-map -O id.map
+            2. resetID2.py --input in.vcf.gz -i ID '#CHROM' POS REF ALT --splice -O out.vcf.gz
+
+            Lines starting with '##' before the header (VCF and pvar meta lines) are copied unchanged.
             """
         ),
     )
@@ -108,6 +134,45 @@ def getParser():
     )
     parser.add_argument('--no-header', dest='no_header', action='store_true', help='Input file has no header.')
     parser.add_argument('--add-col', dest='add_col',required=False, default=None, help='Add new column for the new ID with --add-col new_ID_name.')
+    parser.add_argument(
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip). Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
+    parser.add_argument(
+        "--emit-map",
+        dest="emit_map",
+        action="store_true",
+        help="Only write 'old_id<TAB>new_id' for each variant, e.g. for plink2 --update-name. The header and '##' lines are not written. Needs the ID column in -i, not --add-col.",
+    )
+    parser.add_argument(
+        "--dedupe",
+        dest="dedupe",
+        choices=DEDUPE_MODES,
+        default=None,
+        help="Find duplicated new IDs in the same pass. report: write all lines and report the duplicates and multi-allelic positions to stderr; drop: keep the first line of each ID; suffix: rename the later copies ID_dup1, ID_dup2, ... With numpy only stable 64-bit hashes are kept, in a table 37-75%% full (measured: 24M IDs in a 256 MiB table, 372 MiB peak; 100M IDs in a 1 GiB table); a repeated hash is checked against the IDs seen with it.",
+    )
+    parser.add_argument(
+        "--splice",
+        dest="splice",
+        action="store_true",
+        help="Only split the line up to the last column of -i, and copy the rest of the line unchanged. The input must be delimited by -d (default: tab in this mode), the separators of the line are kept.",
+    )
 
     return parser
 
@@ -146,35 +211,11 @@ def formatChr(x, nochr=True):
         - ValueError will be raised if the given chromosome identifier is invalid.
         - When nochr is True, "x", "y", "mt" will be converted to 23, 24, 25.
         - When nochr is False, 23, 24, 25 will be converted to "chrX", "chrY", "chrMT".
+        - Values are looked up in the memoized tables of chrom_table.
     """
-    if isinstance(x, int):
-        x = str(x)
-
     if nochr:
-        x = x.lower()
-        # remove chr
-        if x.startswith("chr"):
-            x = x.lstrip("chr")
-        # turn x, y, mt => 23, 24, 25
-        if x == "x":
-            x = "23"
-        elif x == "y":
-            x = "24"
-        elif x == "mt" or "m":
-            x = "25"
-
-        return x
-    else:
-        if x not in ["23", "24", "25"]:
-            x = "chr" + x
-        else:
-            if x == "23":
-                x = "chrX"
-            elif x == "24":
-                x = "chrY"
-            elif x == "25":
-                x = "chrMT"
-        return x
+        return NUMERIC_CHR[x]
+    return PREFIXED_CHR[x]
 
 
 # def resetID_by_pattern(line, reset_pattern, delimter=None, need_sort=False, needChr=False):
@@ -210,6 +251,34 @@ def header_mapper(string, header_col):
     return idx
 
 
+def resetHeader(header, orderList, new_col_name=None, need_sort=False, drop_suffix=False):
+    """
+    Update the header and map the orderList (col_idx or col_name) to column index.
+
+    Args:
+        header (list): The header of the input file, updated in place.
+        orderList (list): The order of columns for ID, chr, pos, ref, alt, by index or name.
+        new_col_name (str, optional): Name of the new ID column of --add-col. Default is None.
+        need_sort (bool, optional): Whether the alleles are sorted, then "_sorted_alleles" is added to the ID column name.
+        drop_suffix (bool, optional): Do not add "_sorted_alleles" even if need_sort is True.
+
+    Returns:
+        tuple: (header, orderList), orderList is 1-based column index.
+    """
+    if new_col_name:
+        header.append(new_col_name)
+
+    # parse order list with col_idx or col_name
+    orderList = [header_mapper(x, header) for x in orderList]
+
+    if need_sort:
+        idCol = orderList[0]
+
+        if not drop_suffix:
+            header[idCol - 1] = header[idCol - 1] + "_sorted_alleles"
+    return header, orderList
+
+
 def resetID2(
     ss,
     orderList,
@@ -220,6 +289,7 @@ def resetID2(
     needChr=False,
     includeOld=False,
     add_col=False,
+    join=True,
 ):
     """
     Reset the ID format in a line based on the specified order and options.
@@ -233,6 +303,7 @@ def resetID2(
         need_sort (bool, optional): Whether to sort reference and alternate alleles. Default is False.
         needChr (bool, optional): Whether to add "chr" prefix to chromosome identifier. Default is False.
         includeOld (bool, optional): Whether to include the old ID in the new ID. Default is False.
+        join (bool, optional): Whether to join the values by delimter. Default is True, False returns the list.
 
     Returns:
         str: The input line with the ID column reset based on the specified order and options.
@@ -278,7 +349,7 @@ def resetID2(
     else:
         stemp = [A0, A1]
     if needChr:
-        chr = formatChr(chr, not needChr)
+        chr = PREFIXED_CHR[chr]
     newID = chr + ID_delimter + pos + ID_delimter + stemp[0] + ID_delimter + stemp[1]
     if includeOld:
         newID = newID + ID_delimter + oldID if oldID is not None else newID
@@ -288,10 +359,347 @@ def resetID2(
     else: 
         ss[idCol - 1] = newID
 
+    if not join:
+        return ss
     ss = delimter.join(ss) if delimter is not None else "\t".join(ss)
     return ss
 
 
+def makeIDBuilder(orderList, ID_delimter=":", need_sort=False, needChr=False, includeOld=False, return_id=False):
+    """
+    Make the function setting the new ID of a split line, specialized once for the options, same IDs as resetID2.
+
+    Args:
+        orderList (list): 1-based column index of ID, or of ID, chr, pos, ref, alt, as returned by resetHeader.
+        ID_delimter (str, optional): Delimiter of the ID. Default is ":".
+        need_sort (bool, optional): Whether to sort reference and alternate alleles. Default is False.
+        needChr (bool, optional): Whether to add "chr" prefix to chromosome identifier. Default is False.
+        includeOld (bool, optional): Whether to include the old ID in the new ID. Default is False.
+        return_id (bool, optional): Return newID(ss) which returns the new ID and leaves ss unchanged. Default is False.
+
+    Returns:
+        function: setID(ss), set the ID column of the split line ss in place, or newID(ss) if return_id.
+
+    Raises:
+        ValueError: If the length of orderList is not 1 or 5.
+
+    Notes:
+        - "chr:" prefixes and "ref:alt" allele pairs are cached, so a SNP ID is one lookup of each and one format.
+        - The caches keep up to MAX_CACHE_SIZE entries, rarer chromosomes and long indels are built without caching.
+    """
+    d = ID_delimter
+    chr_prefixes = {}
+    allele_pairs = {}
+
+    def chrPrefix(chr):
+        prefix = (PREFIXED_CHR[chr] if needChr else chr) + d
+        if len(chr_prefixes) < MAX_CACHE_SIZE:
+            chr_prefixes[chr] = prefix
+        return prefix
+
+    def allelePair(A0, A1):
+        if need_sort and A1 < A0:
+            pair = A1 + d + A0
+        else:
+            pair = A0 + d + A1
+        if len(allele_pairs) < MAX_CACHE_SIZE:
+            allele_pairs[A0, A1] = pair
+        return pair
+
+    if len(orderList) == 1:
+        idIdx = int(orderList[0]) - 1
+
+        def newID(ss):
+            oldID = ss[idIdx]
+            chr, pos, A0, A1 = oldID.split(d)
+            try:
+                prefix = chr_prefixes[chr]
+            except KeyError:
+                prefix = chrPrefix(chr)
+            try:
+                pair = allele_pairs[A0, A1]
+            except KeyError:
+                pair = allelePair(A0, A1)
+            return f"{prefix}{pos}{d}{pair}{d}{oldID}" if includeOld else f"{prefix}{pos}{d}{pair}"
+
+    elif len(orderList) == 5:
+        idIdx, chrIdx, posIdx, refIdx, altIdx = [int(x) - 1 for x in orderList]
+
+        def newID(ss):
+            chr, A0, A1 = ss[chrIdx], ss[refIdx], ss[altIdx]
+            try:
+                prefix = chr_prefixes[chr]
+            except KeyError:
+                prefix = chrPrefix(chr)
+            try:
+                pair = allele_pairs[A0, A1]
+            except KeyError:
+                pair = allelePair(A0, A1)
+            if includeOld:
+                return f"{prefix}{ss[posIdx]}{d}{pair}{d}{ss[idIdx]}"
+            return f"{prefix}{ss[posIdx]}{d}{pair}"
+
+    else:
+        raise ValueError(
+            "Error: orderList should contain at least one element, which is ID col"
+        )
+
+    if return_id:
+        return newID
+
+    def setID(ss):
+        ss[idIdx] = newID(ss)
+
+    return setID
+
+
+def stableHashes(encoded):
+    """
+    64-bit hash of each ID (bytes), the same in every process, unlike hash() which is salted.
+
+    The batch is packed into one fixed-width array and mixed 8 bytes at a time, a few vectorized steps for the
+    whole batch; IDs longer than HASH_WIDTH bytes (long indels) are hashed one by one with blake2b.
+    """
+    lengths = np.fromiter(map(len, encoded), dtype=np.uint64, count=len(encoded))
+    width = min(-(-int(lengths.max(initial=1)) // 8) * 8, HASH_WIDTH)
+    words = np.array(encoded, dtype=f"S{width}").view("<u8").reshape(len(encoded), width // 8)  # zero padded
+
+    h = lengths * np.uint64(0x9E3779B97F4A7C15)
+    for j in range(words.shape[1]):
+        # only the words of each ID, so the hash does not depend on the longest ID of the batch
+        mixed = (h ^ words[:, j]) * np.uint64(0xFF51AFD7ED558CCD)
+        mixed ^= mixed >> np.uint64(32)
+        h = np.where(lengths > 8 * j, mixed, h)
+    # splitmix64 finalizer, the table is probed by the low bits
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+
+    for i in np.flatnonzero(lengths > HASH_WIDTH).tolist():
+        h[i] = int.from_bytes(blake2b(encoded[i], digest_size=8).digest(), "little")
+    return h
+
+
+class IDHashSet:
+    """
+    Set of IDs kept as stable 64-bit hashes in an open-addressing numpy array with linear probing, 8 bytes per slot.
+
+    IDs are inserted in batches, each probe round is one vectorized step over the batch. Only a hash seen again is
+    checked exactly: the IDs behind it are kept in a dict, so a different ID with the same hash as an earlier
+    duplicate is still new.
+
+    Notes:
+        - 0 marks an empty slot, a hash of 0 is stored as 1.
+        - The table is doubled when it is more than ID_TABLE_LOAD full, so it is 8 to 16 bytes per ID (a 1 GiB
+          table for 100M IDs).
+        - The ID of a hash first seen in an earlier batch is not stored, it is taken to be the ID which repeats the
+          hash. Two different IDs are then reported as duplicates with probability about n^2 / 2^65 for n IDs
+          (3e-4 for 100M IDs).
+    """
+
+    def __init__(self, size=ID_TABLE_SIZE):
+        self.table = np.zeros(size, dtype=np.uint64)
+        self.mask = np.uint64(size - 1)
+        self.n = 0
+        self.known = {}  # hash seen again => IDs with that hash
+
+    def addMany(self, ids):
+        """
+        Insert IDs (str), return a list of bool, True for IDs which were not in the set.
+
+        An ID repeated in the batch is new only at its first position.
+        """
+        hashes = stableHashes([ID.encode() for ID in ids])
+        hashes[hashes == 0] = 1
+        unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        if (self.n + len(unique)) > ID_TABLE_LOAD * len(self.table):
+            self.grow(self.n + len(unique))
+        unique_new = self.insert(unique)
+        self.n += int(unique_new.sum())
+        is_new = unique_new[inverse]
+        is_new &= first[inverse] == np.arange(len(hashes))
+        is_new = is_new.tolist()
+        if all(is_new):
+            return is_new
+
+        # a hash seen again, compare the IDs behind it
+        known = self.known
+        for i in np.flatnonzero(~np.asarray(is_new)).tolist():
+            h, ID = int(hashes[i]), ids[i]
+            same_hash = known.get(h)
+            if same_hash is None:
+                u = inverse[i]
+                # the first ID is known if it is in this batch, else it is taken to be this one
+                same_hash = known[h] = {ids[first[u]] if unique_new[u] else ID}
+            if ID not in same_hash:
+                same_hash.add(ID)
+                is_new[i] = True
+        return is_new
+
+    def insert(self, unique):
+        table, mask = self.table, self.mask
+        pos = unique & mask
+        is_new = np.zeros(len(unique), dtype=bool)
+        pending = np.arange(len(unique))
+        while pending.size:
+            p = pos[pending]
+            candidates = unique[pending]
+            slots = table[p]
+            done = slots == candidates
+            empty = slots == 0
+            # several candidates may write the same empty slot, one write is kept, reading back tells which
+            table[p[empty]] = candidates[empty]
+            won = empty & (table[p] == candidates)
+            is_new[pending[won]] = True
+            done |= won
+            pending = pending[~done]
+            pos[pending] = (pos[pending] + np.uint64(1)) & mask
+        return is_new
+
+    def grow(self, n):
+        size = len(self.table)
+        while n > ID_TABLE_LOAD * size:
+            size *= 2
+        old = self.table[self.table != 0]
+        self.table = np.zeros(size, dtype=np.uint64)
+        self.mask = np.uint64(size - 1)
+        # in chunks, the probe arrays of insert are a few times the size of its input
+        for start in range(0, len(old), ID_GROW_CHUNK):
+            self.insert(old[start : start + ID_GROW_CHUNK])
+
+
+class Deduper:
+    """
+    Find duplicated IDs of streamed rows, see --dedupe.
+
+    Args:
+        mode (str): One of DEDUPE_MODES.
+        ID_delimter (str): Delimiter of the ID, chr and pos are the first two fields, for multi-allelic positions.
+
+    Notes:
+        - With numpy, IDs are kept in IDHashSet, a table of stable 64-bit hashes, the same in every run. A repeated
+          hash is checked against the IDs seen with it, then the ID is kept exactly, so later copies are counted by ID.
+        - Without numpy, a set of the IDs is used.
+        - Multi-allelic positions are adjacent rows with the same chr and pos and different IDs, as in sorted files,
+          they are counted in report mode.
+    """
+
+    def __init__(self, mode, ID_delimter=":"):
+        if mode not in DEDUPE_MODES:
+            raise ValueError(f"--dedupe should be one of {DEDUPE_MODES}, not {mode}")
+        self.mode = mode
+        self.d = ID_delimter
+        self.seen = IDHashSet() if np is not None else set()
+        self.duplicates = {}  # ID => copies after the first
+        self.duplicated_rows = 0
+        self.multi_allelic = 0
+        self.last_id = None
+        self.last_site = None
+
+    def filter(self, rows, idIdx):
+        """
+        Yield the rows, with duplicates dropped or renamed by mode; rows are lists and ss[idIdx] is the ID.
+        """
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, DEDUPE_BATCH_SIZE))
+            if not batch:
+                break
+            yield from self.checkBatch(batch, idIdx)
+
+    def checkBatch(self, batch, idIdx):
+        """
+        The rows of batch to write, batch itself if it has no duplicate.
+        """
+        ids = [ss[idIdx] for ss in batch]
+        if self.mode == "report":
+            self.countMultiAllelic(ids)
+        if isinstance(self.seen, set):
+            is_new = []
+            for ID in ids:
+                is_new.append(ID not in self.seen)
+                self.seen.add(ID)
+        else:
+            is_new = self.seen.addMany(ids)
+        if all(is_new):
+            return batch
+
+        out = []
+        duplicates = self.duplicates
+        for ss, ID, new in zip(batch, ids, is_new):
+            if new:
+                out.append(ss)
+                continue
+            copies = duplicates[ID] = duplicates.get(ID, 0) + 1
+            self.duplicated_rows += 1
+            if self.mode == "drop":
+                continue
+            if self.mode == "suffix":
+                ss[idIdx] = f"{ID}{DEDUPE_SUFFIX}{copies}"
+            out.append(ss)
+        return out
+
+    def countMultiAllelic(self, ids):
+        d = self.d
+        sites = [ID[: ID.find(d, ID.find(d) + 1)] for ID in ids]  # chr:pos
+        previous_sites = [self.last_site] + sites[:-1]
+        previous_ids = [self.last_id] + ids[:-1]
+        self.multi_allelic += sum(
+            map(operator.and_, map(operator.eq, sites, previous_sites), map(operator.ne, ids, previous_ids))
+        )
+        self.last_id, self.last_site = ids[-1], sites[-1]
+
+    def report(self, file=sys.stderr):
+        action = {"report": "kept", "drop": "dropped", "suffix": f"renamed with {DEDUPE_SUFFIX}N"}[self.mode]
+        file.write(f"dedupe: {self.duplicated_rows} duplicated rows ({action}) of {len(self.duplicates)} IDs\n")
+        if self.mode == "report":
+            file.write(
+                f"dedupe: {self.multi_allelic} rows at the chr{self.d}pos of the previous row with another ID (multi-allelic)\n"
+            )
+        for ID, copies in list(self.duplicates.items())[:DEDUPE_REPORT_LIMIT]:
+            file.write(f"dedupe: {ID}\t{copies + 1} rows\n")
+        if len(self.duplicates) > DEDUPE_REPORT_LIMIT:
+            file.write(f"dedupe: ... and {len(self.duplicates) - DEDUPE_REPORT_LIMIT} more IDs\n")
+
+
+def normalRows(lines, setID, delimter=None, add_col=False):
+    for line in lines:
+        ss = line.strip().split(delimter)
+        if add_col:
+            ss.append("")
+        setID(ss)
+        yield ss
+
+
+def spliceRows(lines, newID, idIdx, maxsplit, delimter="\t"):
+    for line in lines:
+        ss = line.rstrip("\r\n").split(delimter, maxsplit)
+        ss[idIdx] = newID(ss)
+        yield ss
+
+
+def spliceAddColRows(lines, newID, maxsplit, delimter="\t"):
+    """
+    [line, new ID], newID reads the ID at index maxsplit, which is empty as the --add-col column of resetID2.
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        ss = line.split(delimter, maxsplit)[:maxsplit]
+        ss.append("")
+        yield [line, newID(ss)]
+
+
+def mapRows(lines, newID, idIdx, maxsplit, delimter=None):
+    """
+    [old ID, new ID] of --emit-map.
+    """
+    for line in lines:
+        ss = line.strip().split(delimter, maxsplit)
+        yield [ss[idIdx], newID(ss)]
+
+
 if __name__ == "__main__":
     parser = getParser()
     args = parser.parse_args()
@@ -307,11 +715,6 @@ if __name__ == "__main__":
     addChr = args.add_chr
     new_col_name = args.add_col
     add_col = True if new_col_name else False
-    # check header and comments
-
-    line_idx = 2 if args.no_header else 1 # 2 will drop to find header 
-    header = None
-
     if args.no_header:
         try:
             orderList = [int(x) for x in orderList]
@@ -326,61 +729,75 @@ if __name__ == "__main__":
             raise ValueError("if add_col is True, the orderList should be 4 not 5")
         
 
-    for line in sys.stdin:
-
-        current_line = line.strip().split(delimter) if delimter is not None else line.strip().split()
-        if args.no_header and line_idx == 2: 
-            end = len(current_line) + 1 
-
+    if args.emit_map and add_col:
+        raise ValueError("--emit-map needs the ID column in -i, not --add-col")
+    if args.splice:
+        delimter = delimter if delimter is not None else "\t"
+
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
+    out_delimter = delimter if delimter is not None else "\t"
+    first_line = input_file.readline()
+    while first_line.startswith("##"):  # VCF / pvar meta lines
+        if not args.emit_map:
+            output_file.write(first_line)
+        first_line = input_file.readline()
+
+    if first_line:
+        current_line = first_line.strip().split(delimter)
+        if args.no_header:
+            end = len(current_line) + 1
             if add_col:
                 end += 1
-
-            header = list(range(1, end)) # fake header 
-            orderList = [int(x) for x in orderList]
-
-
-        if line_idx == 1:
-            header = current_line
- 
-            if add_col:
-                header.append(new_col_name)
-
-            # parse order list with col_idx or col_name
-            orderList = [header_mapper(x, header) for x in orderList]
-
-            if is_sort:
-                idCol = orderList[0]
-
-                if not drop_suffix:
-                    header[idCol - 1] = header[idCol - 1] + "_sorted_alleles"
-                    
-            #     ss = (
-            #         delimter.join(header) if delimter is not None else "\t".join(header)
-            #     )
-
-            # else:
-            #     ss = header
-            ss = delimter.join(header) if delimter is not None else "\t".join(header)
-
+            header = list(range(1, end))  # fake header
+            orderList = [header_mapper(int(x), header) for x in orderList]
         else:
-            if add_col:
-                current_line.append("")
-
-            ss = resetID2(
-                ss=current_line,
-                orderList=orderList,
-                header=header,
-                ID_delimter=id_delimter,
-                includeOld=IncludeOld,
+            header, orderList = resetHeader(
+                current_line,
+                orderList,
+                new_col_name=new_col_name,
                 need_sort=is_sort,
-                delimter=delimter,
-                needChr=addChr,
+                drop_suffix=drop_suffix,
             )
-
-        sys.stdout.write(f"{ss}\n")
-        line_idx += 1
-
-
-sys.stdout.close()
-sys.stderr.flush()
-sys.stderr.close()
+            if not args.emit_map:
+                output_file.write(out_delimter.join(header) + "\n")
+
+        lines = itertools.chain([first_line], input_file) if args.no_header else input_file
+        builder_options = {
+            "ID_delimter": id_delimter,
+            "need_sort": is_sort,
+            "needChr": addChr,
+            "includeOld": IncludeOld,
+        }
+        if args.emit_map or args.splice:
+            # split only up to the last column used, the rest of the line stays one string
+            idIdx = orderList[0] - 1
+            maxsplit = max(orderList[1:] if add_col else orderList)
+            if add_col:  # the ID is after the split columns, with an empty old ID as resetID2
+                newID = makeIDBuilder([maxsplit + 1] + orderList[1:], return_id=True, **builder_options)
+            else:
+                newID = makeIDBuilder(orderList, return_id=True, **builder_options)
+
+        # rows are split lines, joined by joiner, with the new ID at rows_id_idx
+        if args.emit_map:
+            rows, joiner, rows_id_idx = mapRows(lines, newID, idIdx, maxsplit, delimter), "\t", 1
+        elif args.splice and add_col:
+            rows, joiner, rows_id_idx = spliceAddColRows(lines, newID, maxsplit, delimter), delimter, 1
+        elif args.splice:
+            rows, joiner, rows_id_idx = spliceRows(lines, newID, idIdx, maxsplit, delimter), delimter, idIdx
+        else:
+            setID = makeIDBuilder(orderList, **builder_options)
+            rows, joiner, rows_id_idx = normalRows(lines, setID, delimter, add_col), out_delimter, orderList[0] - 1
+
+        if args.dedupe:
+            deduper = Deduper(args.dedupe, ID_delimter=id_delimter)
+            rows = deduper.filter(rows, rows_id_idx)
+        for ss in rows:
+            output_file.write(joiner.join(ss) + "\n")
+        if args.dedupe:
+            deduper.report()
+
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()
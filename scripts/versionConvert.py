@@ -8,14 +8,21 @@
 '''
 import argparse
 
+import os
 import re
 import sys
 
 import textwrap
 import warnings
+from itertools import islice
 from signal import SIG_DFL, SIGPIPE, signal
 
+from chain_lifter import ChainCursor, ChainLifter, np
+from chrom_table import LIFTOVER_CHR
+from gwas_io import openInput, openOutput
+
 DEFAULT_NA = "NA"
+LIFT_BATCH_SIZE = 100000  # lines of each batch of the numpy engine
 
 warnings.filterwarnings("ignore")
 signal(
@@ -39,6 +46,11 @@ except ImportError:
         print("安装liftover模块时出错。请手动安装liftover。")
         sys.exit(1)
 
+try:
+    from liftover import default_cache_dir
+except ImportError:  # old liftover only uses ~/.liftover
+    default_cache_dir = None
+
 
 def header_mapper(string, header_col):
     """
@@ -84,26 +96,11 @@ def formatChrLiftover(x, nochr=True):
     Raises:
         ValueError: If the chromosome identifier is unknown or invalid.
 
+    Notes:
+        - Values are looked up in the memoized table LIFTOVER_CHR of chrom_table.
     """
-    if isinstance(x, int):
-        x = str(x)
-    if x.startswith("0"):
-        x = x.lstrip("0")
-
     if nochr:
-        x = x.lower()
-        # remove chr
-        if x.startswith("chr"):
-            x = x.lstrip("chr")
-        # turn x, y, mt => 23, 24, 25
-        if x == "x" or x == "23":
-            x = "X"
-        elif x == "y" or x == "24":
-            x = "Y"
-        elif x == "mt" or x == "25":
-            x = "MT"
-
-        return x
+        return LIFTOVER_CHR[x]
 
 
 def is_valid_chromosome(input_str):
@@ -111,6 +108,327 @@ def is_valid_chromosome(input_str):
     return re.match(chrPattern, input_str, re.IGNORECASE) is not None
 
 
+def liftoverHeader(header, input_cols, query, no_suffix=False, addLast=False):
+    """
+    Update the header for the converted position columns.
+
+    Args:
+        header (list): The header of the input file, updated in place.
+        input_cols (list): Chromosome column then position columns, by index or name.
+        query (str): Genome build to convert to, e.g. 'hg38', used as suffix of the position columns.
+        no_suffix (bool): Do not add suffix to the position columns.
+        addLast (bool): Add the converted positions as new columns at the end.
+
+    Returns:
+        tuple: (header, input_cols), input_cols is 1-based column index.
+    """
+
+    input_cols = [
+        header_mapper(x, header) for x in input_cols
+    ]  # parse order list with col_idx or col_name
+
+    if not no_suffix:  # keep suffix
+        newCols = [
+            f"{header[x-1]}_{query}" for x in input_cols[1:]
+        ]  # input_cols = [chr, pos1, pos2, ...]
+    else:  # drop suffix
+        newCols = [f"{header[x-1]}" for x in input_cols[1:]]
+
+    header += ["chain_direction"]  # for chain direction
+    if addLast:  # add last fo header
+        header += newCols
+    else:
+        for idx, new_header in zip(input_cols[1:], newCols):
+            header[idx - 1] = new_header
+    return header, input_cols
+
+
+def liftoverLine(
+    line,
+    lifter,
+    input_cols,
+    counts,
+    notChrList,
+    minus_pos=1,
+    keep_unmapped=False,
+    drop=False,
+    addLast=False,
+):
+    """
+    Convert the positions of one line.
+
+    Args:
+        line (list): Fields of the line, updated in place.
+        lifter: Lifter from get_lifter, lifter[chr][pos] => [(chr, pos, strand), ...].
+        input_cols (list): 1-based column index, chromosome column then position columns.
+        counts (dict): Counter of unmapped, multiple, notSameChr, key_error and notChr, updated in place.
+        notChrList (set): Non default chromosomes converted to, updated in place.
+        minus_pos (int): 1 if the input is 1-based else 0.
+        keep_unmapped (bool): Keep rows with unmapped and multiple positions.
+        drop (bool): Drop if converted pos is not in the same chromosome.
+        addLast (bool): Add the converted positions as new columns at the end.
+
+    Returns:
+        tuple: (line, line_need_skip), values of line are all str.
+    """
+    line_need_skip = False
+    lifter_res = None
+    try:
+        chr = line[input_cols[0] - 1]
+        chr = LIFTOVER_CHR[chr]  # liftover only support 1, 2 ... not chr1 ...
+        for each in input_cols[1:]:
+            pos = (
+                int(line[each - 1]) - minus_pos
+            )  # convert 1-based to 0-based, if input is  1-based, then minus 1 else minus_pos = 0
+
+            try:  # key is ok
+                lifter_res = lifter[chr][pos]
+
+                if len(lifter_res) == 0:  # unmapped
+                    counts["unmapped"] += 1
+                    new_pos = DEFAULT_NA
+                    if not keep_unmapped:  # drop if not keep_unmapped
+                        line_need_skip = True
+                        break
+                elif len(lifter_res) > 1:  # multiple mapped
+                    new_pos = DEFAULT_NA
+                    counts["multiple"] += 1
+                    if not keep_unmapped:  # drop if not keep_unmapped
+                        line_need_skip = True
+                        break
+                else:
+                    new_chr, new_pos, new_strand = lifter_res[0]
+                    new_pos = str(new_pos)  # int => str
+                    new_chr = LIFTOVER_CHR[new_chr]  # remove chr
+
+                    if is_valid_chromosome(
+                        str(new_chr)
+                    ):  # not contig or something else
+                        if new_chr != chr:  # not same chromosome
+                            counts["notSameChr"] += 1
+
+                            if drop:  # drop if not same chromosome
+                                line_need_skip = True
+                                break
+                            else:  # update new chromosome
+                                line[input_cols[0] - 1] = new_chr
+                    else:  # new chr is a contig or something else which is non default chromosome; will skip
+                        counts["notChr"] += 1
+                        notChrList.add(new_chr)
+                        line_need_skip = True
+                        break
+
+            except KeyError:  # key error if not in lifter chain file
+                counts["key_error"] += 1
+                new_pos = DEFAULT_NA
+                if not keep_unmapped:  # drop if not keep_unmapped
+                    line_need_skip = True
+                    break
+            new_pos = (
+                int(new_pos) + minus_pos
+            )  # convert 0-based to 1-based by adding 1 if input is 1-based, else add 0 if input is 0-based
+            ## add chain direction
+            line.append(new_strand)
+            if not addLast:  # update pos in original cols if not add last
+                line[each - 1] = new_pos
+            else:
+                line.append(new_pos)
+
+        line = [str(i) if not isinstance(i, str) else i for i in line]
+    except:
+        sys.stderr.write(
+            f"Error with line: {line}\n while the output of liftover is {lifter_res}"
+        )
+        raise
+    return line, line_need_skip
+
+
+def liftoverBlock(
+    lines,
+    lifter,
+    input_cols,
+    counts,
+    notChrList,
+    minus_pos=1,
+    keep_unmapped=False,
+    drop=False,
+    addLast=False,
+    cursors=None,
+):
+    """
+    Convert the positions of a block of lines with ChainLifter, the same as liftoverLine on each line.
+
+    Args:
+        lines (list): Split lines, updated in place.
+        lifter (ChainLifter): Lifter of the numpy engine.
+        cursors (list, optional): ChainCursor of each position column for --sorted-input.
+        Others are the same as liftoverLine.
+
+    Returns:
+        list: Converted lines, lines need skip are dropped.
+
+    Notes:
+        - Positions of each column are mapped by ChainLifter.liftArrays, the unmapped, multiple, notSameChr
+          and notChr accounting is done on the arrays, column by column as liftoverLine.
+        - Chromosomes not in the chain file are unmapped as the liftover package, key_error is not counted.
+        - Blocks with a short line or a non-int position, a position col given twice, or with keep_unmapped a line need skip,
+          are converted by liftoverLine line by line, so errors and the kept lines are the same.
+    """
+    chr_col = input_cols[0] - 1
+    try:
+        if not addLast and len(set(input_cols[1:])) < len(input_cols) - 1:
+            raise ValueError("a position col is converted twice, the second time reads the converted value")
+        chroms = [LIFTOVER_CHR[ss[chr_col]] for ss in lines]
+        positions = [
+            np.array([int(ss[each - 1]) for ss in lines], dtype=np.int64) - minus_pos
+            for each in input_cols[1:]
+        ]
+    except (IndexError, ValueError):
+        chroms = None
+
+    if chroms is not None:
+        # chromosome of the query contigs, and an id of each chromosome name to compare the input and query
+        query_chr = [LIFTOVER_CHR[x] for x in lifter.query_names]
+        query_valid = np.array([is_valid_chromosome(str(x)) for x in query_chr], dtype=bool)
+        chr_ids = {}
+        query_chr_ids = np.array([chr_ids.setdefault(x, len(chr_ids)) for x in query_chr], dtype=np.int64)
+        input_chr_ids = np.array([chr_ids.get(x, -1) for x in chroms], dtype=np.int64)
+
+        block_counts = dict.fromkeys(counts, 0)
+        block_notChr = set()
+        alive = np.ones(len(lines), dtype=bool)
+        results = []
+        for k, pos in enumerate(positions):
+            n_hits, query_ids, query_pos, fwd = lifter.liftArrays(
+                chroms, pos, None if cursors is None else cursors[k]
+            )
+            unmapped = alive & (n_hits == 0)
+            multiple = alive & (n_hits > 1)
+            mapped = alive & (n_hits == 1)
+            notChr = mapped & ~query_valid[query_ids]
+            notSameChr = mapped & query_valid[query_ids] & (query_chr_ids[query_ids] != input_chr_ids)
+
+            block_counts["unmapped"] += int(unmapped.sum())
+            block_counts["multiple"] += int(multiple.sum())
+            block_counts["notChr"] += int(notChr.sum())
+            block_counts["notSameChr"] += int(notSameChr.sum())
+            block_notChr.update(query_chr[x] for x in np.unique(query_ids[notChr]).tolist())
+
+            need_skip = unmapped | multiple | notChr
+            if drop:
+                need_skip |= notSameChr
+            if keep_unmapped and need_skip.any():
+                chroms = None
+                break
+            alive &= ~need_skip
+            results.append((notSameChr, query_ids, query_pos + minus_pos, fwd))
+
+    if chroms is None:  # line by line
+        converted = []
+        for ss in lines:
+            ss, line_need_skip = liftoverLine(
+                ss,
+                lifter,
+                input_cols,
+                counts,
+                notChrList,
+                minus_pos=minus_pos,
+                keep_unmapped=keep_unmapped,
+                drop=drop,
+                addLast=addLast,
+            )
+            if not (line_need_skip and not keep_unmapped):
+                converted.append(ss)
+        return converted
+
+    for key, value in block_counts.items():
+        counts[key] += value
+    notChrList.update(block_notChr)
+
+    rows = np.flatnonzero(alive)
+    lines = [lines[i] for i in rows.tolist()]
+    for each, (notSameChr, query_ids, new_pos, fwd) in zip(input_cols[1:], results):
+        if not drop:  # update new chromosome
+            changed = np.flatnonzero(notSameChr[rows])
+            for i, query_id in zip(changed.tolist(), query_ids[rows[changed]].tolist()):
+                lines[i][chr_col] = query_chr[query_id]
+        strands = np.where(fwd[rows], "+", "-").tolist()
+        new_pos = [str(x) for x in new_pos[rows].tolist()]
+        for ss, strand, pos in zip(lines, strands, new_pos):
+            ss.append(strand)
+            if not addLast:  # update pos in original cols if not add last
+                ss[each - 1] = pos
+            else:
+                ss.append(pos)
+    return lines
+
+
+def getChainPath(target, query, cache=None):
+    """
+    Path of the chain file as get_lifter of the liftover package, the chain file is downloaded if not exists.
+
+    Args:
+        target (str): Genome build to convert from, e.g. 'hg19'.
+        query (str): Genome build to convert to, e.g. 'hg38'.
+        cache (str, optional): Chain file folder. Default is the cache folder of the liftover package.
+
+    Returns:
+        str: Path of {target}To{Query}.over.chain.gz.
+    """
+    basename = f"{target[0].lower() + target[1:]}To{query[0].upper() + query[1:]}.over.chain.gz"
+    if cache is not None:
+        folders = [os.path.expanduser(cache)]
+    else:
+        folders = [default_cache_dir()] if default_cache_dir is not None else []
+        folders.append(os.path.expanduser("~/.liftover"))
+
+    for _ in range(2):
+        for folder in folders:
+            chain_path = os.path.join(folder, basename)
+            if os.path.exists(chain_path) and os.path.getsize(chain_path) > 0:
+                return chain_path
+        get_lifter(target, query, cache=cache)  # download
+    raise ValueError(f"can not find or download the chain file {basename}")
+
+
+def reportLiftover(counts, notChrList, line_idx, drop=False, no_header=False):
+    """
+    Write the summary of liftover to stderr.
+
+    Args:
+        counts (dict): Counter from liftoverLine.
+        notChrList (set): Non default chromosomes from liftoverLine.
+        line_idx (int): Number of lines read plus 1, used for the 1% warnings.
+        drop (bool): --drop option.
+        no_header (bool): --no-header option.
+    """
+    if not drop:
+        sys.stderr.write(
+            f"Warning drop is False, so if converted pos is not the same chr, the data will update, so if your data containes only one chromosome, make sure to filter it later!\n"
+        )
+    if no_header:
+        sys.stderr.write(
+            f"Warning no_header is True, so the input file should not contain header, and the input_cols should be the col index, not col name!\n"
+        )
+    for key in ["unmapped", "multiple", "notSameChr", "key_error", "notChr"]:
+        sys.stderr.write(f"{key} count: {counts[key]}\n")
+
+    if len(notChrList) > 0:
+        sys.stderr.write(
+            "Undefault chromosome list:" + ",".join(list(notChrList)[:5]) + "\n"
+        )
+    warning_msgs = {
+        "unmapped": "unmapped, please check your target and query version",
+        "multiple": "multiple mapped, please check your target and query version",
+        "notSameChr": "not same chromosome, please check your target and query version",
+        "key_error": "key error, please check your data of chr is consistent with your target and query genome version",
+        "notChr": "not default chromosome, please check your data of chr is consistent with your target and query genome version",
+    }
+    for key, msg in warning_msgs.items():
+        if counts[key] >= line_idx / 100:
+            sys.stderr.write(f"Warning: over 1% of the input lines are {msg}\n")
+
+
 def getParser():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -162,6 +480,9 @@ def getParser():
         Convert positions from hg19 to hg38 using a specific chain dir, this will use local cache file as '{target}To{query}.over.chain.gz':
         cat yourfile %prog -c hg19 hg38 chainFilePath -i 1 2 3 4
 
+        Read and write bgzip directly:
+        %prog -c hg19 hg38 chainFilePath -i 1 2 -I yourfile.tsv.gz -O yourfile.hg38.tsv.gz
+
         For plink2 Users:
         cat g1000_eur.pvar|  versionConvert.py -i 1 2 -c hg19 hg38 -l | awk '{print $3, $6}' > g1000_eur.map
         plink2 --pfile g1000_eur --sort-vars --update-map g1000_eur.map --make-pgen --out g1000_eur_GRCh38
@@ -239,6 +560,46 @@ def getParser():
         help="specific this file is zero-based, if file is gwas summary, then do not use this option, otherwise u are sure the file is zero-based",
         action="store_true",
     )
+    parser.add_argument(
+        "--engine",
+        dest="engine",
+        choices=["numpy", "liftover"],
+        default="numpy" if np is not None else "liftover",
+        help="numpy: map batches of positions by the chain file in numpy arrays; liftover: the liftover package, one position each time. Default: numpy if installed.",
+    )
+    parser.add_argument(
+        "--no-chain-cache",
+        dest="no_chain_cache",
+        action="store_true",
+        help="Do not read or write the binary cache of the chain file ({chain}.{md5}.lifter next to it) of the numpy engine.",
+    )
+    parser.add_argument(
+        "--sorted-input",
+        dest="sorted_input",
+        action="store_true",
+        help="Input is sorted by chromosome and position, positions are mapped by a cursor of chain blocks which only moves forward. Rows out of order fall back to binary search and are reported. Needs --engine numpy.",
+    )
+    parser.add_argument(
+        "-I",
+        "--input",
+        dest="input",
+        default=None,
+        help="Input file (plain, gzip or bgzip). Default: stdin.",
+    )
+    parser.add_argument(
+        "-O",
+        "--output",
+        dest="output",
+        default=None,
+        help="Output file, *.gz or *.bgz will be written as bgzip. Default: stdout.",
+    )
+    parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=1,
+        help="Number of threads to decompress bgzip input and compress bgzip output. Default: 1.",
+    )
 
     return parser
 
@@ -277,7 +638,14 @@ if __name__ == "__main__":
         )
 
     # lifter = ChainFile(chainPath, target, query)
-    lifter = get_lifter(target, query, cache=chainPath)
+    if args.sorted_input and args.engine != "numpy":
+        raise ValueError("--sorted-input needs --engine numpy")
+    if args.engine == "numpy":
+        lifter = ChainLifter.fromCache(
+            getChainPath(target, query, chainPath), use_cache=not args.no_chain_cache
+        )
+    else:
+        lifter = get_lifter(target, query, cache=chainPath)
 
     if len(input_cols) <= 1:
         raise ValueError("input cols error, please check, at least 1 col")
@@ -289,172 +657,71 @@ if __name__ == "__main__":
     line_idx = 2 if args.no_header else 1  # header idx
     if line_idx == 2:
         input_cols = [int(x) for x in input_cols]  # convert str to int
-    unmapped = 0
-    multiple = 0
-    key_error = 0
-    notSameChr = 0
-    notChr = 0
+    counts = {
+        "unmapped": 0,
+        "multiple": 0,
+        "notSameChr": 0,
+        "key_error": 0,
+        "notChr": 0,
+    }
     notChrList = set()
-    for line in sys.stdin:
-        line = line.strip()  # remove \n
-        line_need_skip = False
-        if line_idx == 1:
-            header = line.split(delimter)
-
-            input_cols = [
-                header_mapper(x, header) for x in input_cols
-            ]  # parse order list with col_idx or col_name
-
-            if not no_suffix:  # keep suffix
-                newCols = [
-                    f"{header[x-1]}_{query}" for x in input_cols[1:]
-                ]  # input_cols = [chr, pos1, pos2, ...]
-            else:  # drop suffix
-                newCols = [f"{header[x-1]}" for x in input_cols[1:]]
-
-            header += ["chain_direction"]  # for chain direction
-            if addLast:  # add last fo header
-                header += newCols
+    cursors = [ChainCursor() for _ in input_cols[1:]] if args.sorted_input else None
+    input_file = openInput(args.input, args.threads)
+    output_file = openOutput(args.output, args.threads)
+    if line_idx == 1:
+        line = input_file.readline()
+        if line:
+            header, input_cols = liftoverHeader(
+                line.strip().split(delimter), input_cols, query, no_suffix, addLast
+            )
+            output_file.write(f"{outputDelimter.join(header)}\n")
+            line_idx += 1
+
+    if args.engine == "numpy":
+        for block in iter(lambda: list(islice(input_file, LIFT_BATCH_SIZE)), []):
+            lines = liftoverBlock(
+                [line.strip().split(delimter) for line in block],
+                lifter,
+                input_cols,
+                counts,
+                notChrList,
+                minus_pos=minus_pos,
+                keep_unmapped=keep_unmapped,
+                drop=drop,
+                addLast=addLast,
+                cursors=cursors,
+            )
+            line_idx += len(block)
+            output_file.write("".join([outputDelimter.join(ss) + "\n" for ss in lines]))
+    else:
+        for line in input_file:
+            line, line_need_skip = liftoverLine(
+                line.strip().split(delimter),
+                lifter,
+                input_cols,
+                counts,
+                notChrList,
+                minus_pos=minus_pos,
+                keep_unmapped=keep_unmapped,
+                drop=drop,
+                addLast=addLast,
+            )
+            line_idx += 1
+            if line_need_skip and not keep_unmapped:
+                continue
             else:
-                for idx, new_header in zip(input_cols[1:], newCols):
-                    header[idx - 1] = new_header
-
-            ss = outputDelimter.join(header)
-
-        else:
-            try:
-                line = line.split(delimter)
-                chr = line[input_cols[0] - 1]
-                chr = formatChrLiftover(
-                    chr, nochr=True
-                )  # liftover only support 1, 2 ... not chr1 ...
-                for each in input_cols[1:]:
-                    pos = (
-                        int(line[each - 1]) - minus_pos
-                    )  # convert 1-based to 0-based, if input is  1-based, then minus 1 else minus_pos = 0
-                    # if (
-                    #     args.zero_based
-                    # ):  # if one based input, then minus 1 to convert to 0-based
-                    #     pos -= 1
-
-                    try:  # key is ok
-                        lifter_res = lifter[chr][pos]
-
-                        if len(lifter_res) == 0:  # unmapped
-                            unmapped += 1
-                            new_pos = DEFAULT_NA
-                            if not keep_unmapped:  # drop if not keep_unmapped
-                                line_need_skip = True
-                                # continue
-                                break
-                        elif len(lifter_res) > 1:  # multiple mapped
-                            new_pos = DEFAULT_NA
-                            multiple += 1
-                            if not keep_unmapped:  # drop if not keep_unmapped
-                                # continue
-                                line_need_skip = True
-                                break
-                        else:
-                            new_chr, new_pos, new_strand = lifter_res[0]
-                            new_pos = str(new_pos)  # int => str
-                            new_chr = formatChrLiftover(
-                                new_chr, nochr=True
-                            )  # remove chr
-
-                            if is_valid_chromosome(
-                                str(new_chr)
-                            ):  # not contig or something else
-                                if new_chr != chr:  # not same chromosome
-                                    notSameChr += 1
-
-                                    if drop:  # drop if not same chromosome
-                                        line_need_skip = True
-                                        break
-                                    else:  # update new chromosome
-                                        line[input_cols[0] - 1] = new_chr
-                            else:  # new chr is a contig or something else which is non default chromosome; will skip
-                                notChr += 1
-                                notChrList.add(new_chr)
-                                line_need_skip = True
-                                break
-
-                    except KeyError:  # key error if not in lifter chain file
-                        key_error += 1
-                        new_pos = DEFAULT_NA
-                        if not keep_unmapped:  # drop if not keep_unmapped
-                            # continue
-                            line_need_skip = True
-                            break
-                    # upadte pos
-                    # if one-based input, then convert output 0-based to 1-based
-                    # if args.one_based and new_pos != DEFAULT_NA:
-                    #     new_pos = int(new_pos) + 1
-                    new_pos = (
-                        int(new_pos) + minus_pos
-                    )  # convert 0-based to 1-based by adding 1 if input is 1-based, else add 0 if input is 0-based
-                    # update pos into original cols
-                    ## add chain direction
-
-                    line.append(new_strand)
-                    if not addLast:  # update pos in original cols if not add last
-                        line[each - 1] = new_pos
-                    else:
-                        line.append(new_pos)
-
-                ss = outputDelimter.join(
-                    [str(i) if not isinstance(i, str) else i for i in line]
-                )
-            except:
-                sys.stderr.write(
-                    f"Error with line: {line}\n while the output of liftover is {lifter_res}"
-                )
-                raise
-
-        line_idx += 1
-        if line_need_skip and not keep_unmapped:
-            continue
-        else:
-            sys.stdout.write(f"{ss}\n")
-
-if not drop:
-    sys.stderr.write(
-        f"Warning drop is False, so if converted pos is not the same chr, the data will update, so if your data containes only one chromosome, make sure to filter it later!\n"
-    )
-if args.no_header:
-    sys.stderr.write(
-        f"Warning no_header is True, so the input file should not contain header, and the input_cols should be the col index, not col name!\n"
-    )
-sys.stderr.write(f"unmapped count: {unmapped}\n")
-sys.stderr.write(f"multiple count: {multiple}\n")
-sys.stderr.write(f"notSameChr count: {notSameChr}\n")
-sys.stderr.write(f"key_error count: {key_error}\n")
-sys.stderr.write(f"notChr count: {notChr}\n")
-
-if len(notChrList) > 0:
-    sys.stderr.write(
-        "Undefault chromosome list:" + ",".join(list(notChrList)[:5]) + "\n"
-    )
-if unmapped >= line_idx / 100:
-    sys.stderr.write(
-        "Warning: over 1% of the input lines are unmapped, please check your target and query version\n"
-    )
-if multiple >= line_idx / 100:
-    sys.stderr.write(
-        "Warning: over 1% of the input lines are multiple mapped, please check your target and query version\n"
-    )
-if notSameChr >= line_idx / 100:
-    sys.stderr.write(
-        "Warning: over 1% of the input lines are not same chromosome, please check your target and query version\n"
-    )
-if key_error >= line_idx / 100:
-    sys.stderr.write(
-        "Warning: over 1% of the input lines are key error, please check your data of chr is consistent with your target and query genome version\n"
-    )
-if notChr >= line_idx / 100:
-    sys.stderr.write(
-        "Warning: over 1% of the input lines are not default chromosome, please check your data of chr is consistent with your target and query genome version\n"
-    )
-
-sys.stdout.close()
-sys.stderr.flush()
-sys.stderr.close()
+                output_file.write(f"{outputDelimter.join(line)}\n")
+
+    reportLiftover(counts, notChrList, line_idx, drop=drop, no_header=args.no_header)
+    if cursors is not None:
+        fallback = sum(cursor.fallback for cursor in cursors)
+        sys.stderr.write(f"sorted-input fallback count: {fallback}\n")
+        if fallback > 0:
+            sys.stderr.write(
+                "Warning: input is not sorted by chromosome and position, positions out of order are mapped by binary search\n"
+            )
+
+    output_file.close()
+    sys.stdout.close()
+    sys.stderr.flush()
+    sys.stderr.close()